@@ -1,12 +1,14 @@
-from flask import Flask, Blueprint
-
-from .config import DevelopmentConfig
-
-app = Flask(__name__)
-app.config.from_object(DevelopmentConfig)
+from flask import Blueprint
 
 trading_stats_bp = Blueprint("trading_stats_bp", __name__, url_prefix="/api/trading-statistics")
+metrics_bp = Blueprint("metrics_bp", __name__)
 
-from .api.views import trading_statistics
 
-app.register_blueprint(trading_stats_bp)
+def __getattr__(name: str):
+    # The Flask app imports the views, which build the service of the API processes. It is only
+    # created once imported, so that other processes (e.g. the shared memory writer) can import the
+    # services and the config without starting one.
+    if name == "app":
+        from .application import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,43 @@
+import base64
+import json
+import threading
+import time
+
+from flask import Request
+
+
+class RequestRecorder:
+    def __init__(self, path: str) -> None:
+        """
+        Appends the requests served to a JSON lines file, which the load-test harness can replay
+        (see benchmarks/load.py).
+
+        Every line holds the time of the request relative to the first one recorded, its method, its
+        path with the query string, and its body: as JSON when it is JSON, base64-encoded otherwise.
+        """
+        self.path = path
+        self._file = open(path, "a", buffering=1)
+        self._lock = threading.Lock()
+        self._started = None
+
+    def record(self, request: Request) -> None:
+        entry = {"method": request.method, "path": request.full_path.rstrip("?")}
+
+        # Caches the body, so the view can still read it
+        body = request.get_data(cache=True)
+        if body:
+            entry["content_type"] = request.content_type
+            try:
+                if not request.is_json:
+                    raise ValueError()
+                entry["json"] = json.loads(body)
+            except ValueError:
+                # Also keeps malformed JSON bodies as they were sent
+                entry["body_base64"] = base64.b64encode(body).decode()
+
+        with self._lock:
+            now = time.monotonic()
+            if self._started is None:
+                self._started = now
+            entry["at"] = round(now - self._started, 6)
+            self._file.write(json.dumps(entry) + "\n")
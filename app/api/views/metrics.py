@@ -0,0 +1,83 @@
+import time
+
+from flask import g, jsonify, request
+from app import app, metrics_bp
+from app.api.views.trading_statistics import service
+from app.services.metrics import REGISTRY, Counter, Gauge, Histogram
+from app.services.profiler import SamplingProfiler
+
+
+PROMETHEUS_MIMETYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+request_seconds = REGISTRY.register(Histogram(
+    "trading_http_request_duration_seconds", "Time to handle a request, until its response starts.", ("endpoint", "method")))
+requests_total = REGISTRY.register(Counter(
+    "trading_http_requests_total", "Requests handled, by status.", ("endpoint", "method", "status")))
+
+if hasattr(service, "get_memory_usage"):
+    # The engines of the other modes live in the shard or writer processes
+    REGISTRY.register(Gauge(
+        "trading_engine_memory_bytes", "Estimated memory held by the data engine of a symbol.", ("symbol",),
+        lambda: {(symbol,): size for symbol, size in service.get_memory_usage().items()}))
+
+if getattr(service, "spill_store", None) is not None:
+    REGISTRY.register(Gauge(
+        "trading_engine_memory_budget", "Memory budget of the data engines, by statistic (see the /memory/ endpoint).", ("statistic",),
+        lambda: {(name,): value for name, value in service.get_memory_stats().items()}))
+
+profiler = SamplingProfiler(app.config["PROFILER_INTERVAL_SECONDS"])
+
+
+@metrics_bp.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@metrics_bp.after_app_request
+def observe_request(response):
+    started = g.pop('request_started', None)
+    if started is not None and app.config["METRICS_ENABLED"]:
+        # The route rather than the path, so that the number of label values stays bounded
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        request_seconds.observe(time.perf_counter() - started, endpoint, request.method)
+        requests_total.inc(1, endpoint, request.method, str(response.status_code))
+    return response
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Endpoint exposing the metrics of the process in the Prometheus text format.
+    """
+    return app.response_class(REGISTRY.render(), mimetype=PROMETHEUS_MIMETYPE)
+
+
+@metrics_bp.route('/admin/profiler/start/', methods=['POST'])
+def start_profiler():
+    """
+    Endpoint starting the sampling profiler, which keeps the stacks it samples until they are dumped.
+    """
+    profiler.start()
+    return jsonify({'message': 'Profiler started', 'interval_seconds': profiler.interval_seconds}), 200
+
+
+@metrics_bp.route('/admin/profiler/stop/', methods=['POST'])
+def stop_profiler():
+    """
+    Endpoint stopping the sampling profiler.
+    """
+    profiler.stop()
+    return jsonify({'message': 'Profiler stopped'}), 200
+
+
+@metrics_bp.route('/admin/profiler/stacks/', methods=['GET'])
+def dump_profiler_stacks():
+    """
+    Endpoint downloading the stacks sampled so far in the folded format of flamegraph tools
+    (e.g. `flamegraph.pl stacks.folded > flamegraph.svg`, or speedscope). With reset=true, the
+    stacks are cleared once dumped.
+    """
+    reset = request.args.get('reset', 'false').lower() in ('1', 'true', 'yes')
+    response = app.response_class(profiler.dump(reset=reset), mimetype='text/plain')
+    response.headers['Content-Disposition'] = 'attachment; filename=stacks.folded'
+    return response
@@ -1,28 +1,227 @@
 from app import trading_stats_bp
-from flask import Flask, request, jsonify
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+
+import numpy as np
+from flask import Flask, request, jsonify, stream_with_context
+from app import app
 from app.services.trading_statistics import TradingStatisticsService
-from app.services.exceptions import TradingStatisticsServiceException, TradingStatisticsServiceSymbolNotFoundException, TradingStatisticsServiceSymbolsLimitReachedException
-from app.data_structures.segment_tree import SegmentTree 
+from app.services.sharding import ShardedTradingStatisticsService
+from app.services.shared_memory import SharedMemoryTradingStatisticsService
+from app.services.exceptions import TradingStatisticsServiceException, TradingStatisticsServiceIngestQueueFullException, TradingStatisticsServiceSymbolNotFoundException, TradingStatisticsServiceSymbolsLimitReachedException, TradingStatisticsServiceTimestampsException
+from app.api.request_log import RequestRecorder
+from app.data_structures import DATA_ENGINES
+from app.data_structures.quantile_segment_tree import QuantileArraySegmentTree
+from app.data_structures.segment_tree import SegmentTree
+from app.services.ingest import IngestQueue
+from app.services.metrics import REGISTRY, EngineMetrics
+from app.services.snapshots import SnapshotScheduler
+from app.services.streaming import StreamIngestor
+from app.services.subscriptions import SubscriptionHub
+from app.services.wal import WriteAheadLog
+
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+MAX_BATCH_SIZE = 10000
+MAX_BULK_ITEMS = 1000
+MAX_CANDLES = 10000
+MAX_SERIES_WINDOWS = 10000
+BINARY_MIMETYPE = 'application/octet-stream'
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+NDJSON_MIMETYPE = 'application/x-ndjson'
+EVENT_STREAM_MIMETYPE = 'text/event-stream'
+
+data_engine = DATA_ENGINES[app.config["DATA_ENGINE"]]
+if data_engine is QuantileArraySegmentTree:
+    data_engine = functools.partial(
+        QuantileArraySegmentTree,
+        sketch_min_leaves=app.config["QUANTILE_SKETCH_MIN_LEAVES"],
+        relative_accuracy=app.config["QUANTILE_SKETCH_RELATIVE_ACCURACY"],
+    )
+elif data_engine is SegmentTree:
+    data_engine = functools.partial(SegmentTree, growth_factor=app.config["SEGMENT_TREE_GROWTH_FACTOR"])
+
+if app.config["SERVICE_MODE"] == "sharded":
+    # Every shard restores its own snapshot and write-ahead log when it starts
+    service = ShardedTradingStatisticsService(
+        data_engine=data_engine,
+        shard_count=app.config["SHARD_COUNT"],
+        stats_cache_size=app.config["STATS_CACHE_SIZE"],
+        stats_cache_eviction_policy=app.config["STATS_CACHE_EVICTION_POLICY"],
+        snapshot_path=app.config["SNAPSHOT_PATH"],
+        wal_directory=app.config["WAL_DIRECTORY"],
+        wal_flush_interval_seconds=app.config["WAL_FLUSH_INTERVAL_SECONDS"],
+        candle_resolutions=app.config["CANDLE_RESOLUTIONS"],
+    )
+elif app.config["SERVICE_MODE"] == "shared_memory":
+    # The data is owned by the writer process (see writer.py), which restores and persists it
+    service = SharedMemoryTradingStatisticsService(
+        address=app.config["WRITER_ADDRESS"],
+        namespace=app.config["SHARED_MEMORY_NAMESPACE"],
+        stats_cache_size=app.config["STATS_CACHE_SIZE"],
+        stats_cache_eviction_policy=app.config["STATS_CACHE_EVICTION_POLICY"],
+    )
+else:
+    write_ahead_log = None
+    if app.config["WAL_DIRECTORY"]:
+        write_ahead_log = WriteAheadLog(app.config["WAL_DIRECTORY"], app.config["WAL_FLUSH_INTERVAL_SECONDS"])
+
+    service = TradingStatisticsService(
+        data_engine=data_engine,
+        stats_cache_size=app.config["STATS_CACHE_SIZE"],
+        stats_cache_eviction_policy=app.config["STATS_CACHE_EVICTION_POLICY"],
+        write_ahead_log=write_ahead_log,
+        engine_metrics=EngineMetrics(REGISTRY) if app.config["METRICS_ENABLED"] else None,
+        memory_budget_bytes=app.config["MEMORY_BUDGET_BYTES"],
+        spill_directory=app.config["SPILL_DIRECTORY"],
+        candle_resolutions=app.config["CANDLE_RESOLUTIONS"],
+    )
+
+    if app.config["SNAPSHOT_PATH"] and os.path.exists(app.config["SNAPSHOT_PATH"]):
+        service.load_snapshot(app.config["SNAPSHOT_PATH"])
+    if write_ahead_log is not None:
+        service.replay_write_ahead_log()
+
+ingest_queue = None
+if app.config["ASYNC_INGEST"]:
+    ingest_queue = IngestQueue(service, max_pending_batches=app.config["INGEST_QUEUE_SIZE"])
+
+# Batches added by other API processes are only noticed by polling the versions of the shared trees
+subscription_hub = SubscriptionHub(
+    service,
+    poll_interval_seconds=app.config["SUBSCRIPTION_POLL_INTERVAL_SECONDS"] if app.config["SERVICE_MODE"] == "shared_memory" else 0,
+)
+# Ends the event streams of the subscribers when the process exits
+atexit.register(subscription_hub.close)
+
+request_recorder = None
+if app.config["REQUEST_LOG_PATH"]:
+    request_recorder = RequestRecorder(app.config["REQUEST_LOG_PATH"])
+
+snapshot_scheduler = None
+snapshot_scheduler_lock = threading.Lock()
+
+
+@trading_stats_bp.before_request
+def record_request():
+    """Records the requests to REQUEST_LOG_PATH, except for streams whose body is only read as it arrives."""
+    if request_recorder is not None and request.endpoint != 'trading_stats_bp.stream_batches':
+        request_recorder.record(request)
+
+
+@trading_stats_bp.before_app_request
+def start_snapshot_scheduler():
+    """
+    Starts the periodic snapshots with the first request, so that only a process actually serving
+    requests takes them (and not, for instance, the parent process of the development reloader).
+    """
+    global snapshot_scheduler
+
+    if snapshot_scheduler is not None or not app.config["SNAPSHOT_PATH"] or app.config["SNAPSHOT_INTERVAL_SECONDS"] <= 0:
+        return
+
+    with snapshot_scheduler_lock:
+        if snapshot_scheduler is None:
+            path = app.config["SNAPSHOT_PATH"]
+            snapshot_scheduler = SnapshotScheduler(lambda: service.save_snapshot(path), app.config["SNAPSHOT_INTERVAL_SECONDS"])
+            snapshot_scheduler.start()
+
 
+def _values_from_buffer(buffer: bytes) -> np.ndarray | None:
+    """Interprets a buffer as little-endian float64 values without copying it, or None if it is malformed."""
+    if len(buffer) % 8 != 0:
+        return None
+    return np.frombuffer(buffer, dtype='<f8')
+
+
+def _parse_batch_request() -> tuple[str | None, list[float] | np.ndarray | None, list[float] | None, bool]:
+    """
+    Extracts the symbol, values, (optional) timestamps and compact storage flag of an add_batch request.
+
+    Supported bodies:
+    - JSON (default): {"symbol": "AAPL", "values": [1.0, 2.0]}, with optionally the timestamp of
+      every value in seconds since the epoch: "timestamps": [1700000000.0, 1700000000.5], and
+      "compact": true to store a new symbol as float32 (see `CompactArraySegmentTree`).
+    - application/octet-stream: raw little-endian float64 values, with the symbol given in the
+      `symbol` query string argument or the `X-Symbol` header, and compact storage with `compact=true`.
+    - MessagePack (when msgpack is installed): {"symbol": "AAPL", "values": [1.0, 2.0]}, where values
+      (and timestamps) may also be a bin field of raw little-endian float64 values.
+    """
+    if request.mimetype == BINARY_MIMETYPE:
+        symbol = request.args.get('symbol') or request.headers.get('X-Symbol')
+        compact = request.args.get('compact', 'false').lower() in ('1', 'true', 'yes')
+        return symbol, _values_from_buffer(request.get_data()), None, compact
+
+    if request.mimetype in MSGPACK_MIMETYPES:
+        data = msgpack.unpackb(request.get_data())
+    else:
+        data = request.get_json()
+
+    values = data.get('values')
+    if isinstance(values, bytes):
+        values = _values_from_buffer(values)
+    elif not isinstance(values, list):
+        values = None
+
+    timestamps = data.get('timestamps')
+    if isinstance(timestamps, bytes):
+        timestamps = _values_from_buffer(timestamps)
+
+    return data.get('symbol'), values, timestamps, data.get('compact') is True
+
+
+def _queue_full_response():
+    response = jsonify({'error': 'Ingest queue is full, retry later'})
+    response.headers['Retry-After'] = '1'
+    return response, 429
 
-service = TradingStatisticsService(data_engine=SegmentTree)
 
 @trading_stats_bp.route('/add_batch/', methods=['POST'])
 def add_batch():
     """
     Endpoint for adding a batch of trading data points for a specific symbol.
+
+    With asynchronous ingest enabled, the batch is queued and the endpoint answers 202 right away
+    (429 if the queue is full). Use the flush endpoint to wait until queued batches are applied.
     """
     try:
-        data = request.get_json()
-        symbol = data.get('symbol')
-        values = data.get('values')
+        if request.mimetype in MSGPACK_MIMETYPES and msgpack is None:
+            return jsonify({'error': 'MessagePack payloads are not supported, msgpack is not installed'}), 415
 
-        if not symbol or not isinstance(values, list) or len(values) > 10000:
+        symbol, values, timestamps, compact = _parse_batch_request()
+
+        # Checked before the batch is queued, as a queued batch that fails is only logged
+        if (not symbol or values is None or len(values) > MAX_BATCH_SIZE or
+                isinstance(values, list) and not all(type(value) in (int, float) for value in values)):
             return jsonify({'error': 'Invalid input, ensure symbol is provided and values is a list of up to 10000 floats'}), 400
 
-        service.add_batch(symbol, values)
+        if timestamps is not None and not (
+                isinstance(timestamps, np.ndarray) or
+                isinstance(timestamps, list) and all(type(t) in (int, float) for t in timestamps)):
+            return jsonify({'error': 'Invalid input, ensure timestamps is a list of numbers'}), 400
+
+        if ingest_queue is not None:
+            if timestamps is not None or compact:
+                return jsonify({'error': 'Timestamped and compact batches are not supported with asynchronous ingest'}), 400
+            ingest_queue.submit(symbol, values)
+            return jsonify({'message': 'Batch data accepted'}), 202
+
+        service.add_batch(symbol, values, timestamps, compact)
         return jsonify({'message': 'Batch data added successfully'}), 200
 
+    except TradingStatisticsServiceIngestQueueFullException:
+        return _queue_full_response()
+    except TradingStatisticsServiceTimestampsException as e:
+        return jsonify({'error': str(e)}), 400
     except TradingStatisticsServiceException as e:
         return jsonify({'error': str(e)}), 500
     except Exception as e:
@@ -33,6 +232,9 @@ def add_batch():
 def get_stats():
     """
     Endpoint for retrieving statistical data for a specific symbol and window size exponent (k).
+
+    Responses carry an ETag derived from the symbol's data version. A request whose If-None-Match
+    header matches the current ETag gets a 304 without querying the data engine.
     """
     try:
         symbol = request.args.get('symbol')
@@ -41,9 +243,17 @@ def get_stats():
         if not symbol or k is None or not (1 <= k <= 8):
             return jsonify({'error': 'Invalid input, ensure symbol is provided and k is an integer between 1 and 8'}), 400
 
+        etag = f"{service.instance_id}-{service.get_version(symbol)}-{k}"
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            return response
+
         stats = service.get_stats(symbol, k)
 
-        return jsonify(stats), 200
+        response = jsonify(stats)
+        response.set_etag(etag)
+        return response, 200
     
     except TradingStatisticsServiceSymbolNotFoundException as e:
         return jsonify({'error': str(e)}), 404
@@ -52,3 +262,327 @@ def get_stats():
     except Exception as e:
         return jsonify({'error': 'An unexpected error occurred', 'details': str(e)}), 500
 
+
+@trading_stats_bp.route('/candles/', methods=['GET'])
+def get_candles():
+    """
+    Endpoint for retrieving consecutive OHLC candles of a symbol, each summarising `resolution` data
+    points (one of CANDLE_RESOLUTIONS). Returns the latest `count` candles (up to 10000), or those
+    before the candle index `end` to page back through the history.
+    """
+    try:
+        symbol = request.args.get('symbol')
+        resolution = request.args.get('resolution', type=int)
+        count = request.args.get('count', MAX_CANDLES, type=int)
+        end = request.args.get('end', type=int)
+
+        if not symbol or resolution not in app.config["CANDLE_RESOLUTIONS"] or not (1 <= count <= MAX_CANDLES):
+            return jsonify({'error': 'Invalid input, ensure symbol is provided, resolution is one of CANDLE_RESOLUTIONS and count is between 1 and 10000'}), 400
+
+        return jsonify(service.get_candles(symbol, resolution, count, end)), 200
+
+    except TradingStatisticsServiceSymbolNotFoundException as e:
+        return jsonify({'error': str(e)}), 404
+    except TradingStatisticsServiceException as e:
+        return jsonify({'error': str(e)}), 500
+    except Exception as e:
+        return jsonify({'error': 'An unexpected error occurred', 'details': str(e)}), 500
+
+
+@trading_stats_bp.route('/stats/series/', methods=['GET'])
+def get_stats_series():
+    """
+    Endpoint for retrieving the stats of a series of windows of a symbol, e.g. for backtests: up to
+    `count` windows (at most 10000) of `window` data points, whose ends are `stride` data points
+    apart (1 by default), the newest one ending `offset` data points before the last (0 by default).
+    The window length is any number of data points up to 10^8, not only a power of ten.
+    """
+    try:
+        symbol = request.args.get('symbol')
+        window = request.args.get('window', type=int)
+        count = request.args.get('count', type=int)
+        stride = request.args.get('stride', 1, type=int)
+        offset = request.args.get('offset', 0, type=int)
+
+        if (
+            not symbol or window is None or count is None or not (1 <= window <= 10 ** 8)
+            or not (1 <= count <= MAX_SERIES_WINDOWS) or stride < 1 or offset < 0
+        ):
+            return jsonify({'error': 'Invalid input, ensure symbol is provided, window is between 1 and 10^8, count is between 1 and 10000, stride is positive and offset is non-negative'}), 400
+
+        return jsonify(service.get_stats_series(symbol, window, count, stride, offset)), 200
+
+    except TradingStatisticsServiceSymbolNotFoundException as e:
+        return jsonify({'error': str(e)}), 404
+    except TradingStatisticsServiceException as e:
+        return jsonify({'error': str(e)}), 500
+    except Exception as e:
+        return jsonify({'error': 'An unexpected error occurred', 'details': str(e)}), 500
+
+
+@trading_stats_bp.route('/stats/time/', methods=['GET'])
+def get_stats_in_time_range():
+    """
+    Endpoint for retrieving statistical data over a time range of a symbol ingested with timestamps.
+
+    The range is given either by `start` and/or `end` (seconds since the epoch, both inclusive), or
+    by `seconds`, the duration of the range ending now (e.g. seconds=300 for the last 5 minutes).
+    The response also holds the number of data points in the range.
+    """
+    try:
+        symbol = request.args.get('symbol')
+        start = request.args.get('start', type=float)
+        end = request.args.get('end', type=float)
+        seconds = request.args.get('seconds', type=float)
+
+        if not symbol or (seconds is not None and (start is not None or end is not None)) or (seconds is not None and seconds < 0):
+            return jsonify({'error': 'Invalid input, ensure symbol is provided with either start/end timestamps or a positive number of seconds'}), 400
+
+        if seconds is not None:
+            start = time.time() - seconds
+
+        return jsonify(service.get_stats_in_time_range(symbol, start, end)), 200
+
+    except TradingStatisticsServiceSymbolNotFoundException as e:
+        return jsonify({'error': str(e)}), 404
+    except TradingStatisticsServiceTimestampsException as e:
+        return jsonify({'error': str(e)}), 400
+    except TradingStatisticsServiceException as e:
+        return jsonify({'error': str(e)}), 500
+    except Exception as e:
+        return jsonify({'error': 'An unexpected error occurred', 'details': str(e)}), 500
+
+
+def _error_status(error: TradingStatisticsServiceException) -> int:
+    if isinstance(error, TradingStatisticsServiceIngestQueueFullException):
+        return 429
+    return 404 if isinstance(error, TradingStatisticsServiceSymbolNotFoundException) else 500
+
+
+def _submit_batches(batches: list[tuple[str, list[float]]]) -> list[TradingStatisticsServiceException | None]:
+    """Queues batches for asynchronous ingest, returning for every batch None or the reason it was rejected."""
+    errors = []
+    for symbol, values in batches:
+        try:
+            ingest_queue.submit(symbol, values)
+            errors.append(None)
+        except TradingStatisticsServiceIngestQueueFullException as e:
+            errors.append(e)
+    return errors
+
+
+@trading_stats_bp.route('/add_batches/', methods=['POST'])
+def add_batches():
+    """
+    Endpoint for adding batches of trading data points for several symbols in one request.
+    Every batch is validated and applied on its own, and the response reports the outcome of each one:
+    a batch with non-numeric values gets a 400 while the others are still applied. With asynchronous ingest enabled, accepted batches are queued and reported with a 202 status.
+    """
+    try:
+        data = request.get_json()
+        batches = data.get('batches')
+
+        if not isinstance(batches, list) or len(batches) > MAX_BULK_ITEMS:
+            return jsonify({'error': 'Invalid input, ensure batches is a list of up to 1000 objects with a symbol and values'}), 400
+
+        results = [None] * len(batches)
+        accepted = []
+        for i, batch in enumerate(batches):
+            symbol = batch.get('symbol') if isinstance(batch, dict) else None
+            values = batch.get('values') if isinstance(batch, dict) else None
+
+            # Values are checked and converted here, so that an invalid batch never fails after earlier ones were applied or queued
+            if (not symbol or not isinstance(values, list) or len(values) > MAX_BATCH_SIZE or
+                    not all(type(value) in (int, float) for value in values)):
+                results[i] = {'symbol': symbol, 'status': 400, 'error': 'Invalid input, ensure symbol is provided and values is a list of up to 10000 floats'}
+            else:
+                accepted.append((i, symbol, np.asarray(values, dtype=np.float64)))
+
+        if ingest_queue is not None:
+            errors = _submit_batches([(symbol, values) for _, symbol, values in accepted])
+            success = {'status': 202, 'message': 'Batch data accepted'}
+        else:
+            errors = service.add_batches([(symbol, values) for _, symbol, values in accepted])
+            success = {'status': 200, 'message': 'Batch data added successfully'}
+
+        for (i, symbol, _), error in zip(accepted, errors):
+            if error is None:
+                results[i] = {'symbol': symbol, **success}
+            else:
+                results[i] = {'symbol': symbol, 'status': _error_status(error), 'error': str(error)}
+
+        return jsonify({'results': results}), 200
+
+    except Exception as e:
+        return jsonify({'error': 'An unexpected error occurred', 'details': str(e)}), 500
+
+
+@trading_stats_bp.route('/stats/batch/', methods=['POST'])
+def get_stats_batch():
+    """
+    Endpoint for retrieving statistical data for many (symbol, k) pairs in one request.
+    Queries of the same symbol share a single traversal of its data engine.
+    """
+    try:
+        data = request.get_json()
+        queries = data.get('queries')
+
+        if not isinstance(queries, list) or len(queries) > MAX_BULK_ITEMS:
+            return jsonify({'error': 'Invalid input, ensure queries is a list of up to 1000 objects with a symbol and k'}), 400
+
+        results = [None] * len(queries)
+        accepted = []
+        for i, query in enumerate(queries):
+            symbol = query.get('symbol') if isinstance(query, dict) else None
+            k = query.get('k') if isinstance(query, dict) else None
+
+            if not symbol or type(k) is not int or not (1 <= k <= 8):
+                results[i] = {'symbol': symbol, 'k': k, 'status': 400, 'error': 'Invalid input, ensure symbol is provided and k is an integer between 1 and 8'}
+            else:
+                accepted.append((i, symbol, k))
+
+        stats = service.get_stats_batch([(symbol, k) for _, symbol, k in accepted])
+
+        for (i, symbol, k), result in zip(accepted, stats):
+            if isinstance(result, TradingStatisticsServiceException):
+                results[i] = {'symbol': symbol, 'k': k, 'status': _error_status(result), 'error': str(result)}
+            else:
+                results[i] = {'symbol': symbol, 'k': k, 'status': 200, 'stats': result}
+
+        return jsonify({'results': results}), 200
+
+    except Exception as e:
+        return jsonify({'error': 'An unexpected error occurred', 'details': str(e)}), 500
+
+
+@trading_stats_bp.route('/admin/snapshot/', methods=['POST'])
+def take_snapshot():
+    """
+    Endpoint for writing a snapshot of all symbols to the configured SNAPSHOT_PATH.
+    """
+    try:
+        path = app.config["SNAPSHOT_PATH"]
+
+        if not path:
+            return jsonify({'error': 'Snapshots are not enabled, ensure SNAPSHOT_PATH is configured'}), 400
+
+        symbols = service.save_snapshot(path)
+        return jsonify({'message': 'Snapshot taken successfully', 'symbols': symbols}), 200
+
+    except Exception as e:
+        return jsonify({'error': 'An unexpected error occurred', 'details': str(e)}), 500
+
+
+@trading_stats_bp.route('/flush/', methods=['POST'])
+def flush():
+    """
+    Endpoint waiting until every batch accepted before the request has been applied, so that
+    subsequent stats requests reflect them. Answers right away when asynchronous ingest is disabled.
+    """
+    try:
+        if ingest_queue is not None and not ingest_queue.flush(app.config["INGEST_FLUSH_TIMEOUT_SECONDS"]):
+            return jsonify({'error': 'Timed out waiting for queued batches to be applied'}), 504
+
+        return jsonify({'message': 'All accepted batches are applied'}), 200
+
+    except Exception as e:
+        return jsonify({'error': 'An unexpected error occurred', 'details': str(e)}), 500
+
+
+@trading_stats_bp.route('/ingest/metrics/', methods=['GET'])
+def get_ingest_metrics():
+    """
+    Endpoint reporting the depth of the asynchronous ingest queue and how well batches are coalesced.
+    """
+    try:
+        if ingest_queue is None:
+            return jsonify({'error': 'Asynchronous ingest is not enabled, ensure ASYNC_INGEST is configured'}), 400
+
+        return jsonify(ingest_queue.metrics()), 200
+
+    except Exception as e:
+        return jsonify({'error': 'An unexpected error occurred', 'details': str(e)}), 500
+
+
+@trading_stats_bp.route('/memory/', methods=['GET'])
+def get_memory_stats():
+    """
+    Endpoint reporting the memory budget of the data engines: their estimated memory, the symbols
+    in memory and spilled to disk, the hit ratio of accesses, and the spill and reload latencies.
+    """
+    try:
+        if not hasattr(service, 'get_memory_stats') or service.spill_store is None:
+            return jsonify({'error': 'No memory budget is enabled, ensure MEMORY_BUDGET_BYTES is configured'}), 400
+
+        return jsonify(service.get_memory_stats()), 200
+
+    except Exception as e:
+        return jsonify({'error': 'An unexpected error occurred', 'details': str(e)}), 500
+
+
+@trading_stats_bp.route('/stream/', methods=['POST'])
+def stream_batches():
+    """
+    Endpoint for streaming ingest over a single long-lived request.
+
+    The request body is a stream (typically sent with chunked transfer encoding) of newline-delimited
+    JSON frames, {"symbol": "AAPL", "values": [1.0, 2.0]}. Frames are applied in micro-batches as
+    they arrive, and the response streams newline-delimited JSON acknowledgements of the progress.
+    """
+    ingestor = StreamIngestor(
+        service,
+        max_frame_values=MAX_BATCH_SIZE,
+        max_micro_batch_values=app.config["STREAM_MICRO_BATCH_VALUES"],
+        ack_interval_seconds=app.config["STREAM_ACK_INTERVAL_SECONDS"],
+    )
+
+    def acknowledgements():
+        # Reading a line returns as soon as a frame arrives, where a sized read may wait for more data
+        chunks = iter(request.stream.readline, b"")
+        try:
+            for ack in ingestor.ingest(chunks):
+                yield json.dumps(ack) + "\n"
+        except Exception as e:
+            yield json.dumps({'error': 'An unexpected error occurred', 'details': str(e)}) + "\n"
+
+    return app.response_class(stream_with_context(acknowledgements()), mimetype=NDJSON_MIMETYPE)
+
+
+@trading_stats_bp.route('/subscribe/', methods=['GET'])
+def subscribe():
+    """
+    Endpoint pushing the stats of a symbol as Server-Sent Events, for one or more window size
+    exponents (k), e.g. /subscribe/?symbol=AAPL&k=1&k=3.
+
+    An event is sent with the current stats, then after every batch added to the symbol. The stats
+    are computed once per batch for all the subscribers of the symbol, and a slow client only
+    receives the latest update. Comments are sent every SUBSCRIPTION_KEEPALIVE_SECONDS while idle.
+    """
+    symbol = request.args.get('symbol')
+    ks = request.args.getlist('k', type=int)
+
+    if not symbol or not ks or len(ks) != len(request.args.getlist('k')) or not all(1 <= k <= 8 for k in ks):
+        return jsonify({'error': 'Invalid input, ensure symbol is provided and every k is an integer between 1 and 8'}), 400
+
+    subscription = subscription_hub.subscribe(symbol, ks)
+    keepalive_seconds = app.config["SUBSCRIPTION_KEEPALIVE_SECONDS"]
+
+    def events():
+        try:
+            while True:
+                update = subscription.next_update(keepalive_seconds)
+                if update is None:
+                    # Unsubscribed, or the hub was closed on shutdown
+                    if subscription.closed:
+                        return
+                    # Also detects disconnected clients, whose write fails
+                    yield ": keep-alive\n\n"
+                    continue
+
+                yield f"id: {service.instance_id}-{update['version']}\nevent: stats\ndata: {json.dumps(update)}\n\n"
+        finally:
+            subscription_hub.unsubscribe(subscription)
+
+    response = app.response_class(events(), mimetype=EVENT_STREAM_MIMETYPE)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
@@ -0,0 +1,13 @@
+from flask import Flask
+
+from . import metrics_bp, trading_stats_bp
+from .config import DevelopmentConfig
+
+app = Flask(__package__)
+app.config.from_object(DevelopmentConfig)
+
+from .api.views import trading_statistics
+from .api.views import metrics
+
+app.register_blueprint(trading_stats_bp)
+app.register_blueprint(metrics_bp)
@@ -4,6 +4,33 @@ import os
 class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY", "not so secret key")
     MAX_CONTENT_SIZE = 10 * 1024 * 1024  # 10 MB
+    DATA_ENGINE = os.environ.get("DATA_ENGINE", "segment_tree")
+    STATS_CACHE_SIZE = int(os.environ.get("STATS_CACHE_SIZE", 1024))
+    STATS_CACHE_EVICTION_POLICY = os.environ.get("STATS_CACHE_EVICTION_POLICY", "lru")
+    SNAPSHOT_PATH = os.environ.get("SNAPSHOT_PATH")
+    SNAPSHOT_INTERVAL_SECONDS = float(os.environ.get("SNAPSHOT_INTERVAL_SECONDS", 0))
+    WAL_DIRECTORY = os.environ.get("WAL_DIRECTORY")
+    WAL_FLUSH_INTERVAL_SECONDS = float(os.environ.get("WAL_FLUSH_INTERVAL_SECONDS", 0.005))
+    SERVICE_MODE = os.environ.get("SERVICE_MODE", "single")
+    SHARD_COUNT = int(os.environ.get("SHARD_COUNT", 0)) or None
+    WRITER_ADDRESS = os.environ.get("WRITER_ADDRESS", "/tmp/trading-platform-writer.sock")
+    SHARED_MEMORY_NAMESPACE = os.environ.get("SHARED_MEMORY_NAMESPACE", "trading-platform")
+    ASYNC_INGEST = os.environ.get("ASYNC_INGEST", "false").lower() in ("1", "true", "yes")
+    INGEST_QUEUE_SIZE = int(os.environ.get("INGEST_QUEUE_SIZE", 10000))
+    INGEST_FLUSH_TIMEOUT_SECONDS = float(os.environ.get("INGEST_FLUSH_TIMEOUT_SECONDS", 30))
+    STREAM_MICRO_BATCH_VALUES = int(os.environ.get("STREAM_MICRO_BATCH_VALUES", 100000))
+    STREAM_ACK_INTERVAL_SECONDS = float(os.environ.get("STREAM_ACK_INTERVAL_SECONDS", 0.1))
+    SUBSCRIPTION_KEEPALIVE_SECONDS = float(os.environ.get("SUBSCRIPTION_KEEPALIVE_SECONDS", 15))
+    SUBSCRIPTION_POLL_INTERVAL_SECONDS = float(os.environ.get("SUBSCRIPTION_POLL_INTERVAL_SECONDS", 0.1))
+    REQUEST_LOG_PATH = os.environ.get("REQUEST_LOG_PATH")
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+    PROFILER_INTERVAL_SECONDS = float(os.environ.get("PROFILER_INTERVAL_SECONDS", 0.005))
+    SEGMENT_TREE_GROWTH_FACTOR = float(os.environ.get("SEGMENT_TREE_GROWTH_FACTOR", 2))
+    QUANTILE_SKETCH_MIN_LEAVES = int(os.environ.get("QUANTILE_SKETCH_MIN_LEAVES", 4096))
+    QUANTILE_SKETCH_RELATIVE_ACCURACY = float(os.environ.get("QUANTILE_SKETCH_RELATIVE_ACCURACY", 0.01))
+    CANDLE_RESOLUTIONS = [int(resolution) for resolution in os.environ.get("CANDLE_RESOLUTIONS", "").split(",") if resolution]
+    MEMORY_BUDGET_BYTES = int(os.environ.get("MEMORY_BUDGET_BYTES", 0)) or None
+    SPILL_DIRECTORY = os.environ.get("SPILL_DIRECTORY", "/tmp/trading-platform-spill")
 
 
 class DevelopmentConfig(Config):
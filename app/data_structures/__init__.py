@@ -0,0 +1,15 @@
+from app.data_structures.array_segment_tree import ArraySegmentTree
+from app.data_structures.compact_segment_tree import CompactArraySegmentTree
+from app.data_structures.quantile_segment_tree import QuantileArraySegmentTree
+from app.data_structures.rolling_windows import RollingWindows
+from app.data_structures.segment_tree import SegmentTree
+
+
+# Data engines that can be selected per deployment through the DATA_ENGINE setting
+DATA_ENGINES = {
+    "segment_tree": SegmentTree,
+    "array_segment_tree": ArraySegmentTree,
+    "rolling_windows": RollingWindows,
+    "quantile_array_segment_tree": QuantileArraySegmentTree,
+    "compact_array_segment_tree": CompactArraySegmentTree,
+}
@@ -0,0 +1,282 @@
+import numpy as np
+
+from app.data_structures.exceptions import SegmentTreeCapacityLimitReachedException
+
+
+def _next_power_of_two(value: int) -> int:
+    return 1 << max(value - 1, 0).bit_length()
+
+
+class ArraySegmentTree:
+    def __init__(
+        self,
+        capacity: int | None = 10 ** 2,
+        max_window_size: int | None = 10 ** 8,
+        capacity_buffer_factor: float | None = 1.2
+    ):
+        """
+        Initializes an ArraySegmentTree, a segment tree whose nodes are stored in NumPy arrays.
+
+        It behaves like `SegmentTree` (same parameters, same circular buffer of leaves), but instead
+        of a list of `StatsNode` objects it keeps one contiguous float64 array per statistic. Builds,
+        resizes and range updates are computed a whole tree level at a time with vectorized operations.
+
+        Parameters:
+        - capacity: The initial capacity of the segment tree, rounded up to a power of two.
+        - max_window_size: The maximum window size for which we need to provide stats.
+        - capacity_buffer_factor: a factor bounding the size of a single batch relative to max_window_size.
+
+        Attributes:
+        - size: The number of data points currently in the window.
+        - head: The offset (within the leaves) of the oldest data point in the window.
+        - mins, maxs, sums, sums_of_squares: The node arrays, of size `2 * capacity` each. Index 1 is
+          the root, node `i` has children `2 * i` and `2 * i + 1`, and the leaves start at `capacity`.
+        """
+        self.size = 0
+        self.head = 0
+        self.max_window_size = max_window_size
+        self.capacity_limit = self.max_window_size * capacity_buffer_factor
+        self.max_capacity = _next_power_of_two(self.max_window_size)
+        self.capacity = min(_next_power_of_two(capacity), self.max_capacity)
+        self._allocate(self.capacity)
+
+    def _allocate(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.mins = np.full(2 * capacity, np.inf)
+        self.maxs = np.full(2 * capacity, -np.inf)
+        self.sums = np.zeros(2 * capacity)
+        self.sums_of_squares = np.zeros(2 * capacity)
+
+    def get_data(self, last: int | None = None) -> np.ndarray:
+        """Returns the data points of the window (only the `last` most recent ones if given), oldest first."""
+        count = self.size if last is None else min(last, self.size)
+        start = (self.head + self.size - count) % self.capacity
+        end = start + count
+        leaves = self.mins[self.capacity:]
+
+        if end <= self.capacity:
+            return leaves[start:end].copy()
+        return np.concatenate((leaves[start:], leaves[:end - self.capacity]))
+
+    def _write_leaves(self, offset: int, values: np.ndarray) -> None:
+        leaves = slice(self.capacity + offset, self.capacity + offset + len(values))
+        self.mins[leaves] = values
+        self.maxs[leaves] = values
+        self.sums[leaves] = values
+        self.sums_of_squares[leaves] = values * values
+
+    def _clear_leaves(self, offset: int, count: int) -> None:
+        leaves = slice(self.capacity + offset, self.capacity + offset + count)
+        self.mins[leaves] = np.inf
+        self.maxs[leaves] = -np.inf
+        self.sums[leaves] = 0
+        self.sums_of_squares[leaves] = 0
+
+    def _aggregate_level(self, lo: int, hi: int) -> None:
+        """Recompute the nodes `lo` to `hi` (exclusive) of a single level from their children."""
+        left = slice(2 * lo, 2 * hi, 2)
+        right = slice(2 * lo + 1, 2 * hi, 2)
+        np.minimum(self.mins[left], self.mins[right], out=self.mins[lo:hi])
+        np.maximum(self.maxs[left], self.maxs[right], out=self.maxs[lo:hi])
+        np.add(self.sums[left], self.sums[right], out=self.sums[lo:hi])
+        np.add(self.sums_of_squares[left], self.sums_of_squares[right], out=self.sums_of_squares[lo:hi])
+
+    def _build_internal_nodes(self) -> None:
+        lo, hi = self.capacity // 2, self.capacity
+        while lo >= 1:
+            self._aggregate_level(lo, hi)
+            lo, hi = lo // 2, hi // 2
+
+    def _update_range(self, l: int, r: int) -> None:
+        """Recompute the internal nodes above the leaves between offsets `l` and `r` (inclusive)."""
+        l = (self.capacity + l) // 2
+        r = (self.capacity + r) // 2
+        while r >= 1:
+            self._aggregate_level(l, r + 1)
+            l //= 2
+            r //= 2
+
+    def _for_each_window_range(self, start: int, count: int, callback) -> None:
+        """Calls `callback(offset, count)` for the (at most two) leaf ranges holding `count` window positions from `start`."""
+        if count <= 0:
+            return
+
+        first = (self.head + start) % self.capacity
+        end = first + count
+
+        if end <= self.capacity:
+            callback(first, count)
+        else:
+            callback(first, self.capacity - first)
+            callback(0, end - self.capacity)
+
+    def _resize(self, required_capacity: int) -> None:
+        """Grow the node arrays so that they can hold `required_capacity` leaves."""
+        values = self.get_data()
+
+        self._allocate(min(_next_power_of_two(required_capacity), self.max_capacity))
+        self.head = 0
+        self._write_leaves(0, values)
+        self._build_internal_nodes()
+
+    def build(self, data: list[float]) -> None:
+        values = np.asarray(data, dtype=np.float64)
+
+        if len(values) > self.capacity_limit:
+            raise SegmentTreeCapacityLimitReachedException()
+
+        if len(values) > self.max_window_size:
+            values = values[len(values) - self.max_window_size:]
+
+        self._allocate(max(self.capacity, min(_next_power_of_two(len(values)), self.max_capacity)))
+        self.head = 0
+        self.size = len(values)
+        self._write_leaves(0, values)
+        self._build_internal_nodes()
+
+    def append_data(self, new_data: list[float]) -> None:
+        values = np.asarray(new_data, dtype=np.float64)
+
+        if len(values) > self.capacity_limit:
+            raise SegmentTreeCapacityLimitReachedException()
+
+        if len(values) > self.max_window_size:
+            values = values[len(values) - self.max_window_size:]
+
+        new_size = self.size + len(values)
+
+        if min(new_size, self.max_window_size) > self.capacity:
+            self._resize(min(new_size, self.max_window_size))
+
+        if new_size > self.max_window_size:
+            self.remove_old_data(new_size - self.max_window_size)
+
+        written = 0
+
+        def write(offset: int, count: int) -> None:
+            nonlocal written
+            self._write_leaves(offset, values[written:written + count])
+            self._update_range(offset, offset + count - 1)
+            written += count
+
+        self._for_each_window_range(self.size, len(values), write)
+        self.size += len(values)
+
+    def remove_old_data(self, count_to_remove: int) -> None:
+        """Remove old data when max size is exceeded."""
+        count_to_remove = min(count_to_remove, self.size)
+
+        def clear(offset: int, count: int) -> None:
+            self._clear_leaves(offset, count)
+            self._update_range(offset, offset + count - 1)
+
+        self._for_each_window_range(0, count_to_remove, clear)
+        self.head = (self.head + count_to_remove) % self.capacity
+        self.size -= count_to_remove
+
+    def _covering_nodes(self, l: int, r: int) -> list[int]:
+        """Returns the indices of the nodes exactly covering the leaves between offsets `l` and `r` (inclusive)."""
+        nodes = []
+        l += self.capacity
+        r += self.capacity
+
+        while l <= r:
+            if l % 2 == 1:
+                nodes.append(l)
+                l += 1
+            if r % 2 == 0:
+                nodes.append(r)
+                r -= 1
+            l //= 2
+            r //= 2
+
+        return nodes
+
+    def _window_nodes(self, start: int, count: int) -> list[int]:
+        """Returns the indices of the nodes exactly covering `count` window positions beginning at `start`."""
+        nodes = []
+        self._for_each_window_range(
+            start, count, lambda offset, length: nodes.extend(self._covering_nodes(offset, offset + length - 1))
+        )
+        return nodes
+
+    def _aggregate_window(self, start: int, count: int) -> tuple[float, float, float, float]:
+        """Aggregates the min, max, sum and sum of squares of `count` window positions beginning at `start`."""
+        nodes = self._window_nodes(start, count)
+        if not nodes:
+            return float('inf'), float('-inf'), 0.0, 0.0
+
+        return (
+            float(self.mins[nodes].min()), float(self.maxs[nodes].max()),
+            float(self.sums[nodes].sum()), float(self.sums_of_squares[nodes].sum())
+        )
+
+    def _leaf_value(self, offset: int) -> float:
+        """Returns the data point held by the leaf at `offset`."""
+        return float(self.mins[self.capacity + offset])
+
+    def _result(self, result_min: float, result_max: float, result_sum: float, result_sum_of_squares: float, count: int, end: int | None = None) -> tuple[float, float, float, float, float]:
+        """Formats the aggregate of `count` data points ending before window position `end` (the end of the window by default)."""
+        if count == 0:
+            return float('inf'), float('-inf'), None, 0, 0
+
+        end = self.size if end is None else end
+        last_number = self._leaf_value((self.head + end - 1) % self.capacity)
+
+        mean = round(result_sum / count, 2)
+        variance = round(result_sum_of_squares / count - mean ** 2, 2)
+
+        return result_min, result_max, last_number, mean, variance
+
+    def query(self, k: int) -> tuple[float, float, float, float, float]:
+        """
+        Queries the last 10^k elements of the segment tree for statistical data.
+
+        Args:
+            k: The exponent defining the range of data to query.
+
+        Returns:
+            A tuple containing the minimum, maximum, last number, average and variance of the range.
+        """
+        return self.query_many([k])[0]
+
+    def query_range(self, start: int, count: int) -> tuple[float, float, float, float, float]:
+        """
+        Queries `count` data points beginning at window position `start` (0 being the oldest data point).
+
+        Returns:
+            A tuple containing the minimum, maximum, last number, average and variance of the range,
+            the last number being that of the range rather than of the window.
+        """
+        start = max(start, 0)
+        count = max(min(count, self.size - start), 0)
+
+        return self._result(*self._aggregate_window(start, count), count, start + count)
+
+    def query_many(self, ks: list[int]) -> list[tuple[float, float, float, float, float]]:
+        """
+        Queries the last 10^k elements for several values of k in a single traversal.
+
+        The windows are nested suffixes of the data, so each window is aggregated from the next smaller
+        one plus the data points between the two, and every covering node is visited only once.
+
+        Returns:
+            The `query` result of every k, in the order of `ks`.
+        """
+        results = {}
+        result_min, result_max, result_sum, result_sum_of_squares = float('inf'), float('-inf'), 0.0, 0.0
+        covered = 0
+
+        for k in sorted(set(ks)):
+            count = min(10 ** k, self.size)
+            if count > covered:
+                window_min, window_max, window_sum, window_sum_of_squares = self._aggregate_window(self.size - count, count - covered)
+                result_min = min(result_min, window_min)
+                result_max = max(result_max, window_max)
+                result_sum += window_sum
+                result_sum_of_squares += window_sum_of_squares
+
+            covered = count
+            results[k] = self._result(result_min, result_max, result_sum, result_sum_of_squares, count)
+
+        return [results[k] for k in ks]
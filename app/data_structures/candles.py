@@ -0,0 +1,141 @@
+import numpy as np
+
+# The columns of the candle arrays
+OPEN, HIGH, LOW, CLOSE, SUM = range(5)
+
+
+class CandleRollup:
+    def __init__(self, resolution: int, capacity: int = 16):
+        """
+        Initializes a CandleRollup, the open/high/low/close/mean candles of consecutive buckets of
+        `resolution` data points, maintained as data points are appended.
+
+        Buckets are aligned to the number of data points appended so far: candle `i` covers data
+        points `[i * resolution, (i + 1) * resolution)`, the last candle being partial until its bucket
+        is complete. Appending a batch completes the last candle, then computes the candles of the
+        complete buckets of the batch in one vectorized pass over a reshaped view of it.
+
+        The candles are stored in one `(capacity, 5)` float64 array, with the live ones at rows
+        `[head, head + size)`. Trimming old candles only moves `head`. When an append reaches the end
+        of the array, the live candles are moved back to its start, or into an array twice as large
+        when more than half of it is in use.
+
+        Parameters:
+        - resolution: The number of data points per candle.
+        - capacity: The initial number of candles the array can hold.
+
+        Attributes:
+        - count: The number of data points appended so far.
+        - first: The index of the oldest candle kept.
+        """
+        self.resolution = resolution
+        self.candles = np.zeros((max(capacity, 1), 5))
+        self.head = 0
+        self.size = 0
+        self.first = 0
+        self.count = 0
+
+    def _reserve(self, new_candles: int) -> None:
+        if self.head + self.size + new_candles <= len(self.candles):
+            return
+
+        required = self.size + new_candles
+        capacity = len(self.candles)
+        while required > capacity // 2:
+            capacity *= 2
+
+        live = self.candles[self.head:self.head + self.size]
+        if capacity == len(self.candles):
+            self.candles[:self.size] = live
+        else:
+            resized = np.zeros((capacity, 5))
+            resized[:self.size] = live
+            self.candles = resized
+        self.head = 0
+
+    def append(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+
+        filled = self.count % self.resolution
+        if filled:
+            # Completes the last candle, which is partial
+            head, values = values[:self.resolution - filled], values[self.resolution - filled:]
+            last = self.candles[self.head + self.size - 1]
+            last[HIGH] = max(last[HIGH], head.max())
+            last[LOW] = min(last[LOW], head.min())
+            last[CLOSE] = head[-1]
+            last[SUM] += head.sum()
+            self.count += len(head)
+
+        complete = len(values) // self.resolution
+        partial = len(values) - complete * self.resolution
+        self._reserve(complete + (partial > 0))
+
+        end = self.head + self.size
+        if complete:
+            buckets = values[:complete * self.resolution].reshape(complete, self.resolution)
+            candles = self.candles[end:end + complete]
+            candles[:, OPEN] = buckets[:, 0]
+            candles[:, HIGH] = buckets.max(axis=1)
+            candles[:, LOW] = buckets.min(axis=1)
+            candles[:, CLOSE] = buckets[:, -1]
+            candles[:, SUM] = buckets.sum(axis=1)
+        if partial:
+            tail = values[complete * self.resolution:]
+            self.candles[end + complete] = (tail[0], tail.max(), tail.min(), tail[-1], tail.sum())
+
+        self.size += complete + (partial > 0)
+        self.count += len(values)
+
+    def trim(self, retained: int) -> None:
+        """Drops the candles of buckets holding none of the last `retained` data points."""
+        first = max(self.count - retained, 0) // self.resolution
+        dropped = min(max(first - self.first, 0), self.size)
+        self.head += dropped
+        self.size -= dropped
+        self.first += dropped
+
+    def read(self, end: int | None = None, count: int | None = None) -> tuple[int, dict[str, np.ndarray]]:
+        """
+        Reads a contiguous range of candles as one slice of the candle array.
+
+        Args:
+            end: The index after the last candle to read, by default the end of the candles.
+            count: The maximum number of candles to read, all of those kept by default.
+
+        Returns:
+            The index of the first candle read, and the open, high, low, close and mean columns of the candles.
+        """
+        last = self.first + self.size
+        end = last if end is None else min(max(end, self.first), last)
+        start = self.first if count is None else max(end - count, self.first)
+
+        candles = self.candles[self.head + start - self.first:self.head + end - self.first]
+        counts = np.full(len(candles), float(self.resolution))
+        if len(candles) and end == last and self.count % self.resolution:
+            counts[-1] = self.count % self.resolution
+
+        return start, {
+            "open": candles[:, OPEN],
+            "high": candles[:, HIGH],
+            "low": candles[:, LOW],
+            "close": candles[:, CLOSE],
+            "mean": candles[:, SUM] / counts,
+        }
+
+
+class CandleRollups:
+    def __init__(self, resolutions: list[int]):
+        """The candle rollups of a symbol at several resolutions (see `CandleRollup`)."""
+        self.rollups = {resolution: CandleRollup(resolution) for resolution in resolutions}
+
+    def append(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        for rollup in self.rollups.values():
+            rollup.append(values)
+
+    def trim(self, retained: int) -> None:
+        for rollup in self.rollups.values():
+            rollup.trim(retained)
@@ -0,0 +1,174 @@
+import math
+
+import numpy as np
+
+from app.data_structures.array_segment_tree import ArraySegmentTree
+
+
+def _as_float(value: np.float32) -> float:
+    """Converts a float32 to the shortest float with the same float32 value, e.g. 100.1 rather than 100.0999984741211."""
+    return float(str(value))
+
+
+class CompactArraySegmentTree(ArraySegmentTree):
+    def __init__(
+        self,
+        capacity: int | None = 10 ** 2,
+        max_window_size: int | None = 10 ** 8,
+        capacity_buffer_factor: float | None = 1.2,
+        block_size: int = 32
+    ):
+        """
+        Initializes a CompactArraySegmentTree, an ArraySegmentTree storing about 5.5 bytes per data
+        point instead of 64, for data points which fit in float32 (e.g. most prices).
+
+        The leaves hold every data point once, as a float32 (NaN marking the leaves outside the
+        window). Only the nodes covering at least `block_size` leaves are stored: their min and max
+        as float32, their sum and sum of squares as float64. The squares of float32 values are exact
+        in float64, each node adds up its two children (a pairwise summation, whose error grows
+        with log n rather than n), and queries add up the sums of their nodes with `math.fsum`, so
+        sums keep their precision over 10^8 data point windows.
+
+        A query aggregates the O(log n) stored nodes covering the window, plus the leaves of the
+        (at most two) blocks it covers partially, read directly.
+
+        Values are rounded to float32 when they are stored: min, max and last are reported as the
+        shortest decimal with the same float32 value, which is the value ingested when it has at
+        most 7 significant digits.
+
+        Parameters (on top of those of ArraySegmentTree):
+        - block_size: The number of leaves covered by the smallest stored nodes, rounded up to a
+          power of two. Larger values save memory at the cost of reading more leaves per query.
+
+        Attributes:
+        - values: The leaves, `capacity` float32 values.
+        - mins, maxs, sums, sums_of_squares: The node arrays, of size `2 * capacity / block_size`.
+          Index 1 is the root, node `i` has children `2 * i` and `2 * i + 1`, and the smallest
+          stored nodes (one per block of leaves) start at `capacity / block_size`.
+        """
+        self.block_shift = max(int(block_size) - 1, 0).bit_length()
+        super().__init__(capacity, max_window_size, capacity_buffer_factor)
+
+    def _allocate(self, capacity: int) -> None:
+        self.capacity = capacity
+        # Blocks never cover more leaves than the tree holds
+        self.leaf_shift = min(self.block_shift, capacity.bit_length() - 1)
+        nodes = (2 * capacity) >> self.leaf_shift
+
+        self.values = np.full(capacity, np.nan, dtype=np.float32)
+        self.mins = np.full(nodes, np.inf, dtype=np.float32)
+        self.maxs = np.full(nodes, -np.inf, dtype=np.float32)
+        self.sums = np.zeros(nodes)
+        self.sums_of_squares = np.zeros(nodes)
+
+    @property
+    def blocks(self) -> int:
+        """The number of blocks of leaves, which is also the index of the node of the first block."""
+        return self.capacity >> self.leaf_shift
+
+    def get_data(self, last: int | None = None) -> np.ndarray:
+        """Returns the data points of the window (only the `last` most recent ones if given), oldest first."""
+        count = self.size if last is None else min(last, self.size)
+        start = (self.head + self.size - count) % self.capacity
+        end = start + count
+
+        if end <= self.capacity:
+            return self.values[start:end].astype(np.float64)
+        return np.concatenate((self.values[start:], self.values[:end - self.capacity])).astype(np.float64)
+
+    def _write_leaves(self, offset: int, values: np.ndarray) -> None:
+        self.values[offset:offset + len(values)] = values
+
+    def _clear_leaves(self, offset: int, count: int) -> None:
+        self.values[offset:offset + count] = np.nan
+
+    def _leaf_value(self, offset: int) -> float:
+        return _as_float(self.values[offset])
+
+    def _update_blocks(self, first: int, last: int) -> None:
+        """Recompute the nodes of the blocks `first` to `last` (inclusive) from their leaves."""
+        # Bounds the temporary arrays when a whole tree is built
+        chunk = max(1 << 20 >> self.leaf_shift, 1)
+
+        for lo in range(first, last + 1, chunk):
+            hi = min(lo + chunk, last + 1)
+            leaves = self.values[lo << self.leaf_shift:hi << self.leaf_shift].reshape(hi - lo, -1)
+            empty = np.isnan(leaves)
+            wide = np.where(empty, 0.0, leaves.astype(np.float64))
+
+            nodes = slice(self.blocks + lo, self.blocks + hi)
+            self.mins[nodes] = np.where(empty, np.inf, leaves).min(axis=1)
+            self.maxs[nodes] = np.where(empty, -np.inf, leaves).max(axis=1)
+            self.sums[nodes] = wide.sum(axis=1)
+            self.sums_of_squares[nodes] = (wide * wide).sum(axis=1)
+
+    def _build_internal_nodes(self) -> None:
+        self._update_blocks(0, self.blocks - 1)
+
+        lo, hi = self.blocks // 2, self.blocks
+        while lo >= 1:
+            self._aggregate_level(lo, hi)
+            lo, hi = lo // 2, hi // 2
+
+    def _update_range(self, l: int, r: int) -> None:
+        """Recompute the nodes above the leaves between offsets `l` and `r` (inclusive)."""
+        first, last = l >> self.leaf_shift, r >> self.leaf_shift
+        self._update_blocks(first, last)
+
+        l = (self.blocks + first) // 2
+        r = (self.blocks + last) // 2
+        while r >= 1:
+            self._aggregate_level(l, r + 1)
+            l //= 2
+            r //= 2
+
+    def _block_nodes(self, l: int, r: int) -> list[int]:
+        """Returns the indices of the nodes exactly covering the blocks `l` to `r` (inclusive)."""
+        nodes = []
+        l += self.blocks
+        r += self.blocks
+
+        while l <= r:
+            if l % 2 == 1:
+                nodes.append(l)
+                l += 1
+            if r % 2 == 0:
+                nodes.append(r)
+                r -= 1
+            l //= 2
+            r //= 2
+
+        return nodes
+
+    def _aggregate_window(self, start: int, count: int) -> tuple[float, float, float, float]:
+        nodes, leaf_ranges = [], []
+
+        def cover(offset: int, length: int) -> None:
+            # The blocks lying entirely within the leaves, and the leaves before and after them
+            first = (offset + (1 << self.leaf_shift) - 1) >> self.leaf_shift
+            end = (offset + length) >> self.leaf_shift
+
+            if first < end:
+                nodes.extend(self._block_nodes(first, end - 1))
+                leaf_ranges.append(self.values[offset:first << self.leaf_shift])
+                leaf_ranges.append(self.values[end << self.leaf_shift:offset + length])
+            else:
+                leaf_ranges.append(self.values[offset:offset + length])
+
+        self._for_each_window_range(start, count, cover)
+
+        leaves = np.concatenate(leaf_ranges).astype(np.float64) if leaf_ranges else np.zeros(0)
+        if not nodes and not len(leaves):
+            return float('inf'), float('-inf'), 0.0, 0.0
+
+        mins = [self.mins[nodes].min()] if nodes else []
+        maxs = [self.maxs[nodes].max()] if nodes else []
+        if len(leaves):
+            mins.append(leaves.min())
+            maxs.append(leaves.max())
+
+        return (
+            _as_float(np.float32(min(mins))), _as_float(np.float32(max(maxs))),
+            math.fsum([*self.sums[nodes].tolist(), leaves.sum()]),
+            math.fsum([*self.sums_of_squares[nodes].tolist(), (leaves * leaves).sum()])
+        )
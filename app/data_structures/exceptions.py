@@ -3,3 +3,9 @@ class SegmentTreeException(Exception):
 
 class SegmentTreeCapacityLimitReachedException(SegmentTreeException):
     pass
+
+class TimestampIndexException(Exception):
+    pass
+
+class TimestampsNotMonotonicException(TimestampIndexException):
+    pass
@@ -0,0 +1,129 @@
+import numpy as np
+
+from app.data_structures.array_segment_tree import ArraySegmentTree
+from app.data_structures.quantile_sketch import QuantileSketchMapping
+
+
+class QuantileArraySegmentTree(ArraySegmentTree):
+    def __init__(
+        self,
+        capacity: int | None = 10 ** 2,
+        max_window_size: int | None = 10 ** 8,
+        capacity_buffer_factor: float | None = 1.2,
+        sketch_min_leaves: int = 2 ** 12,
+        relative_accuracy: float = 0.01,
+        min_value: float = 1e-2,
+        max_value: float = 1e6
+    ):
+        """
+        Initializes a QuantileArraySegmentTree, an ArraySegmentTree whose nodes also carry a mergeable
+        quantile sketch (see `QuantileSketchMapping`), to estimate percentiles of the 10^k windows.
+
+        Only the nodes covering at least `sketch_min_leaves` leaves hold a sketch, which bounds the
+        memory overhead to about `8 * bins / sketch_min_leaves` bytes per leaf. A window is covered
+        by O(log n) nodes: the sketches of the upper ones are added together, and the leaves of the
+        lower ones (fewer than `4 * sketch_min_leaves` in total) are counted directly. A quantile query
+        therefore costs O(log n * bins + sketch_min_leaves), and its estimates are within
+        `relative_accuracy` of the exact quantiles for magnitudes between min_value and max_value.
+
+        Sketches are updated incrementally: appended values are added to the sketches above their
+        leaves, and evicted values are subtracted from them. Builds and resizes count them once
+        from the leaves.
+
+        Parameters (on top of those of ArraySegmentTree):
+        - sketch_min_leaves: The number of leaves covered by the smallest nodes with a sketch, rounded
+          up to a power of two. Larger values save memory at the cost of slower quantile queries.
+        - relative_accuracy, min_value, max_value: The accuracy and range of the sketches.
+
+        Attributes:
+        - sketches: The sketch counts, one row per node with a sketch; row `i` is node `i`.
+        """
+        self.sketch_shift = max(int(sketch_min_leaves) - 1, 0).bit_length()
+        self.mapping = QuantileSketchMapping(relative_accuracy, min_value, max_value)
+        super().__init__(capacity, max_window_size, capacity_buffer_factor)
+
+    @property
+    def sketch_nodes(self) -> int:
+        """The nodes with a sketch are those with an index below this one."""
+        return (2 * self.capacity) >> self.sketch_shift
+
+    def _allocate(self, capacity: int) -> None:
+        super()._allocate(capacity)
+        self.sketches = np.zeros((max(self.sketch_nodes, 1), self.mapping.bins), dtype=np.int32)
+
+    def _update_sketches(self, l: int, r: int, sign: int) -> None:
+        """Adds (sign 1) or subtracts (sign -1) the values of the leaves between offsets `l` and `r` (inclusive) to the sketches above them."""
+        if self.sketch_nodes <= 1:
+            return
+
+        values = self.mins[self.capacity + l:self.capacity + r + 1]
+        positions = np.flatnonzero(np.isfinite(values))
+        if len(positions) == 0:
+            return
+
+        bins = self.mapping.bins_of(values[positions])
+        nodes = (self.capacity + l + positions) >> self.sketch_shift
+        while nodes[0] >= 1:
+            # The nodes of a level above a range of leaves are contiguous
+            first, last = nodes[0], nodes[-1]
+            counts = np.bincount((nodes - first) * self.mapping.bins + bins, minlength=(last - first + 1) * self.mapping.bins)
+            self.sketches[first:last + 1] += sign * counts.reshape(last - first + 1, -1).astype(np.int32)
+            nodes = nodes >> 1
+
+    def _update_range(self, l: int, r: int) -> None:
+        # Called once leaves were written (and after they were cleared, when they no longer count)
+        super()._update_range(l, r)
+        self._update_sketches(l, r, 1)
+
+    def _clear_leaves(self, offset: int, count: int) -> None:
+        self._update_sketches(offset, offset + count - 1, -1)
+        super()._clear_leaves(offset, count)
+
+    def _build_internal_nodes(self) -> None:
+        super()._build_internal_nodes()
+
+        self.sketches[:] = 0
+        lo, hi = self.sketch_nodes // 2, self.sketch_nodes
+        if lo < 1:
+            return
+
+        # The lowest nodes with a sketch are counted from their leaves, the upper ones from their children
+        leaves = self.mins[self.capacity:]
+        positions = np.flatnonzero(np.isfinite(leaves))
+        cells = (positions >> self.sketch_shift) * self.mapping.bins + self.mapping.bins_of(leaves[positions])
+        self.sketches[lo:hi] = np.bincount(cells, minlength=(hi - lo) * self.mapping.bins).reshape(hi - lo, -1)
+
+        lo, hi = lo // 2, hi // 2
+        while lo >= 1:
+            self.sketches[lo:hi] = self.sketches[2 * lo:2 * hi:2] + self.sketches[2 * lo + 1:2 * hi:2]
+            lo, hi = lo // 2, hi // 2
+
+    def _window_sketch(self, start: int, count: int) -> np.ndarray:
+        """Returns the sketch of `count` window positions beginning at `start`."""
+        counts = np.zeros(self.mapping.bins, dtype=np.int64)
+        nodes = self._window_nodes(start, count)
+
+        sketched = [node for node in nodes if node < self.sketch_nodes]
+        if sketched:
+            counts += self.sketches[sketched].sum(axis=0)
+
+        # The leaves of the smaller nodes, node `i` at depth d covering leaves [i << h, (i + 1) << h) with h = log2(capacity) - d
+        height = self.capacity.bit_length() - 1
+        ranges = [
+            self.mins[node << (height - node.bit_length() + 1):(node + 1) << (height - node.bit_length() + 1)]
+            for node in nodes if node >= self.sketch_nodes
+        ]
+        if ranges:
+            counts += self.mapping.counts_of(np.concatenate(ranges))
+
+        return counts
+
+    def query_quantiles(self, k: int, quantiles: list[float]) -> list[float | None]:
+        """
+        Estimates quantiles (between 0 and 1) of the last 10^k data points.
+
+        Returns:
+            The estimate of every quantile, None if the tree is empty.
+        """
+        count = min(10 ** k, self.size)
+        return self.mapping.quantiles(self._window_sketch(self.size - count, count), quantiles)
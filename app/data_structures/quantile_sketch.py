@@ -0,0 +1,78 @@
+import math
+
+import numpy as np
+
+
+class QuantileSketchMapping:
+    def __init__(self, relative_accuracy: float = 0.01, min_value: float = 1e-2, max_value: float = 1e6):
+        """
+        Maps values to the buckets of a DDSketch-style quantile sketch, whose counts are stored in a
+        dense array of `bins` buckets, so that sketches are merged by adding their arrays.
+
+        Positive values fall in logarithmically sized buckets: bucket `key` holds the values in
+        `(gamma^(key - 1), gamma^key]`, with `gamma = (1 + relative_accuracy) / (1 - relative_accuracy)`.
+        Estimating every value of a bucket by `2 * gamma^key / (gamma + 1)` is off by at most
+        `relative_accuracy` times the value. Negative values use the same buckets mirrored, and values
+        whose magnitude is below `min_value` share a bucket estimated as 0.
+
+        The array layout is `[negative buckets, zero bucket, positive buckets]`, in increasing order of
+        values, so quantiles are read from the cumulative counts.
+
+        Parameters:
+        - relative_accuracy: The relative error of the quantiles of values whose magnitude is between
+          min_value and max_value. Magnitudes above max_value are counted in the last bucket, and their
+          quantiles are only known to be at least max_value.
+        - min_value, max_value: The range of magnitudes with buckets of their own.
+
+        Attributes:
+        - bins: The number of buckets of a sketch.
+        """
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.max_value = max_value
+
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.min_key = math.ceil(math.log(min_value) / self.log_gamma)
+        self.max_key = math.ceil(math.log(max_value) / self.log_gamma)
+
+        # The number of buckets for the values of each sign
+        self.side_bins = self.max_key - self.min_key + 1
+        self.zero_bin = self.side_bins
+        self.bins = 2 * self.side_bins + 1
+
+        keys = np.arange(self.min_key, self.max_key + 1)
+        magnitudes = 2 * np.power(self.gamma, keys) / (self.gamma + 1)
+        # The value estimated for every bucket, in the order of the array layout
+        self.bin_values = np.concatenate((-magnitudes[::-1], [0.0], magnitudes))
+
+    def bins_of(self, values: np.ndarray) -> np.ndarray:
+        """Returns the bucket index of every value."""
+        values = np.asarray(values, dtype=np.float64)
+        magnitudes = np.abs(values)
+
+        with np.errstate(divide="ignore"):
+            keys = np.ceil(np.log(np.maximum(magnitudes, self.min_value)) / self.log_gamma)
+        offsets = np.clip(keys, self.min_key, self.max_key).astype(np.int64) - self.min_key
+
+        bins = np.where(values > 0, self.zero_bin + 1 + offsets, self.side_bins - 1 - offsets)
+        return np.where(magnitudes < self.min_value, self.zero_bin, bins)
+
+    def counts_of(self, values: np.ndarray) -> np.ndarray:
+        """Returns the sketch of a set of values."""
+        return np.bincount(self.bins_of(values), minlength=self.bins)
+
+    def quantiles(self, counts: np.ndarray, quantiles: list[float]) -> list[float | None]:
+        """
+        Estimates quantiles (between 0 and 1) from the counts of a sketch; None when it is empty.
+
+        The q-quantile is the value of rank `q * (n - 1)` (0 being the smallest) among the n values.
+        """
+        cumulative = np.cumsum(counts)
+        total = int(cumulative[-1]) if len(cumulative) else 0
+        if total == 0:
+            return [None] * len(quantiles)
+
+        ranks = np.floor(np.asarray(quantiles, dtype=np.float64) * (total - 1))
+        bins = np.searchsorted(cumulative, ranks, side="right")
+        return [float(self.bin_values[b]) for b in bins]
@@ -0,0 +1,84 @@
+import numpy as np
+
+
+def sliding_extremum(values: np.ndarray, window: int, starts: np.ndarray, operation: np.ufunc) -> np.ndarray:
+    """
+    Computes the min (operation np.minimum) or max (np.maximum) of the windows of `window` values
+    beginning at `starts`, with the van Herk/Gil-Werman algorithm: the values are cut into blocks
+    of `window` values, so that every window spans a suffix of one block and a prefix of the next.
+    The running extrema of the prefixes and suffixes of all blocks are computed at once, and each
+    window combines two of them: about three comparisons per value, whatever the window length.
+    """
+    blocks = -(-len(values) // window)
+    padding = np.inf if operation is np.minimum else -np.inf
+    by_block = np.concatenate((values, np.full(blocks * window - len(values), padding))).reshape(blocks, window)
+
+    prefixes = operation.accumulate(by_block, axis=1).ravel()
+    suffixes = operation.accumulate(by_block[:, ::-1], axis=1)[:, ::-1].ravel()
+    return operation(suffixes[starts], prefixes[starts + window - 1])
+
+
+def series_span(window: int, count: int, stride: int = 1, offset: int = 0) -> int:
+    """Returns the number of most recent data points a series of windows (see `rolling_stats`) can read."""
+    return offset + stride * (count - 1) + window
+
+
+def rolling_stats(values: np.ndarray, window: int, count: int, stride: int = 1, offset: int = 0) -> dict[str, list]:
+    """
+    Computes the stats of many windows of the same length in one vectorized pass, in O(n + count).
+
+    The windows end `offset`, `offset + stride`, `offset + 2 * stride`, ... data points before the
+    last one, and only windows lying entirely within the data are returned. Sums and sums of squares
+    come from prefix sums of the values shifted by their first one, which keeps their magnitude and
+    rounding errors small, min and max from `sliding_extremum`. Like the engines, the mean is rounded
+    before its square is subtracted from the mean of the squares to give the variance.
+
+    Args:
+        values: The data points, oldest first.
+        window: The number of data points per window.
+        count: The maximum number of windows.
+        stride: The number of data points between the ends of consecutive windows.
+        offset: The number of most recent data points after the newest window.
+
+    Returns:
+        The offset of every window (the number of data points after it), and its min, max, last,
+        avg and var (rounded to 2 decimals), all as lists ordered oldest first.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    available = (len(values) - offset - window) // stride + 1 if len(values) - offset >= window else 0
+    count = max(min(count, available), 0)
+
+    offsets = offset + stride * np.arange(count - 1, -1, -1)
+    if count == 0:
+        return {"offsets": [], "min": [], "max": [], "last": [], "avg": [], "var": []}
+
+    # Only the data points covered by the windows are read
+    first = len(values) - offsets[0] - window
+    values = values[first:len(values) - offset]
+    ends = len(values) - (offsets - offset)
+    starts = ends - window
+
+    shift = values[0]
+    shifted = values - shift
+    sums = np.concatenate(([0.0], np.cumsum(shifted)))
+    sums_of_squares = np.concatenate(([0.0], np.cumsum(shifted * shifted)))
+
+    shifted_means = (sums[ends] - sums[starts]) / window
+    means = np.array([round(mean, 2) for mean in (shifted_means + shift).tolist()])
+    # E[x^2] - m^2 for the rounded mean m, expanded around the shift c to avoid subtracting large
+    # squares: with d = m - c, it is E[(x - c)^2] + 2c(E[x - c] - d) - d^2
+    rounded_shifted_means = means - shift
+    variances = (
+        (sums_of_squares[ends] - sums_of_squares[starts]) / window
+        + 2 * shift * (shifted_means - rounded_shifted_means)
+        - rounded_shifted_means * rounded_shifted_means
+    )
+
+    return {
+        "offsets": offsets.tolist(),
+        "min": sliding_extremum(values, window, starts, np.minimum).tolist(),
+        "max": sliding_extremum(values, window, starts, np.maximum).tolist(),
+        "last": values[ends - 1].tolist(),
+        "avg": means.tolist(),
+        "var": [round(variance, 2) for variance in variances.tolist()],
+    }
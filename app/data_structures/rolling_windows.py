@@ -0,0 +1,215 @@
+import numpy as np
+
+from app.data_structures.exceptions import SegmentTreeCapacityLimitReachedException
+
+
+class RollingWindows:
+    def __init__(
+        self,
+        max_window_size: int | None = 10 ** 8,
+        capacity_buffer_factor: float | None = 1.2
+    ):
+        """
+        Initializes a RollingWindows engine, specialised for the fixed windows of the last 10^k data points.
+
+        Instead of a tree answering arbitrary suffix windows, it keeps the statistics of every window
+        10^0, 10^1, ... up to max_window_size ready to read, so `query(k)` is O(1):
+        - The sum and sum of squares of each window are maintained as running totals. They are
+          recomputed exactly every time a window-sized block of data completes, so rounding errors of
+          the running totals never accumulate.
+        - Min and max use a block decomposition aligned to the window size 10^k: the stream is cut into
+          blocks of 10^k points, and the last 10^k points always span the suffix of the previous block and
+          the prefix of the current one. The engine keeps the running min/max of the current block and,
+          when a block completes, its suffix min/max arrays (computed with a single vectorized pass).
+
+        Appending a batch costs O(batch) vectorized work per window, amortised over the block recomputations.
+
+        Parameters:
+        - max_window_size: The maximum window size for which we need to provide stats.
+        - capacity_buffer_factor: a factor bounding the size of a single batch relative to max_window_size.
+
+        Attributes:
+        - size: The number of data points currently in the largest window.
+        - count: The total number of data points appended so far.
+        - windows: The window size of every supported exponent k (windows[k] == min(10^k, max_window_size)).
+        """
+        self.max_window_size = max_window_size
+        self.capacity_limit = self.max_window_size * capacity_buffer_factor
+
+        self.windows = [1]
+        while self.windows[-1] < self.max_window_size:
+            self.windows.append(min(self.windows[-1] * 10, self.max_window_size))
+
+        self._reset()
+
+    def _reset(self) -> None:
+        self.size = 0
+        self.count = 0
+        self.history = np.zeros(0)
+        self.sums = np.zeros(len(self.windows))
+        self.sums_of_squares = np.zeros(len(self.windows))
+        self.block_mins = np.full(len(self.windows), np.inf)
+        self.block_maxs = np.full(len(self.windows), -np.inf)
+        self.suffix_mins = [np.zeros(0) for _ in self.windows]
+        self.suffix_maxs = [np.zeros(0) for _ in self.windows]
+
+    def _read(self, start: int, end: int) -> np.ndarray:
+        """Returns the data points with (absolute) indices between `start` and `end` (exclusive)."""
+        if end - start <= 0:
+            return self.history[:0]
+
+        capacity = len(self.history)
+        first, last = start % capacity, (end - 1) % capacity + 1
+
+        if first < last:
+            return self.history[first:last]
+        return np.concatenate((self.history[first:], self.history[:last]))
+
+    def _write(self, start: int, values: np.ndarray) -> None:
+        capacity = len(self.history)
+        first = start % capacity
+        head = min(len(values), capacity - first)
+
+        self.history[first:first + head] = values[:head]
+        self.history[:len(values) - head] = values[head:]
+
+    def _ensure_history(self, batch_size: int) -> None:
+        """
+        Grow the circular history so that it holds the largest window plus the incoming batch.
+
+        Completing a block requires the values of the whole block, which may start up to one window
+        before the first value of the batch.
+        """
+        required = min(self.count, self.max_window_size) + batch_size
+        if required <= len(self.history):
+            return
+
+        kept = min(self.count, len(self.history))
+        values = self._read(self.count - kept, self.count).copy()
+
+        self.history = np.zeros(min(max(required, 2 * len(self.history)), int(self.max_window_size + self.capacity_limit)))
+        if kept:
+            self._write(self.count - kept, values)
+
+    def get_data(self, last: int | None = None) -> np.ndarray:
+        """Returns the data points of the largest window (only the `last` most recent ones if given), oldest first."""
+        count = self.size if last is None else min(last, self.size)
+        return self._read(self.count - count, self.count).copy()
+
+    def build(self, data: list[float]) -> None:
+        values = np.asarray(data, dtype=np.float64)
+
+        if len(values) > self.capacity_limit:
+            raise SegmentTreeCapacityLimitReachedException()
+
+        self._reset()
+        self.append_data(values)
+
+    def append_data(self, new_data: list[float]) -> None:
+        values = np.asarray(new_data, dtype=np.float64)
+
+        if len(values) > self.capacity_limit:
+            raise SegmentTreeCapacityLimitReachedException()
+
+        if len(values) == 0:
+            return
+
+        if len(values) > self.max_window_size:
+            # None of the existing data remains in any window
+            self._reset()
+            values = values[len(values) - self.max_window_size:]
+
+        self._ensure_history(len(values))
+
+        previous_count = self.count
+        self._write(previous_count, values)
+        self.count += len(values)
+        self.size = min(self.count, self.max_window_size)
+
+        batch_sum = values.sum()
+        batch_sum_of_squares = np.dot(values, values)
+
+        for k, window in enumerate(self.windows):
+            previous_block = (previous_count - 1) // window if previous_count else -1
+            block = (self.count - 1) // window
+
+            if block == previous_block:
+                self.block_mins[k] = min(self.block_mins[k], values.min())
+                self.block_maxs[k] = max(self.block_maxs[k], values.max())
+
+                leaving = self._read(max(previous_count - window, 0), max(self.count - window, 0))
+                self.sums[k] += batch_sum - leaving.sum()
+                self.sums_of_squares[k] += batch_sum_of_squares - np.dot(leaving, leaving)
+                continue
+
+            block_start = block * window
+            current_block = self._read(block_start, self.count)
+            self.block_mins[k] = current_block.min()
+            self.block_maxs[k] = current_block.max()
+
+            if block > 0:
+                previous_block_values = self._read(block_start - window, block_start)
+                self.suffix_mins[k] = np.minimum.accumulate(previous_block_values[::-1])[::-1]
+                self.suffix_maxs[k] = np.maximum.accumulate(previous_block_values[::-1])[::-1]
+
+            in_window = self._read(max(self.count - window, 0), self.count)
+            self.sums[k] = in_window.sum()
+            self.sums_of_squares[k] = np.dot(in_window, in_window)
+
+    def query(self, k: int) -> tuple[float, float, float, float, float]:
+        """
+        Queries the last 10^k data points for statistical data.
+
+        Args:
+            k: The exponent defining the range of data to query.
+
+        Returns:
+            A tuple containing the minimum, maximum, last number, average and variance of the range.
+        """
+        k = min(max(k, 0), len(self.windows) - 1)
+        window = self.windows[k]
+        count = min(window, self.count)
+
+        if count == 0:
+            return float('inf'), float('-inf'), None, 0, 0
+
+        result_min, result_max = self.block_mins[k], self.block_maxs[k]
+
+        # The window reaches into the previous block when the current one is not complete
+        block_start = (self.count - 1) // window * window
+        window_start = self.count - count
+        if window_start < block_start:
+            offset = window_start - (block_start - window)
+            result_min = min(result_min, self.suffix_mins[k][offset])
+            result_max = max(result_max, self.suffix_maxs[k][offset])
+
+        last_number = float(self.history[(self.count - 1) % len(self.history)])
+
+        mean = round(float(self.sums[k]) / count, 2)
+        variance = round(float(self.sums_of_squares[k]) / count - mean ** 2, 2)
+
+        return float(result_min), float(result_max), last_number, mean, variance
+
+    def query_range(self, start: int, count: int) -> tuple[float, float, float, float, float]:
+        """
+        Queries `count` data points beginning at position `start` of the largest window (0 being the oldest).
+
+        Arbitrary ranges are not maintained by this engine, so they are aggregated from the history
+        in one vectorized pass, O(count) rather than the O(log n) of the segment trees.
+        """
+        start = max(start, 0)
+        count = min(count, self.size - start)
+
+        if count <= 0:
+            return float('inf'), float('-inf'), None, 0, 0
+
+        values = self._read(self.count - self.size + start, self.count - self.size + start + count)
+
+        mean = round(float(values.sum()) / count, 2)
+        variance = round(float(np.dot(values, values)) / count - mean ** 2, 2)
+
+        return float(values.min()), float(values.max()), float(values[-1]), mean, variance
+
+    def query_many(self, ks: list[int]) -> list[tuple[float, float, float, float, float]]:
+        """Queries the last 10^k data points for several values of k; every window is already maintained."""
+        return [self.query(k) for k in ks]
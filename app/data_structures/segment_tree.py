@@ -1,6 +1,7 @@
+import math
+import threading
 from collections import defaultdict
 from dataclasses import dataclass
-from app import app
 from app.data_structures.exceptions import SegmentTreeCapacityLimitReachedException
 
 
@@ -16,13 +17,27 @@ class StatsNode:
     def empty() -> 'StatsNode':
         return StatsNode(min=float('inf'), max=float('-inf'), sum=0, sum_of_squares=0)
 
+    @staticmethod
+    def leaf(value: float) -> 'StatsNode':
+        return StatsNode(value, value, value, value ** 2)
+
+    @staticmethod
+    def merge(left: 'StatsNode', right: 'StatsNode') -> 'StatsNode':
+        return StatsNode(
+            min(left.min, right.min),
+            max(left.max, right.max),
+            left.sum + right.sum,
+            left.sum_of_squares + right.sum_of_squares
+        )
+
 
 class SegmentTree:
     def __init__(
         self, 
         capacity: int | None = 10 ** 2,
         max_window_size: int | None = 10 **8,
-        capacity_buffer_factor: float | None = 1.2
+        capacity_buffer_factor: float | None = 1.2,
+        growth_factor: float = 2.0
     ):
         """
         Initializes a SegmentTree.
@@ -34,119 +49,209 @@ class SegmentTree:
                           to allocate beyond the initial capacity. A capacity_buffer of 1.2 
                           means the total capacity will be 120% of the initial capacity, 
                           providing a 20% buffer for potential future growth.
+        - growth_factor: The factor by which the capacity grows when the window outgrows it (up to
+                          max_window_size). Growing copies the leaf references into a larger list,
+                          so the cost of growth is amortized over the data points appended.
+
+        Internal nodes are aggregated lazily. Writes and evictions only record the leaf ranges they
+        changed in `dirty_ranges`, and the next query recomputes the internal nodes above them (see
+        `_repair`), so a burst of batches pays for the aggregation of the ancestors they share once.
 
         Attributes:
         - size: The current size of the segment tree, initialized to 0.
+        - head: The offset (within the leaves) of the oldest data point in the window.
         - tree: The internal array representing the segment tree. The array is structured such that:
           - The leaf nodes (representing the actual data) are stored in the second half of the array.
+            They are used as a circular buffer: the window starts at `head` and wraps around the
+            end of the leaves, so evicting old data only moves `head` forward.
           - The internal nodes (representing merged data from the leaves) are stored in the first half of the array.
           - The size of the array is `2 * capacity`, providing sufficient space for both leaves and internal nodes.
+        - dirty_ranges: The (first, last) leaf offsets of the leaves changed since internal nodes were last repaired.
 
         """
         self.size = 0 
+        self.head = 0
         self.capacity = capacity
         self.max_window_size = max_window_size
         self.capacity_limit = self.max_window_size * capacity_buffer_factor
+        self.growth_factor = growth_factor
         self.tree = [StatsNode.empty()] * (2 * self.capacity) 
+        self.dirty_ranges: list[tuple[int, int]] = []
+        # Queries share the service's read lock, so concurrent ones serialise their repairs
+        self._repair_lock = threading.Lock()
 
-    def _resize(self) -> None:
-        """Resize the tree array when it exceeds current capacity."""
-        new_capacity = self.capacity * 10
-    
-        new_tree = SegmentTree(capacity=new_capacity)
-        new_tree.build([data_leaf.min for data_leaf in self.tree[self.capacity:]])
-        
-        self.tree = new_tree.tree
+    def _leaf_index(self, position: int) -> int:
+        """Maps a position in the window (0 being the oldest data point) to its index in the tree array."""
+        return self.capacity + (self.head + position) % self.capacity
+
+    def _resize(self, required_capacity: int) -> None:
+        """
+        Grow the tree array so that it can hold `required_capacity` leaves, multiplying the capacity
+        by `growth_factor` as many times as needed. The leaves of the window are copied (as slices of
+        references, the nodes themselves are shared) to the start of the new leaves, and its internal
+        nodes are left to the next repair.
+        """
+        new_capacity = self.capacity
+        while new_capacity < required_capacity:
+            new_capacity = max(math.ceil(new_capacity * self.growth_factor), new_capacity + 1)
+        new_capacity = min(new_capacity, self.max_window_size)
+
+        tree = [StatsNode.empty()] * (2 * new_capacity)
+        first = self.capacity + self.head
+        wrapped = max(self.head + self.size - self.capacity, 0)
+        tree[new_capacity:new_capacity + self.size - wrapped] = self.tree[first:first + self.size - wrapped]
+        tree[new_capacity + self.size - wrapped:new_capacity + self.size] = self.tree[self.capacity:self.capacity + wrapped]
+
+        self.tree = tree
         self.capacity = new_capacity
+        self.head = 0
+        self.dirty_ranges = [(0, self.size - 1)] if self.size else []
 
     def _build_internal_nodes(self):
         """
             Build internal nodes (statistical information)
         """
         for i in range(self.capacity - 1, 0, -1):
-            left = self.tree[i * 2]
-            right = self.tree[i * 2 + 1]
-            self.tree[i] = StatsNode(
-                min(left.min, right.min),
-                max(left.max, right.max),
-                left.sum + right.sum,
-                left.sum_of_squares + right.sum_of_squares
-            )
+            self.tree[i] = StatsNode.merge(self.tree[i * 2], self.tree[i * 2 + 1])
 
-    def build(self, data: list[float]) -> None:
-        self.size = len(data)
+    def _update_range(self, l: int, r: int) -> None:
+        """
+        Recompute the internal nodes above the leaves between offsets `l` and `r` (inclusive).
+
+        The parents of a contiguous range of nodes are themselves contiguous, so the update walks
+        up level by level over `[l // 2, r // 2]`. When the capacity is not a power of two the
+        ranges of neighbouring levels may overlap; nodes are therefore visited in decreasing index
+        order (children always have larger indices than their parent) and each node only once.
+        """
+        l = (self.capacity + l) // 2
+        r = (self.capacity + r) // 2
+        lowest_updated = r + 1
+
+        while r >= 1:
+            for i in range(min(r, lowest_updated - 1), max(l, 1) - 1, -1):
+                self.tree[i] = StatsNode.merge(self.tree[i * 2], self.tree[i * 2 + 1])
+            lowest_updated = min(lowest_updated, max(l, 1))
+            l //= 2
+            r //= 2
+
+    def _mark_dirty(self, l: int, r: int) -> None:
+        """Records that the leaves between offsets `l` and `r` (inclusive) changed."""
+        if self.dirty_ranges and self.dirty_ranges[-1][1] + 1 == l:
+            # Consecutive appends extend the same range
+            self.dirty_ranges[-1] = (self.dirty_ranges[-1][0], r)
+        else:
+            self.dirty_ranges.append((l, r))
+
+        # Bounds the ranges kept while no query comes to repair them
+        if len(self.dirty_ranges) > 64:
+            self.dirty_ranges = self._coalesce(self.dirty_ranges)
+
+    @staticmethod
+    def _coalesce(ranges: list[tuple[int, int]]) -> list[tuple[int, int]]:
+        """Merges overlapping and adjacent ranges, returning them sorted."""
+        merged = []
+        for l, r in sorted(ranges):
+            if merged and l <= merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], r))
+            else:
+                merged.append((l, r))
+        return merged
+
+    def _mark_window_range(self, start: int, count: int) -> None:
+        """Records that `count` window positions beginning at `start` changed."""
+        if count <= 0:
+            return
+
+        first = (self.head + start) % self.capacity
+        last = first + count - 1
+
+        if last < self.capacity:
+            self._mark_dirty(first, last)
+        else:
+            self._mark_dirty(first, self.capacity - 1)
+            self._mark_dirty(0, last - self.capacity)
 
-        if self.size > self.capacity_limit:
+    def _repair(self) -> None:
+        """Recomputes the internal nodes above the leaves changed since the last repair, once per run of writes."""
+        if not self.dirty_ranges:
+            return
+
+        with self._repair_lock:
+            if not self.dirty_ranges:
+                return
+
+            for l, r in self._coalesce(self.dirty_ranges):
+                self._update_range(l, r)
+            # Only cleared once repaired, so that concurrent queries wait for the repair rather than skip it
+            self.dirty_ranges = []
+
+    def build(self, data: list[float]) -> None:
+        if len(data) > self.capacity_limit:
             raise SegmentTreeCapacityLimitReachedException()
-        
-        while self.size > self.capacity:
-            self._resize()
-        
-        for i in range(self.size):
-            self.tree[self.capacity + i] = StatsNode(data[i], data[i], data[i], data[i] ** 2)
+
+        if len(data) > self.max_window_size:
+            data = data[len(data) - self.max_window_size:]
+
+        self.size = 0
+        self.head = 0
+        if len(data) > self.capacity:
+            self._resize(len(data))
+
+        for i in range(len(data)):
+            self.tree[self.capacity + i] = StatsNode.leaf(data[i])
+        self.size = len(data)
 
         self._build_internal_nodes()
+        self.dirty_ranges = []
 
     def append_data(self, new_data: list[float]) -> None:
-        new_size = self.size + len(new_data)
-
-        if new_size > self.capacity_limit:
+        # Old data is evicted as the window moves, so only the batch itself is bounded
+        if len(new_data) > self.capacity_limit:
             raise SegmentTreeCapacityLimitReachedException()
 
-        while new_size > self.capacity:
-            self._resize()
+        if len(new_data) > self.max_window_size:
+            new_data = new_data[len(new_data) - self.max_window_size:]
+
+        new_size = self.size + len(new_data)
+
+        if min(new_size, self.max_window_size) > self.capacity:
+            self._resize(min(new_size, self.max_window_size))
 
         if new_size > self.max_window_size:
             excess_data = new_size - self.max_window_size
             self.remove_old_data(excess_data)
 
         for i in range(len(new_data)):
-            self.tree[self.capacity + self.size + i] = StatsNode(new_data[i], new_data[i], new_data[i], new_data[i] ** 2)
+            self.tree[self._leaf_index(self.size + i)] = StatsNode.leaf(new_data[i])
 
+        self._mark_window_range(self.size, len(new_data))
         self.size += len(new_data)
 
-        self._build_internal_nodes()
-
     def remove_old_data(self, count_to_remove: int) -> None:
         """Remove old data when max size is exceeded."""
+        count_to_remove = min(count_to_remove, self.size)
 
-        # Shift the leaf nodes left
-        for i in range(self.capacity + count_to_remove, self.capacity + self.size):
-            self.tree[i - count_to_remove] = self.tree[i]
-            self.tree[i] = StatsNode.empty()
+        # Clear the oldest leaves and move the head of the window past them
+        for i in range(count_to_remove):
+            self.tree[self._leaf_index(i)] = StatsNode.empty()
 
+        self._mark_window_range(0, count_to_remove)
+        self.head = (self.head + count_to_remove) % self.capacity
         self.size -= count_to_remove 
 
-        self._build_internal_nodes()
+    def get_data(self, last: int | None = None) -> list[float]:
+        """Returns the data points of the window (only the `last` most recent ones if given), oldest first."""
+        first = 0 if last is None else max(self.size - last, 0)
+        return [self.tree[self._leaf_index(i)].min for i in range(first, self.size)]
 
-    def query(self, k: int) -> tuple[float, float, float, float]:
-        """
-        Queries the last 10^k elements of the segment tree for statistical data.
-
-        Args:
-            k: The exponent defining the range of data to query. 
-            For example, k=1 queries the last 10 elements, k=2 queries the last 100 elements, etc.
+    def _query_range(self, l: int, r: int) -> StatsNode:
+        """Aggregates the leaves between offsets `l` and `r` (inclusive) of the leaf array."""
+        l += self.capacity
+        r += self.capacity
 
-        Returns:
-            A tuple containing:
-                - Minimum value in the range.
-                - Maximum value in the range.
-                - Last number in the range.
-                - Average value in the range.
-                - Variance in the range.
-        """
-        num_elements = 10 ** k
-        
-        start_idx = max(self.size - num_elements, 0)
-        
-        l = self.capacity + start_idx
-        r = self.capacity + self.size - 1
-        
         result_min, result_max = float('inf'), float('-inf')
         result_sum, result_sum_of_squares = 0, 0
-        count = r - l + 1
-        last_number = self.tree[r].min if self.size > 0 else None
-        
+
         # Traverse and query the segment tree from `l` to `r`
         while l <= r:
             if l % 2 == 1:
@@ -164,10 +269,92 @@ class SegmentTree:
             l //= 2
             r //= 2
 
-        mean = round(result_sum / count, 2) if count > 0 else 0
-        variance = round((result_sum_of_squares / count) - (mean ** 2), 2) if count > 0 else 0
-        
-        return result_min, result_max, last_number, mean, variance
+        return StatsNode(result_min, result_max, result_sum, result_sum_of_squares)
 
-        
+    def _query_window_range(self, start: int, count: int) -> StatsNode:
+        """Aggregates `count` window positions beginning at `start`; the range may wrap around the end of the leaves."""
+        if count <= 0:
+            return StatsNode.empty()
+
+        first = (self.head + start) % self.capacity
+        last = first + count - 1
+
+        if last < self.capacity:
+            return self._query_range(first, last)
+        return StatsNode.merge(
+            self._query_range(first, self.capacity - 1),
+            self._query_range(0, last - self.capacity)
+        )
+
+    def _result(self, node: StatsNode, count: int, end: int | None = None) -> tuple[float, float, float, float, float]:
+        """Formats the aggregate of `count` data points ending before window position `end` (the end of the window by default)."""
+        end = self.size if end is None else end
+        last_number = self.tree[self._leaf_index(end - 1)].min if end > 0 else None
+
+        mean = round(node.sum / count, 2) if count > 0 else 0
+        variance = round((node.sum_of_squares / count) - (mean ** 2), 2) if count > 0 else 0
+
+        return node.min, node.max, last_number, mean, variance
+
+    def query(self, k: int) -> tuple[float, float, float, float]:
+        """
+        Queries the last 10^k elements of the segment tree for statistical data.
+
+        Args:
+            k: The exponent defining the range of data to query. 
+            For example, k=1 queries the last 10 elements, k=2 queries the last 100 elements, etc.
 
+        Returns:
+            A tuple containing:
+                - Minimum value in the range.
+                - Maximum value in the range.
+                - Last number in the range.
+                - Average value in the range.
+                - Variance in the range.
+        """
+        self._repair()
+        count = min(10 ** k, self.size)
+
+        return self._result(self._query_window_range(self.size - count, count), count)
+
+    def query_range(self, start: int, count: int) -> tuple[float, float, float, float, float]:
+        """
+        Queries `count` data points beginning at window position `start` (0 being the oldest data point).
+
+        Returns:
+            A tuple containing the minimum, maximum, last number, average and variance of the range,
+            the last number being that of the range rather than of the window.
+        """
+        start = max(start, 0)
+        count = min(count, self.size - start)
+
+        if count <= 0:
+            return float('inf'), float('-inf'), None, 0, 0
+
+        self._repair()
+        return self._result(self._query_window_range(start, count), count, start + count)
+
+    def query_many(self, ks: list[int]) -> list[tuple[float, float, float, float, float]]:
+        """
+        Queries the last 10^k elements for several values of k in a single traversal.
+
+        The windows are nested suffixes of the data, so each window is aggregated from the next smaller
+        one plus the data points between the two, and every covering node is visited only once.
+
+        Returns:
+            The `query` result of every k, in the order of `ks`.
+        """
+        self._repair()
+        results = {}
+        aggregate = StatsNode.empty()
+        covered = 0
+
+        for k in sorted(set(ks)):
+            count = min(10 ** k, self.size)
+            aggregate = StatsNode.merge(aggregate, self._query_window_range(self.size - count, count - covered))
+            covered = count
+            results[k] = self._result(aggregate, count)
+
+        return [results[k] for k in ks]
+
+        
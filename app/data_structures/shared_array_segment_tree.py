@@ -0,0 +1,252 @@
+import mmap
+import os
+import secrets
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from app.data_structures.array_segment_tree import ArraySegmentTree
+
+# The control segment of a tree is a header of uint64 slots, the node arrays living in a separate
+# data segment named `<control segment name>.<generation>`, replaced whenever the tree is reallocated
+SEQUENCE, GENERATION, CAPACITY, SIZE, HEAD, VERSION, EPOCH, MAX_WINDOW_SIZE = range(8)
+HEADER_SLOTS = 8
+
+
+class _AttachedSegment:
+    def __init__(self, name: str):
+        """
+        A mapping of an existing POSIX shared memory segment, for Python versions before 3.13 whose
+        SharedMemory registers attached segments with the resource tracker, which then unlinks them
+        when the process exits (or when any process sharing the tracker releases them).
+        """
+        import _posixshmem
+
+        self.name = name
+        file_descriptor = _posixshmem.shm_open("/" + name, os.O_RDWR, mode=0o600)
+        try:
+            self.size = os.fstat(file_descriptor).st_size
+            self._mmap = mmap.mmap(file_descriptor, self.size)
+        finally:
+            os.close(file_descriptor)
+        self.buf = memoryview(self._mmap)
+
+    def close(self) -> None:
+        self.buf.release()
+        self._mmap.close()
+
+
+def attach_shared_memory(name: str) -> shared_memory.SharedMemory | _AttachedSegment:
+    """Attaches to an existing shared memory segment, which this process will not unlink on exit."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return _AttachedSegment(name)
+
+
+def create_shared_memory(name: str, size: int) -> shared_memory.SharedMemory:
+    """Creates a shared memory segment, replacing any segment left behind under the same name by a crashed process."""
+    try:
+        return shared_memory.SharedMemory(name=name, create=True, size=size)
+    except FileExistsError:
+        shared_memory.SharedMemory(name=name).unlink()
+        return shared_memory.SharedMemory(name=name, create=True, size=size)
+
+
+def _node_arrays(segment: shared_memory.SharedMemory, capacity: int) -> list[np.ndarray]:
+    """Returns the mins, maxs, sums and sums_of_squares arrays laid out in a data segment."""
+    return [
+        np.ndarray(2 * capacity, dtype=np.float64, buffer=segment.buf, offset=i * 2 * capacity * 8)
+        for i in range(4)
+    ]
+
+
+def _release(segment: shared_memory.SharedMemory, unlink: bool = False) -> None:
+    if unlink:
+        segment.unlink()
+    try:
+        segment.close()
+    except BufferError:
+        # Arrays still refer to the mapping, which is then closed once they are garbage collected
+        pass
+
+
+class SharedArraySegmentTree(ArraySegmentTree):
+    def __init__(
+        self,
+        capacity: int | None = 10 ** 2,
+        max_window_size: int | None = 10 ** 8,
+        capacity_buffer_factor: float | None = 1.2,
+        name: str | None = None,
+        epoch: int = 0
+    ):
+        """
+        Initializes a SharedArraySegmentTree, an ArraySegmentTree whose node arrays live in shared memory.
+
+        The tree is written by a single process, while any number of processes read it without copying
+        through a `SharedArraySegmentTreeReader` attached to the same name. Updates are published with a
+        seqlock: the sequence number in the header is odd while an update is in progress, and bumped
+        again once it is complete, so a reader retries any query overlapping an update.
+
+        Parameters (in addition to those of ArraySegmentTree):
+        - name: The name of the control segment readers attach to, random if not given.
+        - epoch: A number identifying the writer, which readers use to tell its trees from the ones
+          left behind by a previous writer.
+
+        Attributes:
+        - version: The number of updates (build or append_data) applied to the tree.
+        """
+        self.name = name or f"tp-{secrets.token_hex(8)}"
+        self.control = create_shared_memory(self.name, HEADER_SLOTS * 8)
+        self.header = np.ndarray(HEADER_SLOTS, dtype=np.uint64, buffer=self.control.buf)
+        self.header[:] = 0
+        self.header[EPOCH] = epoch
+
+        self.version = 0
+        self.generation = 0
+        self.segment = None
+        self._retired_segments = []
+
+        super().__init__(capacity, max_window_size, capacity_buffer_factor)
+        self.header[MAX_WINDOW_SIZE] = self.max_window_size
+        self._publish()
+
+    def _allocate(self, capacity: int) -> None:
+        """Allocates the node arrays in a new data segment, the previous one being released once the update is published."""
+        self.generation += 1
+        segment = create_shared_memory(f"{self.name}.{self.generation}", 4 * 2 * capacity * 8)
+
+        self.capacity = capacity
+        self.mins, self.maxs, self.sums, self.sums_of_squares = _node_arrays(segment, capacity)
+        self.mins[:] = np.inf
+        self.maxs[:] = -np.inf
+        self.sums[:] = 0
+        self.sums_of_squares[:] = 0
+
+        if self.segment is not None:
+            self._retired_segments.append(self.segment)
+        self.segment = segment
+
+    def _publish(self) -> None:
+        self.header[GENERATION] = self.generation
+        self.header[CAPACITY] = self.capacity
+        self.header[SIZE] = self.size
+        self.header[HEAD] = self.head
+        self.header[VERSION] = self.version
+
+        # Readers reattach to the new data segment when they see the new generation
+        for segment in self._retired_segments:
+            _release(segment, unlink=True)
+        self._retired_segments = []
+
+    def _update(self, update, data: list[float]) -> None:
+        self.header[SEQUENCE] += 1
+        try:
+            update(data)
+            self.version += 1
+        finally:
+            self._publish()
+            self.header[SEQUENCE] += 1
+
+    def build(self, data: list[float]) -> None:
+        self._update(super().build, data)
+
+    def append_data(self, new_data: list[float]) -> None:
+        self._update(super().append_data, new_data)
+
+    def close(self) -> None:
+        """Removes the shared memory segments of the tree; attached readers keep their current mappings."""
+        self.mins = self.maxs = self.sums = self.sums_of_squares = self.header = None
+        _release(self.segment, unlink=True)
+        _release(self.control, unlink=True)
+
+
+class SharedArraySegmentTreeReader(ArraySegmentTree):
+    def __init__(self, name: str):
+        """
+        Attaches to the SharedArraySegmentTree published under `name`, to query it without copying its nodes.
+
+        Queries follow the seqlock protocol of the writer: they are retried until they ran without any
+        update in between. The reader is read-only and must not be built or appended to.
+
+        Raises:
+            FileNotFoundError: If no tree is published under `name`.
+        """
+        self.name = name
+        self.control = attach_shared_memory(name)
+        self.header = np.ndarray(HEADER_SLOTS, dtype=np.uint64, buffer=self.control.buf)
+        self.max_window_size = int(self.header[MAX_WINDOW_SIZE])
+
+        self.generation = 0
+        self.segment = None
+        self.size = self.head = self.capacity = 0
+        # The reader points at one data segment at a time, which threads must not switch under each other
+        self._lock = threading.Lock()
+
+    @property
+    def epoch(self) -> int:
+        return int(self.header[EPOCH])
+
+    def _sync(self) -> None:
+        """Points the reader at the data segment and window described by the header."""
+        generation = int(self.header[GENERATION])
+        if generation != self.generation:
+            segment = attach_shared_memory(f"{self.name}.{generation}")
+            capacity = int(self.header[CAPACITY])
+            self.mins, self.maxs, self.sums, self.sums_of_squares = _node_arrays(segment, capacity)
+            if self.segment is not None:
+                _release(self.segment)
+            self.segment, self.generation, self.capacity = segment, generation, capacity
+
+        self.size = int(self.header[SIZE])
+        self.head = int(self.header[HEAD])
+
+    def _read(self, read):
+        """Runs `read` until it completes without a concurrent update, returning (version, result)."""
+        with self._lock:
+            return self._read_locked(read)
+
+    def _read_locked(self, read):
+        while True:
+            sequence = int(self.header[SEQUENCE])
+            if sequence % 2:
+                time.sleep(0)
+                continue
+
+            try:
+                self._sync()
+                version = int(self.header[VERSION])
+                result = read()
+            except (IndexError, ValueError, FileNotFoundError):
+                # Only expected from a torn read, when the writer reallocated the tree meanwhile
+                if int(self.header[SEQUENCE]) == sequence:
+                    raise
+                result = None
+
+            if int(self.header[SEQUENCE]) == sequence:
+                return version, result
+
+            # The header may have been read mid-update, so the data segment is attached again
+            self.generation = 0
+
+    @property
+    def version(self) -> int:
+        return self._read(lambda: None)[0]
+
+    def get_data(self, last: int | None = None) -> np.ndarray:
+        return self._read(lambda: super(SharedArraySegmentTreeReader, self).get_data(last))[1]
+
+    def query_many_versioned(self, ks: list[int]) -> tuple[int, list[tuple[float, float, float, float, float]]]:
+        """Queries several values of k at once, returning the version of the tree they were computed from too."""
+        return self._read(lambda: super(SharedArraySegmentTreeReader, self).query_many(ks))
+
+    def query_many(self, ks: list[int]) -> list[tuple[float, float, float, float, float]]:
+        return self.query_many_versioned(ks)[1]
+
+    def close(self) -> None:
+        self.mins = self.maxs = self.sums = self.sums_of_squares = self.header = None
+        if self.segment is not None:
+            _release(self.segment)
+        _release(self.control)
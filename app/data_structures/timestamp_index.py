@@ -0,0 +1,115 @@
+import numpy as np
+
+from app.data_structures.exceptions import TimestampsNotMonotonicException
+
+
+def as_timestamps(timestamps: list[float]) -> np.ndarray:
+    """
+    Returns:
+        The timestamps as a float64 array.
+
+    Raises:
+        TimestampsNotMonotonicException: If the timestamps decrease (or are NaN).
+    """
+    values = np.asarray(timestamps, dtype=np.float64)
+
+    if np.any(np.isnan(values)) or np.any(values[1:] < values[:-1]):
+        raise TimestampsNotMonotonicException()
+    return values
+
+
+class TimestampIndex:
+    def __init__(self, capacity: int = 10 ** 2):
+        """
+        Initializes a TimestampIndex, the timestamps of the most recent data points of a data engine.
+
+        The index is kept next to an engine: its last timestamp is that of the engine's last data
+        point, and it covers the last `size` points of the engine's window (fewer than the engine holds
+        when timestamps were only provided after the symbol was created). Timestamps are non-decreasing,
+        so the data points between two timestamps are found with two binary searches.
+
+        The timestamps are stored in a single float64 array, the live ones being `[head, head + size)`.
+        Trimming old timestamps only moves `head`. When an append reaches the end of the array, the
+        live timestamps are moved back to its start, or into an array twice as large when more than
+        half of it is in use, so searches always run on one contiguous view.
+
+        Parameters:
+        - capacity: The initial number of timestamps the array can hold.
+
+        Attributes:
+        - size: The number of timestamps in the index.
+        - head: The offset of the oldest timestamp in the array.
+        """
+        self.values = np.zeros(max(capacity, 1))
+        self.head = 0
+        self.size = 0
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        """The timestamps of the index, oldest first (a view, not a copy)."""
+        return self.values[self.head:self.head + self.size]
+
+    @property
+    def last(self) -> float | None:
+        return float(self.values[self.head + self.size - 1]) if self.size else None
+
+    def validate(self, timestamps: list[float]) -> np.ndarray:
+        """
+        Checks that timestamps can be appended: they must be non-decreasing, and not older than the last one in the index.
+
+        Returns:
+            The timestamps as a float64 array.
+
+        Raises:
+            TimestampsNotMonotonicException: If the timestamps go back in time.
+        """
+        values = as_timestamps(timestamps)
+
+        if self.size and len(values) and values[0] < self.last:
+            raise TimestampsNotMonotonicException()
+
+        return values
+
+    def append(self, timestamps: list[float]) -> None:
+        values = self.validate(timestamps)
+
+        end = self.head + self.size
+        if end + len(values) > len(self.values):
+            required = self.size + len(values)
+            capacity = len(self.values)
+            while required > capacity // 2:
+                capacity *= 2
+
+            live = self.timestamps
+            if capacity == len(self.values):
+                self.values[:self.size] = live
+            else:
+                resized = np.zeros(capacity)
+                resized[:self.size] = live
+                self.values = resized
+            self.head, end = 0, self.size
+
+        self.values[end:end + len(values)] = values
+        self.size += len(values)
+
+    def trim(self, size: int) -> None:
+        """Keeps only the last `size` timestamps, e.g. once the engine evicted older data points."""
+        if size < self.size:
+            self.head += self.size - size
+            self.size = max(size, 0)
+
+    def positions(self, start: float | None = None, end: float | None = None) -> tuple[int, int]:
+        """
+        Finds the data points whose timestamps are between `start` and `end` (inclusive), in O(log n).
+
+        Args:
+            start: The earliest timestamp, None for no lower bound.
+            end: The latest timestamp, None for no upper bound.
+
+        Returns:
+            The position of the first of these data points in the index (0 being the oldest) and their count.
+        """
+        timestamps = self.timestamps
+        first = int(np.searchsorted(timestamps, start, side="left")) if start is not None else 0
+        last = int(np.searchsorted(timestamps, end, side="right")) if end is not None else self.size
+        return first, max(last - first, 0)
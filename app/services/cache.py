@@ -0,0 +1,52 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class StatsCache:
+    EVICTION_POLICIES = ("lru", "fifo")
+
+    def __init__(self, max_size: int = 1024, eviction_policy: str = "lru") -> None:
+        """
+        A bounded, thread-safe cache of computed statistics.
+
+        Args:
+            max_size: The maximum number of entries kept. A size of 0 disables the cache.
+            eviction_policy: Which entry is dropped when the cache is full: "lru" drops the least
+                recently used entry, "fifo" the oldest inserted one.
+        """
+        if eviction_policy not in self.EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy {eviction_policy}.")
+
+        self.max_size = max_size
+        self.eviction_policy = eviction_policy
+        self.entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            try:
+                value = self.entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            if self.eviction_policy == "lru":
+                self.entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self.entries)
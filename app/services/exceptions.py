@@ -9,3 +9,9 @@ class TradingStatisticsServiceSymbolDataLimitReachedException(TradingStatisticsS
 
 class TradingStatisticsServiceSymbolNotFoundException(TradingStatisticsServiceException):
     pass
+
+class TradingStatisticsServiceIngestQueueFullException(TradingStatisticsServiceException):
+    pass
+
+class TradingStatisticsServiceTimestampsException(TradingStatisticsServiceException):
+    pass
@@ -0,0 +1,148 @@
+import logging
+import threading
+from typing import Any
+
+import numpy as np
+
+from app.services.exceptions import TradingStatisticsServiceIngestQueueFullException
+
+logger = logging.getLogger(__name__)
+
+
+class IngestQueue:
+    def __init__(self, service: Any, max_pending_batches: int = 10000, max_coalesced_values: int = 10 ** 6) -> None:
+        """
+        An asynchronous front of a service's add_batch, coalescing the pending batches of every symbol.
+
+        Batches are validated and queued by `submit`, which returns immediately. A background writer
+        thread drains the queue, and concatenates all the batches pending for a symbol (in the order
+        they were submitted) into as few `add_batch` calls as possible, so a burst of small batches
+        costs a single append.
+
+        Args:
+            service: The service the batches are added to (any service with an add_batch method).
+            max_pending_batches: The maximum number of batches waiting in the queue; further
+                submissions are rejected until the writer catches up.
+            max_coalesced_values: The maximum number of values merged into a single add_batch call.
+        """
+        self.service = service
+        self.max_pending_batches = max_pending_batches
+        self.max_coalesced_values = max_coalesced_values
+
+        self._pending: dict[str, list[np.ndarray]] = {}
+        self._pending_batches = 0
+        self._pending_values = 0
+        self._condition = threading.Condition()
+        self._stopped = False
+
+        # Batches are numbered as they are submitted, so that flush can wait for the ones submitted before it
+        self._submitted_sequence = 0
+        self._applied_sequence = 0
+
+        self.applied_batches = 0
+        self.failed_batches = 0
+        self.append_calls = 0
+
+        self._writer = threading.Thread(target=self._drain, name="ingest-writer", daemon=True)
+        self._writer.start()
+
+    def submit(self, symbol: str, values: list[float]) -> int:
+        """
+        Queues a batch of data for a symbol.
+
+        Returns:
+            The sequence number of the batch.
+
+        Raises:
+            TradingStatisticsServiceIngestQueueFullException: If max_pending_batches batches are already queued.
+            ValueError: If the values are not a flat list of numbers.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        # A batch failing once merged would take the batches of other clients down with it
+        if values.ndim != 1:
+            raise ValueError(f"The values of a batch must be a flat list of numbers, got {values.ndim} dimensions.")
+
+        with self._condition:
+            if self._pending_batches >= self.max_pending_batches:
+                raise TradingStatisticsServiceIngestQueueFullException("Ingest queue is full, retry later.")
+
+            self._pending.setdefault(symbol, []).append(values)
+            self._pending_batches += 1
+            self._pending_values += len(values)
+            self._submitted_sequence += 1
+            self._condition.notify_all()
+            return self._submitted_sequence
+
+    def _drain(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or self._stopped)
+                if not self._pending:
+                    return
+
+                pending, self._pending = self._pending, {}
+                self._pending_batches = self._pending_values = 0
+                sequence = self._submitted_sequence
+
+            for symbol, batches in pending.items():
+                self._apply(symbol, batches)
+
+            with self._condition:
+                self._applied_sequence = sequence
+                self._condition.notify_all()
+
+    def _apply(self, symbol: str, batches: list[np.ndarray]) -> None:
+        """Adds the pending batches of a symbol, merged into chunks of at most max_coalesced_values values."""
+        chunk, chunk_size = [], 0
+        for values in batches:
+            if chunk and chunk_size + len(values) > self.max_coalesced_values:
+                self._add_chunk(symbol, chunk)
+                chunk, chunk_size = [], 0
+            chunk.append(values)
+            chunk_size += len(values)
+        self._add_chunk(symbol, chunk)
+
+    def _add_chunk(self, symbol: str, chunk: list[np.ndarray]) -> None:
+        try:
+            self.service.add_batch(symbol, chunk[0] if len(chunk) == 1 else np.concatenate(chunk))
+            self.applied_batches += len(chunk)
+        except Exception as e:
+            # The batches were already acknowledged, so the error can only be reported here and in the metrics
+            logger.error(f"Error adding {len(chunk)} queued batches for symbol {symbol}: {str(e)}")
+            self.failed_batches += len(chunk)
+        self.append_calls += 1
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """
+        Waits until every batch submitted before the call has been added to the service.
+
+        Returns:
+            False if the timeout expired first.
+        """
+        with self._condition:
+            sequence = self._submitted_sequence
+            return self._condition.wait_for(lambda: self._applied_sequence >= sequence, timeout)
+
+    def metrics(self) -> dict[str, float]:
+        """
+        Returns:
+            The queue depth (pending batches and values), the number of batches applied and failed,
+            the number of add_batch calls they took, and the coalescing ratio (batches per call).
+        """
+        with self._condition:
+            return {
+                "pending_batches": self._pending_batches,
+                "pending_values": self._pending_values,
+                "max_pending_batches": self.max_pending_batches,
+                "applied_batches": self.applied_batches,
+                "failed_batches": self.failed_batches,
+                "append_calls": self.append_calls,
+                "coalescing_ratio": round((self.applied_batches + self.failed_batches) / self.append_calls, 2) if self.append_calls else 0,
+            }
+
+    def close(self) -> None:
+        """Stops the writer once every queued batch has been added."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        self._writer.join()
@@ -0,0 +1,233 @@
+import bisect
+import functools
+import sys
+import threading
+import time
+from typing import Any, Callable, Iterable
+
+import numpy as np
+
+# Upper bounds of the buckets of duration histograms, in seconds
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Iterable[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        return "\n".join(lines + self.samples())
+
+
+class Counter(Metric):
+    """A value that only goes up, per combination of label values."""
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Iterable[str] = ()) -> None:
+        super().__init__(name, documentation, label_names)
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, *label_values: str) -> None:
+        with self._lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            values = dict(self.values)
+        return [f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}" for labels, value in sorted(values.items())]
+
+
+class Gauge(Metric):
+    """A value read when the metrics are rendered, from a callable returning it per combination of label values."""
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, label_names: Iterable[str], collect: Callable[[], dict[tuple[str, ...], float]]) -> None:
+        super().__init__(name, documentation, label_names)
+        self.collect = collect
+
+    def samples(self) -> list[str]:
+        return [f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}" for labels, value in sorted(self.collect().items())]
+
+
+class Histogram(Metric):
+    """The distribution of observed values (e.g. durations in seconds) over fixed buckets, per combination of label values."""
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(buckets)
+        # Per label values: the count of every bucket (non-cumulative, the last one being +Inf), and the sum
+        self.counts: dict[tuple[str, ...], list[int]] = {}
+        self.sums: dict[tuple[str, ...], float] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self.counts.get(label_values)
+            if counts is None:
+                counts = self.counts[label_values] = [0] * (len(self.buckets) + 1)
+                self.sums[label_values] = 0.0
+            counts[index] += 1
+            self.sums[label_values] += value
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            counts = {labels: list(values) for labels, values in self.counts.items()}
+            sums = dict(self.sums)
+
+        lines = []
+        for labels in sorted(counts):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts[labels]):
+                cumulative += count
+                bucket_labels = _format_labels(self.label_names, labels, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(sums[labels])}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        """The metrics of the process, rendered together in the Prometheus text exposition format."""
+        self.metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        """Adds a metric, replacing any previous one of the same name."""
+        with self._lock:
+            self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self.metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+# The registry of the process, rendered by the /metrics endpoint
+REGISTRY = MetricsRegistry()
+
+
+def _object_bytes(value: Any) -> int:
+    size = sys.getsizeof(value)
+    attributes = getattr(value, "__dict__", None)
+    if attributes is not None:
+        size += sys.getsizeof(attributes) + sum(sys.getsizeof(attribute) for attribute in attributes.values())
+    return size
+
+
+def engine_memory_bytes(engine: Any) -> int:
+    """
+    Estimates the memory held by a data engine: the bytes of its NumPy arrays (including those in
+    lists), and for lists of Python objects (e.g. the nodes of SegmentTree) the size of the list plus
+    that of one object per leaf and internal node in use, the unused ones being shared empty nodes.
+    """
+    total = 0
+    for value in vars(engine).values():
+        if isinstance(value, np.ndarray):
+            total += value.nbytes
+        elif isinstance(value, list) and value:
+            if isinstance(value[0], np.ndarray):
+                total += sum(item.nbytes for item in value)
+            else:
+                used = min(len(value), 2 * getattr(engine, "size", len(value)))
+                total += sys.getsizeof(value) + used * _object_bytes(value[-1])
+    return total
+
+
+class EngineMetrics:
+    # The engine methods timed, when the engine has them
+    OPERATIONS = ("build", "append_data", "remove_old_data", "_resize", "query", "query_many", "query_range", "query_quantiles")
+
+    def __init__(self, registry: MetricsRegistry) -> None:
+        """
+        Instruments data engines: how long their operations take, how many points they ingest and
+        evict, and how often they resize.
+        """
+        self.operation_seconds = registry.register(Histogram(
+            "trading_engine_operation_seconds", "Time spent in data engine operations.", ("engine", "operation")))
+        self.points_ingested = registry.register(Counter(
+            "trading_engine_points_ingested_total", "Data points written to the engine of a symbol.", ("symbol",)))
+        self.points_evicted = registry.register(Counter(
+            "trading_engine_points_evicted_total", "Data points evicted from the window of a symbol.", ("symbol",)))
+        self.resizes = registry.register(Counter(
+            "trading_engine_resizes_total", "Resizes of the engine of a symbol.", ("symbol",)))
+
+    def instrument(self, engine: Any, symbol: str) -> Any:
+        """
+        Wraps the operations of an engine instance, so that they are also measured when the engine
+        calls them itself (e.g. `append_data` calling `_resize`).
+
+        Returns:
+            The engine.
+        """
+        engine_name = type(engine).__name__
+
+        for operation in self.OPERATIONS:
+            method = getattr(engine, operation, None)
+            if method is None:
+                continue
+
+            if operation in ("build", "append_data"):
+                wrapper = self._write_wrapper(engine, method, engine_name, operation, symbol)
+            else:
+                wrapper = self._timed_wrapper(method, engine_name, operation, symbol)
+            setattr(engine, operation, wrapper)
+
+        return engine
+
+    def _timed_wrapper(self, method: Callable, engine_name: str, operation: str, symbol: str) -> Callable:
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.operation_seconds.observe(time.perf_counter() - started, engine_name, operation)
+                if operation == "_resize":
+                    self.resizes.inc(1, symbol)
+        return timed
+
+    def _write_wrapper(self, engine: Any, method: Callable, engine_name: str, operation: str, symbol: str) -> Callable:
+        @functools.wraps(method)
+        def write(values):
+            size = 0 if operation == "build" else engine.size
+            started = time.perf_counter()
+            try:
+                method(values)
+            finally:
+                self.operation_seconds.observe(time.perf_counter() - started, engine_name, operation)
+
+            self.points_ingested.inc(len(values), symbol)
+            # Whatever did not make the window grow pushed older points out
+            evicted = size + len(values) - engine.size
+            if evicted > 0:
+                self.points_evicted.inc(evicted, symbol)
+        return write
@@ -0,0 +1,71 @@
+import sys
+import threading
+from collections import Counter
+from types import FrameType
+
+
+def _folded_stack(frame: FrameType | None) -> str:
+    """Formats the stack of a frame as semicolon-separated functions, outermost first."""
+    functions = []
+    while frame is not None:
+        code = frame.f_code
+        functions.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(functions))
+
+
+class SamplingProfiler:
+    def __init__(self, interval_seconds: float = 0.005) -> None:
+        """
+        A statistical profiler sampling the stacks of every thread of the process.
+
+        While running, a background thread records the stack of every other thread each
+        interval_seconds. The overhead depends on the interval and not on the code profiled, so the
+        profiler can be turned on in production for a while.
+
+        Stacks are counted in the folded format of flamegraph tools (e.g. flamegraph.pl, speedscope):
+        one line per distinct stack, its functions separated by semicolons, followed by its sample count.
+        """
+        self.interval_seconds = interval_seconds
+        self.samples: Counter[str] = Counter()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        """Starts sampling, adding to the stacks collected so far."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._sample, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stopped.set()
+            thread.join()
+
+    def _sample(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stopped.wait(self.interval_seconds):
+            stacks = [_folded_stack(frame) for thread_id, frame in sys._current_frames().items() if thread_id != own_id]
+            with self._lock:
+                self.samples.update(stacks)
+
+    def dump(self, reset: bool = False) -> str:
+        """
+        Returns:
+            The stacks sampled, in the folded format, most sampled first.
+        """
+        with self._lock:
+            samples = self.samples.most_common()
+            if reset:
+                self.samples = Counter()
+        return "".join(f"{stack} {count}\n" for stack, count in samples)
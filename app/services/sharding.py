@@ -0,0 +1,367 @@
+import logging
+import multiprocessing
+import os
+import threading
+import uuid
+import zlib
+from multiprocessing.connection import Connection
+from typing import Any, Callable
+
+from app.services.exceptions import TradingStatisticsServiceException, TradingStatisticsServiceSymbolNotFoundException, TradingStatisticsServiceSymbolsLimitReachedException
+from app.services.trading_statistics import StatisticalDataStructure, TradingStatisticsService
+from app.services.wal import WriteAheadLog
+
+logger = logging.getLogger(__name__)
+
+
+def shard_snapshot_path(path: str, shard: int) -> str:
+    """Returns the snapshot file of a shard, derived from the configured snapshot path."""
+    return f"{path}.shard{shard}"
+
+
+def shard_wal_directory(directory: str, shard: int) -> str:
+    """Returns the write-ahead log directory of a shard, derived from the configured directory."""
+    return os.path.join(directory, f"shard{shard}")
+
+
+def _run_shard(connection: Connection, shard: int, settings: dict[str, Any]) -> None:
+    """
+    The main loop of a shard process.
+
+    It owns a `TradingStatisticsService` holding the symbols of the shard, restores it from the
+    shard's snapshot and write-ahead log, and then executes the (method, args) requests received
+    on `connection` one at a time, replying with (True, result) or (False, exception).
+    A None request stops the shard.
+    """
+    write_ahead_log = None
+    if settings["wal_directory"]:
+        write_ahead_log = WriteAheadLog(shard_wal_directory(settings["wal_directory"], shard), settings["wal_flush_interval_seconds"])
+
+    service = TradingStatisticsService(
+        data_engine=settings["data_engine"],
+        stats_cache_size=settings["stats_cache_size"],
+        stats_cache_eviction_policy=settings["stats_cache_eviction_policy"],
+        write_ahead_log=write_ahead_log,
+        candle_resolutions=settings["candle_resolutions"],
+    )
+    # The limit is enforced across all shards by the parent process
+    service.MAX_SYMBOLS_NUMBER = settings["max_symbols_number"]
+
+    if settings["snapshot_path"] and os.path.exists(shard_snapshot_path(settings["snapshot_path"], shard)):
+        service.load_snapshot(shard_snapshot_path(settings["snapshot_path"], shard))
+    if write_ahead_log is not None:
+        service.replay_write_ahead_log()
+
+    # Tells the parent the shard is ready, along with the symbols it restored
+    connection.send(list(service.symbol_locks))
+
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+
+        method, args = request
+        try:
+            connection.send((True, getattr(service, method)(*args)))
+        except TradingStatisticsServiceException as e:
+            connection.send((False, e))
+        except Exception as e:
+            logger.exception(f"Shard {shard} failed to execute {method}.")
+            connection.send((False, TradingStatisticsServiceException(f"Shard {shard} failed: {e}")))
+
+    if write_ahead_log is not None:
+        write_ahead_log.close()
+    connection.close()
+
+
+class _Shard:
+    def __init__(self, index: int, context: multiprocessing.context.BaseContext, settings: dict[str, Any]) -> None:
+        """A shard process and the pipe to it. The lock keeps requests and their replies paired."""
+        self.index = index
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(
+            target=_run_shard,
+            args=(child_connection, index, settings),
+            name=f"trading-statistics-shard-{index}",
+            daemon=True,
+        )
+        self.process.start()
+        child_connection.close()
+        self.lock = threading.Lock()
+
+    def send(self, method: str, *args: Any) -> None:
+        self.connection.send((method, args))
+
+    def receive(self) -> Any:
+        succeeded, result = self.connection.recv()
+        if not succeeded:
+            raise result
+        return result
+
+    def call(self, method: str, *args: Any) -> Any:
+        with self.lock:
+            self.send(method, *args)
+            return self.receive()
+
+
+class ShardedTradingStatisticsService:
+    MAX_SYMBOLS_NUMBER = 10000
+
+    def __init__(
+        self,
+        data_engine: StatisticalDataStructure,
+        shard_count: int | None = None,
+        stats_cache_size: int = 1024,
+        stats_cache_eviction_policy: str = "lru",
+        snapshot_path: str | None = None,
+        wal_directory: str | None = None,
+        wal_flush_interval_seconds: float = 0.005,
+        candle_resolutions: list[int] | None = None
+    ) -> None:
+        """
+        A drop-in replacement for TradingStatisticsService spreading the symbols across worker processes.
+
+        Symbols are hash-partitioned (CRC32 of the symbol) across `shard_count` processes, each owning a
+        `TradingStatisticsService` with the engines of its symbols, so batches of symbols living on
+        different shards are applied in parallel rather than contending for the GIL of a single process.
+        Every call is forwarded to the owning shard over a pipe, and bulk calls are split by shard, sent
+        to all shards at once and gathered afterwards.
+
+        The shards are forked, so the service must be created on a platform supporting the fork start
+        method, before the process starts any thread.
+
+        Args:
+            data_engine: An implementation of the StatisticalDataStructure protocol (e.g., SegmentTree).
+            shard_count: The number of shard processes, one per CPU by default.
+            stats_cache_size: The size of the stats cache of every shard.
+            stats_cache_eviction_policy: How the stats caches evict entries when full ("lru" or "fifo").
+            snapshot_path: The snapshot path; every shard uses its own file derived from it, restored on startup.
+            wal_directory: The write-ahead log directory; every shard logs to its own sub-directory,
+                replayed on startup.
+            wal_flush_interval_seconds: The time between two group commits of the write-ahead logs.
+            candle_resolutions: The resolutions of the candles maintained by the shards.
+        """
+        self.shard_count = shard_count or os.cpu_count() or 1
+        self.instance_id = uuid.uuid4().hex[:8]
+        self.batch_listeners: list[Callable[[str], None]] = []
+        self._symbols_lock = threading.Lock()
+
+        settings = {
+            "data_engine": data_engine,
+            "stats_cache_size": stats_cache_size,
+            "stats_cache_eviction_policy": stats_cache_eviction_policy,
+            "snapshot_path": snapshot_path,
+            "wal_directory": wal_directory,
+            "wal_flush_interval_seconds": wal_flush_interval_seconds,
+            "max_symbols_number": self.MAX_SYMBOLS_NUMBER,
+            "candle_resolutions": candle_resolutions,
+        }
+        context = multiprocessing.get_context("fork")
+        self.shards = [_Shard(index, context, settings) for index in range(self.shard_count)]
+
+        # The shards restore their data concurrently, and each reports its symbols once ready
+        self.symbols: set[str] = set()
+        # The number of calls in flight for each symbol reserved but not yet created by its shard
+        self._unconfirmed: dict[str, int] = {}
+        for shard in self.shards:
+            self.symbols.update(shard.connection.recv())
+
+    def _shard_of(self, symbol: str) -> _Shard:
+        return self.shards[zlib.crc32(symbol.encode()) % self.shard_count]
+
+    def _existing_shard_of(self, symbol: str) -> _Shard:
+        """Returns the shard of a symbol, raising without a round trip if the symbol does not exist."""
+        if symbol not in self.symbols:
+            raise TradingStatisticsServiceSymbolNotFoundException(f"Symbol {symbol} not found.")
+        return self._shard_of(symbol)
+
+    def _reserve(self, symbol: str) -> None:
+        """
+        Registers a new symbol, enforcing MAX_SYMBOLS_NUMBER across all shards. Every reservation
+        must be followed by a `_settle` once the shard has applied (or rejected) the batch.
+        """
+        with self._symbols_lock:
+            if symbol in self.symbols and symbol not in self._unconfirmed:
+                return
+            if symbol not in self.symbols:
+                if len(self.symbols) >= self.MAX_SYMBOLS_NUMBER:
+                    logger.error(f"Symbol limit reached. Cannot add {symbol}.")
+                    raise TradingStatisticsServiceSymbolsLimitReachedException(f"Symbol limit reached. Cannot add {symbol}.")
+                self.symbols.add(symbol)
+                self._unconfirmed[symbol] = 0
+            self._unconfirmed[symbol] += 1
+
+    def _settle(self, symbol: str, added: bool) -> None:
+        """
+        Confirms a new symbol once a batch was added to it, or releases its reservation once every
+        batch sent for it was rejected, so that rejected symbols do not count towards MAX_SYMBOLS_NUMBER.
+        """
+        with self._symbols_lock:
+            if symbol not in self._unconfirmed:
+                return
+            self._unconfirmed[symbol] -= 1
+            if added:
+                del self._unconfirmed[symbol]
+            elif not self._unconfirmed[symbol]:
+                del self._unconfirmed[symbol]
+                self.symbols.discard(symbol)
+
+    def _call_shards(self, calls: dict[int, tuple[str, tuple]]) -> dict[int, Any]:
+        """
+        Sends a request to several shards at once and gathers their replies.
+
+        Args:
+            calls: The (method, args) request of every shard index.
+
+        Returns:
+            The result of every shard index. If a shard failed, its exception is raised once all the
+            replies have been received.
+        """
+        indexes = sorted(calls)
+        for index in indexes:
+            self.shards[index].lock.acquire()
+
+        try:
+            for index in indexes:
+                method, args = calls[index]
+                self.shards[index].send(method, *args)
+
+            results, error = {}, None
+            for index in indexes:
+                try:
+                    results[index] = self.shards[index].receive()
+                except Exception as e:
+                    error = e
+        finally:
+            for index in indexes:
+                self.shards[index].lock.release()
+
+        if error is not None:
+            raise error
+        return results
+
+    def add_batch(self, symbol: str, values: list[float], timestamps: list[float] | None = None, compact: bool = False) -> None:
+        """Adds a batch of data for a symbol on its shard, see `TradingStatisticsService.add_batch`."""
+        self._reserve(symbol)
+        try:
+            self._shard_of(symbol).call("add_batch", symbol, values, timestamps, compact)
+        except Exception:
+            self._settle(symbol, added=False)
+            raise
+        self._settle(symbol, added=True)
+        self._notify([symbol])
+
+    def _notify(self, symbols: list[str]) -> None:
+        for symbol in symbols:
+            for listener in self.batch_listeners:
+                listener(symbol)
+
+    def add_batches(self, batches: list[tuple[str, list[float]]]) -> list[TradingStatisticsServiceException | None]:
+        """
+        Adds batches of data for several symbols, applying the batches of every shard in parallel.
+        The batches of a symbol are applied in order.
+
+        Returns:
+            For every batch, None if it was added or the exception explaining why it was not.
+        """
+        errors: list[TradingStatisticsServiceException | None] = [None] * len(batches)
+        positions_by_shard: dict[int, list[int]] = {}
+
+        for position, (symbol, _) in enumerate(batches):
+            try:
+                self._reserve(symbol)
+            except TradingStatisticsServiceException as e:
+                errors[position] = e
+                continue
+            positions_by_shard.setdefault(self._shard_of(symbol).index, []).append(position)
+
+        try:
+            results = self._call_shards({
+                index: ("add_batches", ([batches[position] for position in positions],))
+                for index, positions in positions_by_shard.items()
+            })
+        except Exception:
+            # The replies of the other shards are lost too: their new symbols are reserved again by their next batch
+            for positions in positions_by_shard.values():
+                for position in positions:
+                    self._settle(batches[position][0], added=False)
+            raise
+
+        for index, positions in positions_by_shard.items():
+            for position, error in zip(positions, results[index]):
+                errors[position] = error
+                self._settle(batches[position][0], added=error is None)
+
+        self._notify([symbol for (symbol, _), error in zip(batches, errors) if error is None])
+        return errors
+
+    def get_stats(self, symbol: str, window_size_exponent: int) -> dict[str, float]:
+        """Retrieves statistical data for a symbol from its shard, see `TradingStatisticsService.get_stats`."""
+        return self._existing_shard_of(symbol).call("get_stats", symbol, window_size_exponent)
+
+    def get_stats_in_time_range(self, symbol: str, start: float | None = None, end: float | None = None) -> dict[str, float]:
+        """Retrieves statistical data for a time range from the symbol's shard, see `TradingStatisticsService.get_stats_in_time_range`."""
+        return self._existing_shard_of(symbol).call("get_stats_in_time_range", symbol, start, end)
+
+    def get_candles(self, symbol: str, resolution: int, count: int | None = None, end: int | None = None) -> dict[str, Any]:
+        """Retrieves OHLC candles from the symbol's shard, see `TradingStatisticsService.get_candles`."""
+        return self._existing_shard_of(symbol).call("get_candles", symbol, resolution, count, end)
+
+    def get_stats_series(self, symbol: str, window: int, count: int, stride: int = 1, offset: int = 0) -> dict[str, Any]:
+        """Retrieves the statistical data of a series of windows from the symbol's shard, see `TradingStatisticsService.get_stats_series`."""
+        return self._existing_shard_of(symbol).call("get_stats_series", symbol, window, count, stride, offset)
+
+    def get_version(self, symbol: str) -> int:
+        """Returns the version of a symbol's data from its shard, see `TradingStatisticsService.get_version`."""
+        return self._existing_shard_of(symbol).call("get_version", symbol)
+
+    def get_stats_many(self, symbol: str, window_size_exponents: list[int]) -> dict[int, dict[str, float]]:
+        """Retrieves statistical data for several window size exponents, see `TradingStatisticsService.get_stats_many`."""
+        return self._existing_shard_of(symbol).call("get_stats_many", symbol, window_size_exponents)
+
+    def get_stats_batch(self, queries: list[tuple[str, int]]) -> list[dict[str, float] | TradingStatisticsServiceException]:
+        """
+        Retrieves statistical data for many (symbol, window size exponent) pairs, querying all the
+        shards involved in parallel.
+
+        Returns:
+            For every query, its statistical data or the exception explaining why it failed.
+        """
+        positions_by_shard: dict[int, list[int]] = {}
+        for position, (symbol, _) in enumerate(queries):
+            positions_by_shard.setdefault(self._shard_of(symbol).index, []).append(position)
+
+        results = self._call_shards({
+            index: ("get_stats_batch", ([queries[position] for position in positions],))
+            for index, positions in positions_by_shard.items()
+        })
+
+        stats = [None] * len(queries)
+        for index, positions in positions_by_shard.items():
+            for position, result in zip(positions, results[index]):
+                stats[position] = result
+        return stats
+
+    def save_snapshot(self, path: str) -> int:
+        """
+        Writes a snapshot of every shard, each to its own file derived from `path`.
+
+        Returns:
+            The number of symbols written.
+        """
+        results = self._call_shards({
+            shard.index: ("save_snapshot", (shard_snapshot_path(path, shard.index),)) for shard in self.shards
+        })
+        return sum(results.values())
+
+    def close(self) -> None:
+        """Stops the shard processes once they have completed their pending requests."""
+        for shard in self.shards:
+            with shard.lock:
+                shard.connection.send(None)
+        for shard in self.shards:
+            shard.process.join()
+            shard.connection.close()
@@ -0,0 +1,327 @@
+import hashlib
+import logging
+import os
+import secrets
+import signal
+import sys
+import threading
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Any, Callable
+
+import numpy as np
+
+from app.data_structures.rolling_series import series_span
+from app.data_structures.shared_array_segment_tree import SharedArraySegmentTree, SharedArraySegmentTreeReader, attach_shared_memory, create_shared_memory
+from app.services.cache import StatsCache
+from app.services.exceptions import TradingStatisticsServiceException, TradingStatisticsServiceSymbolNotFoundException
+from app.services.trading_statistics import TradingStatisticsService
+from app.services.wal import WriteAheadLog
+
+logger = logging.getLogger(__name__)
+
+# The methods a writer executes on behalf of its clients
+WRITER_METHODS = ("add_batch", "add_batches", "save_snapshot", "get_stats_in_time_range", "get_candles")
+
+
+def symbol_segment_name(namespace: str, symbol: str) -> str:
+    """Returns the name of the shared memory segment a symbol's tree is published under."""
+    return f"{namespace}-{hashlib.sha1(symbol.encode()).hexdigest()[:16]}"
+
+
+def _attach_namespace(namespace: str, create: bool = False) -> tuple[shared_memory.SharedMemory, np.ndarray]:
+    """
+    Returns the segment holding the epoch of the namespace's writer, and the epoch as a single uint64 array.
+
+    The namespace segment outlives the writers, so that readers see the epoch of a new writer
+    through the mapping they already have.
+    """
+    try:
+        segment = attach_shared_memory(namespace)
+    except FileNotFoundError:
+        if not create:
+            raise
+        segment = create_shared_memory(namespace, 8)
+        resource_tracker.unregister(segment._name, "shared_memory")
+    return segment, np.ndarray(1, dtype=np.uint64, buffer=segment.buf)
+
+
+class SharedMemoryWriterService(TradingStatisticsService):
+    def __init__(self, namespace: str, **kwargs) -> None:
+        """
+        The TradingStatisticsService of the writer process, publishing the tree of every symbol in shared memory.
+
+        Every symbol is stored in a SharedArraySegmentTree named after the namespace and the symbol, for
+        `SharedMemoryTradingStatisticsService` readers to attach to. Symbols restored from a snapshot or
+        the write-ahead log must be published with `restore_all`, since readers cannot trigger a restore.
+
+        Args:
+            namespace: The prefix of the shared memory segments.
+            kwargs: The arguments of TradingStatisticsService, apart from the data engine.
+        """
+        super().__init__(data_engine=SharedArraySegmentTree, **kwargs)
+        self.namespace = namespace
+        self.epoch = secrets.randbits(63) or 1
+        self.namespace_segment, self.namespace_epoch = _attach_namespace(namespace, create=True)
+        self.namespace_epoch[0] = self.epoch
+
+    def _create_engine(self, symbol: str) -> SharedArraySegmentTree:
+        return SharedArraySegmentTree(name=symbol_segment_name(self.namespace, symbol), epoch=self.epoch)
+
+    def restore_all(self) -> None:
+        """Builds and publishes the tree of every symbol pending restoration."""
+        for symbol in list(self.pending_restores):
+            self._restore_pending(symbol)
+
+    def close(self) -> None:
+        """Removes the trees of every symbol from shared memory."""
+        self.namespace_epoch[0] = 0
+        for engine in self.data_storage.values():
+            engine.close()
+
+
+def _serve_connection(service: SharedMemoryWriterService, connection: Connection) -> None:
+    """Executes the (method, args) requests of a client, replying with (True, result) or (False, exception)."""
+    with connection:
+        while True:
+            try:
+                method, args = connection.recv()
+            except EOFError:
+                return
+
+            try:
+                if method not in WRITER_METHODS:
+                    raise TradingStatisticsServiceException(f"Unsupported writer method {method}.")
+                connection.send((True, getattr(service, method)(*args)))
+            except TradingStatisticsServiceException as e:
+                connection.send((False, e))
+            except Exception as e:
+                logger.exception(f"Writer failed to execute {method}.")
+                connection.send((False, TradingStatisticsServiceException(f"Writer failed: {e}")))
+
+
+def serve_writer(
+    address: str,
+    namespace: str,
+    stats_cache_size: int = 1024,
+    stats_cache_eviction_policy: str = "lru",
+    snapshot_path: str | None = None,
+    wal_directory: str | None = None,
+    wal_flush_interval_seconds: float = 0.005,
+    candle_resolutions: list[int] | None = None,
+    ready: Any = None
+) -> None:
+    """
+    Runs the writer process: restores the symbols, publishes them in shared memory and applies the
+    batches sent by the API processes on the Unix socket at `address`, until SIGTERM or SIGINT.
+
+    Args:
+        address: The path of the Unix socket to listen on.
+        namespace: The prefix of the shared memory segments.
+        candle_resolutions: The resolutions of the candles maintained by the writer.
+        ready: An optional (threading or multiprocessing) event set once the writer accepts connections.
+    """
+    write_ahead_log = None
+    if wal_directory:
+        write_ahead_log = WriteAheadLog(wal_directory, wal_flush_interval_seconds)
+
+    service = SharedMemoryWriterService(
+        namespace,
+        stats_cache_size=stats_cache_size,
+        stats_cache_eviction_policy=stats_cache_eviction_policy,
+        write_ahead_log=write_ahead_log,
+        candle_resolutions=candle_resolutions,
+    )
+    if snapshot_path and os.path.exists(snapshot_path):
+        service.load_snapshot(snapshot_path)
+    if write_ahead_log is not None:
+        service.replay_write_ahead_log()
+    service.restore_all()
+
+    if os.path.exists(address):
+        os.remove(address)
+    listener = Listener(address, family="AF_UNIX")
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    logger.info(f"Writer listening on {address}.")
+    if ready is not None:
+        ready.set()
+
+    try:
+        while True:
+            connection = listener.accept()
+            threading.Thread(target=_serve_connection, args=(service, connection), daemon=True).start()
+    finally:
+        listener.close()
+        service.close()
+        if write_ahead_log is not None:
+            write_ahead_log.close()
+
+
+class SharedMemoryTradingStatisticsService:
+    def __init__(
+        self,
+        address: str,
+        namespace: str,
+        stats_cache_size: int = 1024,
+        stats_cache_eviction_policy: str = "lru"
+    ) -> None:
+        """
+        The service of an API process when the data is owned by a separate writer process (see `serve_writer`).
+
+        Queries are answered locally by attaching to the trees the writer publishes in shared memory,
+        so any number of API processes serve reads from a single copy of the data. Batches and
+        snapshots are sent to the writer over its Unix socket.
+
+        Args:
+            address: The path of the writer's Unix socket.
+            namespace: The prefix of the shared memory segments, as configured for the writer.
+            stats_cache_size: The maximum number of computed stats kept in this process' cache (0 disables it).
+            stats_cache_eviction_policy: How the stats cache evicts entries when full ("lru" or "fifo").
+        """
+        self.address = address
+        self.namespace = namespace
+        self.stats_cache = StatsCache(stats_cache_size, stats_cache_eviction_policy)
+        self.readers: dict[str, SharedArraySegmentTreeReader] = {}
+        # Only notified of the batches added through this process
+        self.batch_listeners: list[Callable[[str], None]] = []
+        self._namespace_epoch = None
+        self._connection = None
+        self._connection_lock = threading.Lock()
+
+    def _epoch(self) -> int:
+        if self._namespace_epoch is None:
+            try:
+                self._namespace_segment, self._namespace_epoch = _attach_namespace(self.namespace)
+            except FileNotFoundError:
+                return 0
+        return int(self._namespace_epoch[0])
+
+    @property
+    def instance_id(self) -> str:
+        """Identifies the current writer, whose versions are unrelated to those of a previous one."""
+        return f"{self._epoch():x}"
+
+    def _reader(self, symbol: str) -> SharedArraySegmentTreeReader:
+        epoch = self._epoch()
+        reader = self.readers.get(symbol)
+
+        if reader is None or reader.epoch != epoch:
+            try:
+                reader = SharedArraySegmentTreeReader(symbol_segment_name(self.namespace, symbol))
+            except FileNotFoundError:
+                raise TradingStatisticsServiceSymbolNotFoundException(f"Symbol {symbol} not found.")
+
+            # A tree left behind by a previous writer which the current one has not recreated
+            if reader.epoch != epoch:
+                reader.close()
+                raise TradingStatisticsServiceSymbolNotFoundException(f"Symbol {symbol} not found.")
+            self.readers[symbol] = reader
+
+        return reader
+
+    def _call_writer(self, method: str, *args: Any) -> Any:
+        with self._connection_lock:
+            try:
+                if self._connection is None:
+                    self._connection = Client(self.address, family="AF_UNIX")
+                self._connection.send((method, args))
+                succeeded, result = self._connection.recv()
+            except (OSError, EOFError) as e:
+                # Reconnects on the next call, e.g. once the writer is restarted
+                self._connection = None
+                raise TradingStatisticsServiceException("The writer process is not available.") from e
+
+        if not succeeded:
+            raise result
+        return result
+
+    def add_batch(self, symbol: str, values: list[float], timestamps: list[float] | None = None, compact: bool = False) -> None:
+        """
+        Adds a batch of data for a symbol through the writer, see `TradingStatisticsService.add_batch`.
+        Compact storage is not available, since readers map the trees of the writer as SharedArraySegmentTrees.
+        """
+        if compact:
+            raise TradingStatisticsServiceException("Compact storage is not available in shared memory mode.")
+        self._call_writer("add_batch", symbol, values, timestamps)
+        self._notify([symbol])
+
+    def add_batches(self, batches: list[tuple[str, list[float]]]) -> list[TradingStatisticsServiceException | None]:
+        """Adds batches of data for several symbols through the writer, see `TradingStatisticsService.add_batches`."""
+        errors = self._call_writer("add_batches", batches)
+        self._notify([symbol for (symbol, _), error in zip(batches, errors) if error is None])
+        return errors
+
+    def _notify(self, symbols: list[str]) -> None:
+        for symbol in symbols:
+            for listener in self.batch_listeners:
+                listener(symbol)
+
+    def save_snapshot(self, path: str) -> int:
+        """Has the writer write a snapshot, see `TradingStatisticsService.save_snapshot`."""
+        return self._call_writer("save_snapshot", path)
+
+    def get_stats_in_time_range(self, symbol: str, start: float | None = None, end: float | None = None) -> dict[str, float]:
+        """
+        Retrieves statistical data for a time range through the writer, which holds the timestamps,
+        see `TradingStatisticsService.get_stats_in_time_range`.
+        """
+        return self._call_writer("get_stats_in_time_range", symbol, start, end)
+
+    def get_candles(self, symbol: str, resolution: int, count: int | None = None, end: int | None = None) -> dict[str, Any]:
+        """Retrieves OHLC candles through the writer, which maintains them, see `TradingStatisticsService.get_candles`."""
+        return self._call_writer("get_candles", symbol, resolution, count, end)
+
+    def get_stats_series(self, symbol: str, window: int, count: int, stride: int = 1, offset: int = 0) -> dict[str, Any]:
+        """Retrieves the statistical data of a series of windows from shared memory, see `TradingStatisticsService.get_stats_series`."""
+        TradingStatisticsService._check_series(window, count, stride, offset)
+        values = self._reader(symbol).get_data(series_span(window, count, stride, offset))
+        return TradingStatisticsService._stats_series(values, window, count, stride, offset)
+
+    def get_version(self, symbol: str) -> int:
+        """Returns the version of a symbol's data, which changes every time a batch is added to it."""
+        return self._reader(symbol).version
+
+    def get_stats(self, symbol: str, window_size_exponent: int) -> dict[str, float]:
+        """Retrieves statistical data for a symbol from shared memory, see `TradingStatisticsService.get_stats`."""
+        return self.get_stats_many(symbol, [window_size_exponent])[window_size_exponent]
+
+    def get_stats_many(self, symbol: str, window_size_exponents: list[int]) -> dict[int, dict[str, float]]:
+        """Retrieves statistical data for several window size exponents, see `TradingStatisticsService.get_stats_many`."""
+        reader = self._reader(symbol)
+        exponents = list(dict.fromkeys(window_size_exponents))
+
+        version = reader.version
+        stats = {}
+        for k in exponents:
+            cached = self.stats_cache.get((symbol, k, version))
+            if cached is not None:
+                stats[k] = cached
+
+        missing = [k for k in exponents if k not in stats]
+        if missing:
+            # A batch may have been added since the version was read, so stats are cached under the version they were computed from
+            version, results = reader.query_many_versioned(missing)
+            for k, result in zip(missing, results):
+                stats[k] = TradingStatisticsService._format_stats(result)
+                self.stats_cache.put((symbol, k, version), stats[k])
+
+        return {k: dict(stats[k]) for k in stats}
+
+    def get_stats_batch(self, queries: list[tuple[str, int]]) -> list[dict[str, float] | TradingStatisticsServiceException]:
+        """Retrieves statistical data for many (symbol, window size exponent) pairs, see `TradingStatisticsService.get_stats_batch`."""
+        exponents_by_symbol: dict[str, list[int]] = {}
+        for symbol, window_size_exponent in queries:
+            exponents_by_symbol.setdefault(symbol, []).append(window_size_exponent)
+
+        stats_by_symbol = {}
+        for symbol, window_size_exponents in exponents_by_symbol.items():
+            try:
+                stats_by_symbol[symbol] = self.get_stats_many(symbol, window_size_exponents)
+            except TradingStatisticsServiceException as e:
+                stats_by_symbol[symbol] = e
+
+        results = []
+        for symbol, window_size_exponent in queries:
+            stats = stats_by_symbol[symbol]
+            results.append(stats if isinstance(stats, TradingStatisticsServiceException) else stats[window_size_exponent])
+        return results
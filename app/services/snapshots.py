@@ -0,0 +1,131 @@
+import logging
+import mmap
+import os
+import struct
+import threading
+from typing import Callable, Iterable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Snapshot file layout (all integers little-endian):
+# - header: magic (8 bytes), symbol count (uint32)
+# - one index entry per symbol: name length (uint16), name (utf-8), version (uint64),
+#   data offset (uint64), number of values (uint64), flags (uint32)
+# - the values of every symbol as float64, each array aligned on 8 bytes
+SNAPSHOT_MAGIC = b"TPSNAP02"
+HEADER = struct.Struct("<8sI")
+ENTRY = struct.Struct("<QQQI")
+NAME_LENGTH = struct.Struct("<H")
+# The snapshots of earlier versions, whose index entries have no flags
+LEGACY_SNAPSHOT_MAGIC = b"TPSNAP01"
+LEGACY_ENTRY = struct.Struct("<QQQ")
+
+# The symbol is stored in the compact data engine (see `TradingStatisticsService.add_batch`)
+FLAG_COMPACT = 1
+
+
+def write_snapshot(path: str, symbols: Iterable[tuple[str, int, list[float], int]], sync: bool = True) -> int:
+    """
+    Writes the data of every symbol to a snapshot file.
+
+    The snapshot is first written to a temporary file which then replaces `path`, so a crash
+    while writing never leaves a partial snapshot behind.
+
+    Args:
+        path: The snapshot file to write.
+        symbols: (symbol, version, values, flags) entries, values being ordered oldest first.
+        sync: Whether to wait until the snapshot is on disk before returning.
+
+    Returns:
+        The number of symbols written.
+    """
+    entries = [(symbol.encode(), version, np.asarray(values, dtype="<f8"), flags) for symbol, version, values, flags in symbols]
+
+    index_size = HEADER.size + sum(NAME_LENGTH.size + len(name) + ENTRY.size for name, _, _, _ in entries)
+    offset = index_size + (-index_size) % 8
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as snapshot:
+        snapshot.write(HEADER.pack(SNAPSHOT_MAGIC, len(entries)))
+        for name, version, values, flags in entries:
+            snapshot.write(NAME_LENGTH.pack(len(name)) + name)
+            snapshot.write(ENTRY.pack(version, offset, len(values), flags))
+            offset += values.nbytes
+
+        snapshot.write(b"\0" * ((-index_size) % 8))
+        for _, _, values, _ in entries:
+            snapshot.write(memoryview(values).cast("B"))
+
+        if sync:
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+
+    os.replace(temporary_path, path)
+    return len(entries)
+
+
+def read_snapshot(path: str) -> tuple[mmap.mmap, dict[str, tuple[int, np.ndarray, int]]]:
+    """
+    Memory-maps a snapshot file.
+
+    The values are returned as read-only arrays backed by the mapping, so nothing is read from
+    disk until the values of a symbol are actually used.
+
+    Returns:
+        The mapping (which must stay open while the arrays are in use) and, for every symbol, its
+        version, values and flags (0 for the snapshots of earlier versions).
+    """
+    with open(path, "rb") as snapshot:
+        mapping = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, symbol_count = HEADER.unpack_from(mapping, 0)
+    if magic not in (SNAPSHOT_MAGIC, LEGACY_SNAPSHOT_MAGIC):
+        mapping.close()
+        raise ValueError(f"{path} is not a snapshot file.")
+    entry = ENTRY if magic == SNAPSHOT_MAGIC else LEGACY_ENTRY
+
+    symbols = {}
+    position = HEADER.size
+    for _ in range(symbol_count):
+        (name_length,) = NAME_LENGTH.unpack_from(mapping, position)
+        position += NAME_LENGTH.size
+        name = mapping[position:position + name_length].decode()
+        position += name_length
+        version, offset, count, *flags = entry.unpack_from(mapping, position)
+        position += entry.size
+
+        symbols[name] = (version, np.frombuffer(mapping, dtype="<f8", count=count, offset=offset), flags[0] if flags else 0)
+
+    return mapping, symbols
+
+
+class SnapshotScheduler:
+    def __init__(self, take_snapshot: Callable[[], object], interval_seconds: float) -> None:
+        """
+        Periodically takes snapshots in a background daemon thread.
+
+        Args:
+            take_snapshot: The function writing a snapshot.
+            interval_seconds: The time between two snapshots.
+        """
+        self.take_snapshot = take_snapshot
+        self.interval_seconds = interval_seconds
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="snapshot-scheduler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval_seconds):
+            try:
+                self.take_snapshot()
+            except Exception:
+                logger.exception("Scheduled snapshot failed.")
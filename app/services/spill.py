@@ -0,0 +1,150 @@
+import hashlib
+import mmap
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterator
+
+import numpy as np
+
+from app.services.snapshots import read_snapshot, write_snapshot
+
+
+class SpillStore:
+    def __init__(self, memory_budget_bytes: int, directory: str) -> None:
+        """
+        Keeps the data engines of a service within a memory budget by spilling the least recently
+        used ones to disk.
+
+        The store tracks the estimated memory of every engine in memory, in least recently used
+        order. Once the total exceeds the budget, the service spills engines taken from `victims`
+        with `spill`: their data is written to a file in the snapshot format and memory-mapped, and
+        the engine is rebuilt from the mapping on its next access, after which `reloaded` releases
+        the file.
+
+        Args:
+            memory_budget_bytes: The memory the engines may hold in total.
+            directory: The directory of the spill files.
+        """
+        self.memory_budget_bytes = memory_budget_bytes
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+        # The estimated memory of the engines in memory, least recently used first
+        self._sizes: OrderedDict[str, int] = OrderedDict()
+        self._memory_bytes = 0
+        self._mappings: dict[str, mmap.mmap] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.spills = 0
+        self.reloads = 0
+        self.spill_seconds = 0.0
+        self.reload_seconds = 0.0
+
+    def _path(self, symbol: str) -> str:
+        return os.path.join(self.directory, f"{hashlib.sha1(symbol.encode()).hexdigest()[:16]}.spill")
+
+    def touch(self, symbol: str, size: int | None = None, hit: bool | None = True) -> None:
+        """
+        Marks the engine of a symbol as the most recently used.
+
+        Args:
+            size: The new estimated memory of the engine, if it changed.
+            hit: Whether the engine was in memory, or had to be built first (None to count neither).
+        """
+        with self._lock:
+            if hit is True:
+                self.hits += 1
+            elif hit is False:
+                self.misses += 1
+
+            if size is not None:
+                self._memory_bytes += size - self._sizes.get(symbol, 0)
+                self._sizes[symbol] = size
+            if symbol in self._sizes:
+                self._sizes.move_to_end(symbol)
+
+    def forget(self, symbol: str) -> None:
+        """Stops tracking the engine of a symbol, which is no longer in memory."""
+        with self._lock:
+            self._memory_bytes -= self._sizes.pop(symbol, 0)
+
+    def victims(self, exclude: str) -> Iterator[str]:
+        """Yields the least recently used symbols (other than `exclude`) while the engines exceed the budget."""
+        while True:
+            with self._lock:
+                if self._memory_bytes <= self.memory_budget_bytes:
+                    return
+                victim = next((symbol for symbol in self._sizes if symbol != exclude), None)
+                if victim is None:
+                    return
+                # Taken out of the queue so that concurrent callers pick other victims
+                self._sizes.move_to_end(victim)
+            yield victim
+
+    def spill(self, symbol: str, version: int, values: Any) -> np.ndarray:
+        """
+        Writes the data of a symbol to its spill file; the symbol's engine must then be dropped.
+
+        Returns:
+            The values, backed by a read-only mapping of the file.
+        """
+        started = time.perf_counter()
+        path = self._path(symbol)
+        # Spill files do not need to survive a crash, the snapshots and write-ahead log cover that.
+        # The service keeps the choice of engine of spilled symbols, so no flags are written.
+        write_snapshot(path, [(symbol, version, values, 0)], sync=False)
+        mapping, symbols = read_snapshot(path)
+        os.unlink(path)
+
+        with self._lock:
+            self._mappings[symbol] = mapping
+            self._memory_bytes -= self._sizes.pop(symbol, 0)
+            self.spills += 1
+            self.spill_seconds += time.perf_counter() - started
+        return symbols[symbol][1]
+
+    def reloaded(self, symbol: str, seconds: float) -> None:
+        """Records that the engine of a symbol was rebuilt, in `seconds`, releasing its spill file if any."""
+        with self._lock:
+            mapping = self._mappings.pop(symbol, None)
+            self.reloads += 1
+            self.reload_seconds += seconds
+
+        if mapping is not None:
+            try:
+                mapping.close()
+            except BufferError:
+                # An array still references the mapping, which is closed when it is garbage collected
+                pass
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sizes.clear()
+            self._memory_bytes = 0
+            self._mappings.clear()
+
+    def stats(self) -> dict[str, float]:
+        """
+        Returns:
+            The memory budget and the estimated memory of the engines in memory, the number of symbols
+            in memory and spilled, the engine accesses served from memory (hits) or after a rebuild
+            (misses), and the number and average latency of spills and reloads.
+        """
+        with self._lock:
+            return {
+                "memory_budget_bytes": self.memory_budget_bytes,
+                "memory_bytes": self._memory_bytes,
+                "symbols_in_memory": len(self._sizes),
+                "symbols_spilled": len(self._mappings),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / (self.hits + self.misses), 4) if self.hits + self.misses else 0,
+                "spills": self.spills,
+                "reloads": self.reloads,
+                "average_spill_ms": round(1000 * self.spill_seconds / self.spills, 3) if self.spills else 0,
+                "average_reload_ms": round(1000 * self.reload_seconds / self.reloads, 3) if self.reloads else 0,
+            }
@@ -0,0 +1,208 @@
+import json
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterable, Iterator
+
+import numpy as np
+
+from app.services.exceptions import TradingStatisticsServiceException
+
+# A parsed frame: (symbol, values, None), or (None, None, error message) if the frame is invalid
+Frame = tuple[str | None, np.ndarray | None, str | None]
+
+
+def _parse_frame(line: bytes, max_frame_values: int) -> Frame:
+    try:
+        data = json.loads(line)
+        symbol = data.get("symbol") if isinstance(data, dict) else None
+        values = data.get("values") if isinstance(data, dict) else None
+
+        if (not symbol or not isinstance(symbol, str) or not isinstance(values, list) or len(values) > max_frame_values or
+                not all(type(value) in (int, float) for value in values)):
+            raise ValueError()
+        return symbol, np.asarray(values, dtype=np.float64), None
+
+    except (ValueError, TypeError):
+        return None, None, f"Invalid frame, ensure it is a JSON object with a symbol and values, a list of up to {max_frame_values} floats"
+
+
+def read_frames(chunks: Iterable[bytes], max_frame_values: int = 10000) -> Iterator[list[Frame]]:
+    """
+    Incrementally parses a stream of newline-delimited JSON frames, {"symbol": "AAPL", "values": [1.0, 2.0]}.
+
+    Args:
+        chunks: The stream, as chunks of bytes split anywhere (a frame may span several chunks).
+        max_frame_values: The maximum number of values of a frame.
+
+    Yields:
+        For every chunk, the frames it completes.
+    """
+    partial = b""
+    for chunk in chunks:
+        lines = (partial + chunk).split(b"\n")
+        partial = lines.pop()
+        yield [_parse_frame(line, max_frame_values) for line in lines if line.strip()]
+
+    if partial.strip():
+        yield [_parse_frame(partial, max_frame_values)]
+
+
+_END = object()
+
+
+def read_ahead(chunks: Iterable[bytes], max_buffered_chunks: int = 1024) -> Iterator[bytes]:
+    """
+    Reads a stream in a background thread, so that whatever arrives while the consumer is busy is
+    handed over at once when it asks for more.
+
+    Args:
+        chunks: The stream, whose iteration may block until data arrives.
+        max_buffered_chunks: The maximum number of chunks read ahead of the consumer.
+
+    Yields:
+        All the chunks received since the previous iteration, joined (waiting for at least one).
+    """
+    buffered = queue.Queue(max_buffered_chunks)
+    stopped = threading.Event()
+
+    def put(item) -> bool:
+        while not stopped.is_set():
+            try:
+                buffered.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def read() -> None:
+        try:
+            for chunk in chunks:
+                if not put(chunk):
+                    return
+            put(_END)
+        except Exception as e:
+            put(e)
+
+    threading.Thread(target=read, name="stream-reader", daemon=True).start()
+
+    try:
+        while True:
+            received = [buffered.get()]
+            while received[-1] is not _END and not isinstance(received[-1], Exception):
+                try:
+                    received.append(buffered.get_nowait())
+                except queue.Empty:
+                    break
+
+            last = received[-1]
+            if last is _END or isinstance(last, Exception):
+                received.pop()
+
+            if received:
+                yield b"".join(received)
+            if isinstance(last, Exception):
+                raise last
+            if last is _END:
+                return
+    finally:
+        # Lets the reader give up if the consumer stops early
+        stopped.set()
+
+
+class StreamIngestor:
+    def __init__(
+        self,
+        service: Any,
+        max_frame_values: int = 10000,
+        max_micro_batch_values: int = 10 ** 5,
+        ack_interval_seconds: float = 0.1,
+        clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        """
+        Applies a stream of frames to a service in micro-batches.
+
+        The stream is read ahead in a background thread, and all the frames of a symbol received while
+        the previous micro-batch was being applied are concatenated and added with a single add_batch
+        call. The size of the micro-batches thus adapts to the rate of the stream: a slow stream is
+        applied frame by frame as soon as each frame arrives, a fast one in larger appends. A
+        micro-batch is also applied as soon as it holds max_micro_batch_values values.
+
+        Args:
+            service: The service the frames are added to (any service with an add_batch method).
+            max_frame_values: The maximum number of values of a frame.
+            max_micro_batch_values: The maximum number of values pending before they are applied.
+            ack_interval_seconds: The minimum time between two acknowledgements.
+            clock: The time source of the acknowledgement interval.
+        """
+        self.service = service
+        self.max_frame_values = max_frame_values
+        self.max_micro_batch_values = max_micro_batch_values
+        self.ack_interval_seconds = ack_interval_seconds
+        self.clock = clock
+
+        self.frames = 0
+        self.applied_frames = 0
+        self.applied_values = 0
+        self.errors = []
+        self._pending: dict[str, list[tuple[int, np.ndarray]]] = {}
+        self._pending_values = 0
+
+    def _apply(self) -> None:
+        for symbol, frames in self._pending.items():
+            values = frames[0][1] if len(frames) == 1 else np.concatenate([values for _, values in frames])
+            try:
+                self.service.add_batch(symbol, values)
+                self.applied_frames += len(frames)
+                self.applied_values += len(values)
+            except TradingStatisticsServiceException as e:
+                self.errors.append({"frames": [number for number, _ in frames], "symbol": symbol, "error": str(e)})
+            except Exception as e:
+                # Only the frames of this symbol are lost, the stream and the other symbols go on
+                self.errors.append({"frames": [number for number, _ in frames], "symbol": symbol, "error": "An unexpected error occurred", "details": str(e)})
+
+        self._pending = {}
+        self._pending_values = 0
+
+    def _ack(self, done: bool = False) -> dict[str, Any]:
+        ack = {"frames": self.applied_frames, "values": self.applied_values, "errors": self.errors}
+        if done:
+            ack["done"] = True
+        self.errors = []
+        return ack
+
+    def ingest(self, chunks: Iterable[bytes]) -> Iterator[dict[str, Any]]:
+        """
+        Applies the frames of a stream.
+
+        Args:
+            chunks: The stream, as chunks of bytes split anywhere, e.g. the lines of a request body.
+
+        Yields:
+            Acknowledgements, at most one per ack_interval_seconds and a last one when the stream ends,
+            with the total number of frames and values applied and the errors since the previous one.
+            Frames are numbered from 1 in the order of the stream.
+        """
+        last_ack = self.clock()
+
+        for frames in read_frames(read_ahead(chunks), self.max_frame_values):
+            for symbol, values, error in frames:
+                self.frames += 1
+                if error is not None:
+                    self.errors.append({"frames": [self.frames], "error": error})
+                    continue
+
+                self._pending.setdefault(symbol, []).append((self.frames, values))
+                self._pending_values += len(values)
+                if self._pending_values >= self.max_micro_batch_values:
+                    self._apply()
+
+            self._apply()
+
+            now = self.clock()
+            if now - last_ack >= self.ack_interval_seconds:
+                last_ack = now
+                yield self._ack()
+
+        self._apply()
+        yield self._ack(done=True)
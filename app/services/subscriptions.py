@@ -0,0 +1,188 @@
+import logging
+import threading
+from typing import Any
+
+from app.services.exceptions import TradingStatisticsServiceException
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    def __init__(self, symbol: str, window_size_exponents: list[int]) -> None:
+        """
+        A client's subscription to the stats of a symbol for a set of window size exponents.
+
+        Updates are conflated: only the latest one is kept until the client takes it, so a slow client
+        skips intermediate updates instead of accumulating a backlog.
+
+        Attributes:
+        - conflated: The number of updates replaced by a newer one before the client took them.
+        """
+        self.symbol = symbol
+        self.window_size_exponents = list(dict.fromkeys(window_size_exponents))
+        self.conflated = 0
+        self._latest = None
+        self._closed = False
+        self._condition = threading.Condition()
+
+    @property
+    def closed(self) -> bool:
+        """Whether the subscription was closed, after which no more updates are published."""
+        return self._closed
+
+    def publish(self, update: dict[str, Any]) -> None:
+        with self._condition:
+            if self._latest is not None:
+                self.conflated += 1
+            self._latest = update
+            self._condition.notify_all()
+
+    def next_update(self, timeout: float | None = None) -> dict[str, Any] | None:
+        """
+        Waits for the next update.
+
+        Returns:
+            The latest update, or None if the timeout expired or the subscription was closed first.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._latest is not None or self._closed, timeout)
+            update, self._latest = self._latest, None
+            return update
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class SubscriptionHub:
+    def __init__(self, service: Any, poll_interval_seconds: float = 0) -> None:
+        """
+        Pushes the stats of symbols to their subscribers as batches are added.
+
+        The hub listens to the batches added through `service`. After a batch, a dispatcher thread
+        computes the stats of the symbol for the union of the window size exponents of its subscribers
+        with a single `get_stats_many` call, and publishes them to every subscriber. Batches arriving
+        while the dispatcher is busy are conflated, so the query load follows the write rate and not
+        the number of subscribers.
+
+        Args:
+            service: The service queried for stats (any service with get_version and get_stats_many).
+            poll_interval_seconds: If positive, the hub also polls the versions of the subscribed symbols,
+                to notice batches added by other processes (e.g. in shared memory mode).
+        """
+        self.service = service
+        self.poll_interval_seconds = poll_interval_seconds
+        self.computations = 0
+
+        self._subscriptions: dict[str, set[Subscription]] = {}
+        self._published_versions: dict[str, int] = {}
+        self._dirty: set[str] = set()
+        self._condition = threading.Condition()
+        self._stopped = False
+
+        if hasattr(service, "batch_listeners"):
+            service.batch_listeners.append(self.notify)
+
+        self._dispatcher = threading.Thread(target=self._dispatch, name="subscription-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+        self._poller = None
+        if self.poll_interval_seconds > 0:
+            self._poller = threading.Thread(target=self._poll, name="subscription-poller", daemon=True)
+            self._poller.start()
+
+    def subscribe(self, symbol: str, window_size_exponents: list[int]) -> Subscription:
+        """Subscribes to the stats of a symbol, starting with its current stats if it exists."""
+        subscription = Subscription(symbol, window_size_exponents)
+        with self._condition:
+            self._subscriptions.setdefault(symbol, set()).add(subscription)
+
+        try:
+            version = self.service.get_version(symbol)
+            stats = self.service.get_stats_many(symbol, subscription.window_size_exponents)
+            subscription.publish({"symbol": symbol, "version": version, "stats": stats})
+        except TradingStatisticsServiceException:
+            pass
+
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscription.close()
+        with self._condition:
+            subscriptions = self._subscriptions.get(subscription.symbol, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.symbol, None)
+                self._published_versions.pop(subscription.symbol, None)
+
+    def notify(self, symbol: str) -> None:
+        """Signals that a batch was added to a symbol."""
+        with self._condition:
+            if symbol in self._subscriptions:
+                self._dirty.add(symbol)
+                self._condition.notify_all()
+
+    def _dispatch(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._dirty or self._stopped)
+                if self._stopped:
+                    return
+                dirty, self._dirty = self._dirty, set()
+
+            for symbol in dirty:
+                try:
+                    self._publish(symbol)
+                except Exception:
+                    logger.exception(f"Failed to publish the stats of {symbol}.")
+
+    def _publish(self, symbol: str) -> None:
+        with self._condition:
+            subscriptions = list(self._subscriptions.get(symbol, ()))
+        if not subscriptions:
+            return
+
+        # Read before the stats, so that a batch added meanwhile is published again with its own version
+        version = self.service.get_version(symbol)
+        if self._published_versions.get(symbol) == version:
+            return
+
+        window_size_exponents = list(dict.fromkeys(k for subscription in subscriptions for k in subscription.window_size_exponents))
+        stats = self.service.get_stats_many(symbol, window_size_exponents)
+        self.computations += 1
+        self._published_versions[symbol] = version
+
+        for subscription in subscriptions:
+            subscription.publish({
+                "symbol": symbol,
+                "version": version,
+                "stats": {k: stats[k] for k in subscription.window_size_exponents},
+            })
+
+    def _poll(self) -> None:
+        while True:
+            with self._condition:
+                if self._condition.wait_for(lambda: self._stopped, self.poll_interval_seconds):
+                    return
+                symbols = list(self._subscriptions)
+
+            for symbol in symbols:
+                try:
+                    if self.service.get_version(symbol) != self._published_versions.get(symbol):
+                        self.notify(symbol)
+                except TradingStatisticsServiceException:
+                    pass
+
+    def close(self) -> None:
+        """Stops the hub and closes every subscription."""
+        with self._condition:
+            self._stopped = True
+            subscriptions = [subscription for subscriptions in self._subscriptions.values() for subscription in subscriptions]
+            self._condition.notify_all()
+
+        for subscription in subscriptions:
+            subscription.close()
+        self._dispatcher.join()
+        if self._poller is not None:
+            self._poller.join()
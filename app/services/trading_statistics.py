@@ -1,13 +1,41 @@
 import logging
-from typing import Any, Protocol
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Protocol
 
-from app.data_structures.exceptions import SegmentTreeCapacityLimitReachedException
-from app.services.exceptions import TradingStatisticsServiceException, TradingStatisticsServiceSymbolDataLimitReachedException, TradingStatisticsServiceSymbolNotFoundException, TradingStatisticsServiceSymbolsLimitReachedException
+import numpy as np
+
+from app.data_structures.candles import CandleRollups
+from app.data_structures.compact_segment_tree import CompactArraySegmentTree
+from app.data_structures.exceptions import SegmentTreeCapacityLimitReachedException, TimestampsNotMonotonicException
+from app.data_structures.rolling_series import rolling_stats, series_span
+from app.data_structures.timestamp_index import TimestampIndex, as_timestamps
+from app.services.cache import StatsCache
+from app.services.locks import ReadWriteLock
+from app.services.metrics import EngineMetrics, engine_memory_bytes
+from app.services.snapshots import FLAG_COMPACT, read_snapshot, write_snapshot
+from app.services.spill import SpillStore
+from app.services.wal import WriteAheadLog
+from app.services.exceptions import TradingStatisticsServiceException, TradingStatisticsServiceSymbolDataLimitReachedException, TradingStatisticsServiceSymbolNotFoundException, TradingStatisticsServiceSymbolsLimitReachedException, TradingStatisticsServiceTimestampsException
+
+# The quantiles added to the stats by engines estimating them (see QuantileArraySegmentTree)
+QUANTILES = (0.5, 0.95, 0.99)
+QUANTILE_NAMES = ("p50", "p95", "p99")
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class StatisticalDataStructure(Protocol):
+    """
+    Data engines receive their data either as a list of floats or as a float64 buffer (e.g. a NumPy
+    array built from a binary request body), which array-backed engines consume without copying.
+    """
+
+    max_window_size: int
+    size: int
+
     def build(self, data: list[float]) -> None:
         """Builds the data structure with an initial dataset."""
     
@@ -17,42 +45,324 @@ class StatisticalDataStructure(Protocol):
     def query(self, k: int) -> tuple[float, float, float, float, float]:
         """Queries statistical data (min, max, last, avg, variance) for the last 10^k data points."""
 
+    def query_many(self, ks: list[int]) -> list[tuple[float, float, float, float, float]]:
+        """Queries statistical data for several values of k at once, in the order of `ks`."""
+
+    def query_range(self, start: int, count: int) -> tuple[float, float, float, float, float]:
+        """Queries statistical data for `count` data points beginning at window position `start` (0 being the oldest)."""
+
+    def get_data(self, last: int | None = None) -> list[float]:
+        """Returns the data points currently held (only the `last` most recent ones if given), oldest first."""
+
 class TradingStatisticsService:
     MAX_SYMBOLS_NUMBER = 10
 
-    def __init__(self, data_engine: StatisticalDataStructure) -> None:
+    def __init__(
+        self,
+        data_engine: StatisticalDataStructure,
+        stats_cache_size: int = 1024,
+        stats_cache_eviction_policy: str = "lru",
+        write_ahead_log: WriteAheadLog | None = None,
+        engine_metrics: EngineMetrics | None = None,
+        memory_budget_bytes: int | None = None,
+        spill_directory: str | None = None,
+        candle_resolutions: list[int] | None = None,
+        compact_data_engine: StatisticalDataStructure = CompactArraySegmentTree
+    ) -> None:
         """
         Initialize the TradingStatisticsService with a data engine that adheres to the StatisticalDataStructure protocol.
         
         Args:
             data_engine: An implementation of the StatisticalDataStructure protocol (e.g., SegmentTree).
+            stats_cache_size: The maximum number of computed stats kept in the cache (0 disables it).
+            stats_cache_eviction_policy: How the stats cache evicts entries when full ("lru" or "fifo").
+            write_ahead_log: An optional log to which every accepted batch is appended before add_batch returns.
+            engine_metrics: Optional metrics instrumenting the data engine of every symbol.
+            memory_budget_bytes: An optional budget for the memory of all the data engines. When set,
+                it replaces MAX_SYMBOLS_NUMBER: once exceeded, the least recently used engines are
+                spilled to spill_directory and rebuilt on their next access (see `SpillStore`).
+            spill_directory: The directory of the spill files, required with memory_budget_bytes.
+            candle_resolutions: The numbers of data points per candle of the OHLC candles maintained
+                for every symbol (see `get_candles`), none by default.
+            compact_data_engine: The data engine of the symbols created with `compact=True` (see `add_batch`).
+
+        Every symbol has a version, bumped by each batch added to it. Computed stats are cached per
+        (symbol, k, version), so a new batch implicitly invalidates all cached stats of its symbol.
+
+        The service is thread-safe. Every symbol has its own read/write lock: batches hold it exclusively
+        while they update the engine, queries share it, and operations on different symbols never wait
+        for each other. Creating a symbol is serialised so that MAX_SYMBOLS_NUMBER is never exceeded.
+
+        Callables appended to `batch_listeners` are called with the symbol after every batch added.
+
+        Batches may carry a timestamp per value, kept in a `TimestampIndex` next to the engine of the
+        symbol so that stats can also be queried by time range (see `get_stats_in_time_range`).
+        Timestamps are held in memory only: they are not part of snapshots and the write-ahead log.
+
+        Candles are also maintained next to the engine, as `CandleRollups` updated with every batch.
+        Symbols restored from a snapshot or the write-ahead log get their candles rebuilt from their
+        data, aligned to its oldest data point.
+
+        Symbols created with `compact=True` keep their compact engine when it is spilled and rebuilt.
+        The choice is flagged in snapshots and in the write-ahead log record creating the symbol, so
+        restored symbols keep it too.
         """
         self.data_storage: dict[str, StatisticalDataStructure] = {}
         self.data_engine = data_engine
+        self.versions: dict[str, int] = {}
+        self.symbol_locks: dict[str, ReadWriteLock] = {}
+        self.stats_cache = StatsCache(stats_cache_size, stats_cache_eviction_policy)
+        self.write_ahead_log = write_ahead_log
+        self.engine_metrics = engine_metrics
+        self.batch_listeners: list[Callable[[str], None]] = []
+        self.timestamp_indexes: dict[str, TimestampIndex] = {}
+        self.candle_resolutions = list(candle_resolutions or [])
+        self.candles: dict[str, CandleRollups] = {}
+        self.compact_data_engine = compact_data_engine
+        # Symbols created with compact storage, which keep it when their engine is rebuilt
+        self.compact_symbols: set[str] = set()
+        # Distinguishes the versions of this service instance from those of a previous run
+        self.instance_id = uuid.uuid4().hex[:8]
+        # Symbols loaded from a snapshot whose engine is built on first access
+        self.pending_restores: dict[str, list[float]] = {}
+        self._snapshot_mapping = None
+        self.spill_store = SpillStore(memory_budget_bytes, spill_directory) if memory_budget_bytes is not None else None
+        self._symbols_lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+
+    def _create_engine(self, symbol: str) -> StatisticalDataStructure:
+        """Creates the data engine of a new symbol."""
+        return (self.compact_data_engine if symbol in self.compact_symbols else self.data_engine)()
+
+    def _new_engine(self, symbol: str) -> StatisticalDataStructure:
+        engine = self._create_engine(symbol)
+        if self.engine_metrics is not None:
+            self.engine_metrics.instrument(engine, symbol)
+        return engine
+
+    def _get_symbol_lock(self, symbol: str) -> ReadWriteLock:
+        try:
+            return self.symbol_locks[symbol]
+        except KeyError:
+            raise TradingStatisticsServiceSymbolNotFoundException(f"Symbol {symbol} not found.")
+
+    def _restore_pending_locked(self, symbol: str) -> None:
+        """Builds the engine of a symbol still pending restoration from a snapshot; the symbol's write lock must be held."""
+        values = self.pending_restores.get(symbol)
+        if values is None:
+            return
 
-    def add_batch(self, symbol: str, values: list[float]) -> None:
+        started = time.perf_counter()
+        engine = self._new_engine(symbol)
+        engine.build(values[max(len(values) - engine.max_window_size, 0):])
+        self.data_storage[symbol] = engine
+
+        if self.candle_resolutions and symbol not in self.candles:
+            self.candles[symbol] = CandleRollups(self.candle_resolutions)
+            self.candles[symbol].append(values[max(len(values) - engine.max_window_size, 0):])
+        del self.pending_restores[symbol], values
+
+        if self.spill_store is not None:
+            self.spill_store.reloaded(symbol, time.perf_counter() - started)
+            self.spill_store.touch(symbol, engine_memory_bytes(engine), hit=False)
+
+    def _restore_pending(self, symbol: str) -> bool:
+        """Returns whether the engine of the symbol had to be built."""
+        if symbol in self.pending_restores:
+            with self._get_symbol_lock(symbol).write():
+                restored = symbol in self.pending_restores
+                self._restore_pending_locked(symbol)
+            return restored
+        return False
+
+    @contextmanager
+    def _reading(self, symbol: str) -> Iterator[StatisticalDataStructure]:
+        """Holds the read lock of a symbol whose engine is in memory, building it first if needed."""
+        lock = self._get_symbol_lock(symbol)
+        restored = False
+        while True:
+            restored = self._restore_pending(symbol) or restored
+            lock.acquire_read()
+            # The engine may have been spilled again before the read lock was acquired
+            if symbol not in self.pending_restores:
+                break
+            lock.release_read()
+
+        try:
+            if self.spill_store is not None and not restored:
+                self.spill_store.touch(symbol)
+            yield self.data_storage[symbol]
+        finally:
+            lock.release_read()
+
+        if restored:
+            self._enforce_memory_budget(symbol)
+
+    def _spill(self, symbol: str) -> None:
+        """Writes the engine of a symbol to disk and drops it from memory."""
+        with self.symbol_locks[symbol].write():
+            engine = self.data_storage.pop(symbol, None)
+            if engine is None:
+                self.spill_store.forget(symbol)
+                return
+
+            values = np.asarray(engine.get_data(), dtype=np.float64)
+            self.pending_restores[symbol] = self.spill_store.spill(symbol, self.versions[symbol], values)
+            logger.info(f"Spilled symbol {symbol} to disk.")
+
+    def _enforce_memory_budget(self, symbol: str) -> None:
+        """Spills the least recently used engines, other than the symbol's, until they fit in the memory budget."""
+        if self.spill_store is None:
+            return
+        for victim in self.spill_store.victims(exclude=symbol):
+            self._spill(victim)
+
+    def get_memory_stats(self) -> dict[str, float]:
+        """
+        Returns the memory budget statistics (see `SpillStore.stats`).
+
+        Raises:
+            TradingStatisticsServiceException: If no memory budget is configured.
+        """
+        if self.spill_store is None:
+            raise TradingStatisticsServiceException("No memory budget is configured.")
+        return self.spill_store.stats()
+
+    def add_batch(self, symbol: str, values: list[float], timestamps: list[float] | None = None, compact: bool = False) -> None:
         """
         Adds a batch of data for a specific symbol. If the symbol already exists, appends the new data.
 
         Args:
             symbol: The symbol representing the trading data (e.g., "AAPL").
-            values: A list of data points (e.g., stock prices) to add to the engine.
+            values: A list or float64 array of data points (e.g., stock prices) to add to the engine.
+            timestamps: Optional timestamps of the values (e.g. seconds since the epoch), non-decreasing
+                and not older than those of the previous batches. Once a symbol has received
+                timestamps, all its batches must carry them.
+            compact: Whether a symbol created by this batch stores its data in `compact_data_engine`
+                (by default a `CompactArraySegmentTree`, keeping values as float32) instead of the
+                data engine of the service. Ignored for existing symbols.
+
+        Raises:
+            TradingStatisticsServiceTimestampsException: If the timestamps are missing or invalid.
         """
-        try:
-            if symbol not in self.data_storage:
-                if len(self.data_storage) >= self.MAX_SYMBOLS_NUMBER:
+        if timestamps is not None:
+            if len(timestamps) != len(values):
+                raise TradingStatisticsServiceTimestampsException(f"Expected one timestamp per value for symbol {symbol}.")
+            try:
+                # Checked before the symbol is created, so that an invalid first batch does not leave an empty symbol behind
+                timestamps = as_timestamps(timestamps)
+            except TimestampsNotMonotonicException as e:
+                raise TradingStatisticsServiceTimestampsException(f"Timestamps of symbol {symbol} must not decrease.") from e
+
+        with self._symbols_lock:
+            lock = self.symbol_locks.get(symbol)
+            created = lock is None
+            if created:
+                if self.spill_store is None and len(self.symbol_locks) >= self.MAX_SYMBOLS_NUMBER:
                     logger.error(f"Symbol limit reached. Cannot add {symbol}.")
-                    raise TradingStatisticsServiceSymbolsLimitReachedException()
+                    raise TradingStatisticsServiceSymbolsLimitReachedException(f"Symbol limit reached. Cannot add {symbol}.")
+                lock = self.symbol_locks[symbol] = ReadWriteLock()
+                # Nobody else can see the new lock yet, so this does not wait
+                lock.acquire_write()
+
+        if not created:
+            lock.acquire_write()
+
+        sequence = None
+        try:
+            index = self.timestamp_indexes.get(symbol)
+            if timestamps is not None:
+                if index is None:
+                    index = TimestampIndex()
+                else:
+                    index.validate(timestamps)
+            elif index is not None:
+                raise TradingStatisticsServiceTimestampsException(f"Symbol {symbol} has timestamps, its batches must carry them.")
+
+            restored = symbol in self.pending_restores
+            if created:
                 logger.info(f"Creating new data engine for symbol {symbol} and adding batch.")
-                self.data_storage[symbol] = self.data_engine()
+                if compact:
+                    self.compact_symbols.add(symbol)
+                self.data_storage[symbol] = self._new_engine(symbol)
+                self.versions[symbol] = 0
                 self.data_storage[symbol].build(values)
             else:
+                self._restore_pending_locked(symbol)
                 self.data_storage[symbol].append_data(values)
+            self.versions[symbol] += 1
+
+            if timestamps is not None:
+                index.append(timestamps)
+                # Timestamps of the data points the engine evicted are dropped with them
+                index.trim(self.data_storage[symbol].size)
+                self.timestamp_indexes[symbol] = index
+
+            if self.candle_resolutions:
+                candles = self.candles.setdefault(symbol, CandleRollups(self.candle_resolutions))
+                candles.append(values)
+                candles.trim(self.data_storage[symbol].size)
+
+            if self.spill_store is not None:
+                self.spill_store.touch(symbol, engine_memory_bytes(self.data_storage[symbol]), hit=None if created or restored else True)
+
+            if self.write_ahead_log is not None:
+                # Written under the lock so that the log keeps the order in which batches were applied
+                sequence = self.write_ahead_log.write(symbol, self.versions[symbol], values, compact=created and compact)
         
         except SegmentTreeCapacityLimitReachedException as e:
             logger.error(f"Error adding batch for symbol {symbol}: {str(e)}")
-            raise TradingStatisticsServiceSymbolDataLimitReachedException() from e
+            raise TradingStatisticsServiceSymbolDataLimitReachedException(f"Data limit reached for symbol {symbol}.") from e
+
+        except TimestampsNotMonotonicException as e:
+            raise TradingStatisticsServiceTimestampsException(f"Timestamps of symbol {symbol} must not decrease.") from e
+
+        finally:
+            lock.release_write()
+
+        if sequence is not None:
+            self.write_ahead_log.wait_until_durable(sequence)
+
+        self._enforce_memory_budget(symbol)
+
+        for listener in self.batch_listeners:
+            listener(symbol)
+
+    def add_batches(self, batches: list[tuple[str, list[float]]]) -> list[TradingStatisticsServiceException | None]:
+        """
+        Adds batches of data for several symbols in one call.
+
+        Args:
+            batches: (symbol, values) pairs, applied in order.
+
+        Returns:
+            For every batch, None if it was added or the exception explaining why it was not.
+        """
+        errors = []
+        for symbol, values in batches:
+            try:
+                self.add_batch(symbol, values)
+                errors.append(None)
+            except TradingStatisticsServiceException as e:
+                errors.append(e)
+        return errors
 
+    @staticmethod
+    def _add_quantiles(engine: StatisticalDataStructure, k: int, stats: dict[str, float]) -> dict[str, float]:
+        """Adds the quantiles of the last 10^k data points to their stats, for engines estimating them."""
+        if hasattr(engine, "query_quantiles"):
+            stats.update(zip(QUANTILE_NAMES, engine.query_quantiles(k, QUANTILES)))
+        return stats
+
+    @staticmethod
+    def _format_stats(result: tuple[float, float, float, float, float]) -> dict[str, float]:
+        return {
+            "min": result[0],
+            "max": result[1],
+            "last": result[2],
+            "avg": result[3],
+            "var": result[4]
+        }
 
     def get_stats(self, symbol: str, window_size_exponent: int) -> dict[str, float]:
         """
@@ -65,14 +375,270 @@ class TradingStatisticsService:
         Returns:
             A dictionary containing statistical data (min, max, last, avg, var).
         """
+        with self._reading(symbol) as engine:
+            key = (symbol, window_size_exponent, self.versions[symbol])
+
+            stats = self.stats_cache.get(key)
+            if stats is None:
+                stats = self._add_quantiles(engine, window_size_exponent, self._format_stats(engine.query(window_size_exponent)))
+                self.stats_cache.put(key, stats)
+        return dict(stats)
+
+    def get_stats_in_time_range(self, symbol: str, start: float | None = None, end: float | None = None) -> dict[str, float]:
+        """
+        Retrieves statistical data for the data points of a symbol whose timestamps are between
+        `start` and `end` (inclusive). The timestamp index is binary-searched for the positions of
+        these data points, which are then aggregated by the engine like a window of the last 10^k.
+
+        Args:
+            start: The earliest timestamp, None for no lower bound.
+            end: The latest timestamp, None for no upper bound.
+
+        Returns:
+            The statistical data of the range, the last number being that of the range, and the
+            number of data points in it.
+
+        Raises:
+            TradingStatisticsServiceSymbolNotFoundException: If the symbol does not exist.
+            TradingStatisticsServiceTimestampsException: If the symbol has no timestamps.
+        """
+        with self._reading(symbol) as engine:
+            index = self.timestamp_indexes.get(symbol)
+            if index is None:
+                raise TradingStatisticsServiceTimestampsException(f"Symbol {symbol} has no timestamps.")
+
+            first, count = index.positions(start, end)
+            # The index covers the most recent data points of the engine
+            stats = self._format_stats(engine.query_range(engine.size - index.size + first, count))
+
+        stats["count"] = count
+        return stats
+
+    def get_candles(self, symbol: str, resolution: int, count: int | None = None, end: int | None = None) -> dict[str, Any]:
+        """
+        Retrieves consecutive OHLC candles of a symbol, read as one slice of its candle rollup.
+
+        Args:
+            resolution: The number of data points per candle, one of `candle_resolutions`.
+            count: The maximum number of candles, all of those within the window by default.
+            end: The index after the last candle, by default that of the latest (possibly partial) candle.
+
+        Returns:
+            The resolution, the index of the first candle, and the open, high, low, close and mean
+            lists of the candles, oldest first.
+
+        Raises:
+            TradingStatisticsServiceSymbolNotFoundException: If the symbol does not exist or has no
+                candles (e.g. its first batch failed).
+            TradingStatisticsServiceException: If no candles are maintained at this resolution.
+        """
+        if resolution not in self.candle_resolutions:
+            raise TradingStatisticsServiceException(f"Candles of {resolution} data points are not maintained.")
+
+        with self._reading(symbol):
+            candles = self.candles.get(symbol)
+            if candles is None:
+                raise TradingStatisticsServiceSymbolNotFoundException(f"No candles found for symbol {symbol}.")
+            first, columns = candles.rollups[resolution].read(end, count)
+            # Copied under the lock, since the columns are views of the rollup
+            candles = {name: column.tolist() for name, column in columns.items()}
+
+        return {"resolution": resolution, "first": first, **candles}
+
+    @staticmethod
+    def _check_series(window: int, count: int, stride: int, offset: int) -> None:
+        if window < 1 or count < 1 or stride < 1 or offset < 0:
+            raise TradingStatisticsServiceException("The window, count and stride must be positive, and the offset non-negative.")
+
+    @staticmethod
+    def _stats_series(values: list[float], window: int, count: int, stride: int, offset: int) -> dict[str, Any]:
+        return {"window": window, "stride": stride, **rolling_stats(values, window, count, stride, offset)}
+
+    def get_stats_series(self, symbol: str, window: int, count: int, stride: int = 1, offset: int = 0) -> dict[str, Any]:
+        """
+        Retrieves the statistical data of a series of windows of any length, e.g. the stats of every
+        one of the last `count` windows of `window` data points for a backtest, in one pass over the
+        data points of the symbol (see `rolling_stats`) rather than one engine query per window.
+
+        Args:
+            window: The number of data points per window.
+            count: The maximum number of windows; only those lying entirely within the data points held are returned.
+            stride: The number of data points between the ends of consecutive windows.
+            offset: The number of most recent data points after the newest window.
+
+        Returns:
+            The window length, the stride, the offset of every window (the number of data points
+            after it), and the min, max, last, avg and var lists of the windows, oldest first.
+
+        Raises:
+            TradingStatisticsServiceSymbolNotFoundException: If the symbol does not exist.
+            TradingStatisticsServiceException: If a parameter is out of range.
+        """
+        self._check_series(window, count, stride, offset)
+
+        with self._reading(symbol) as engine:
+            values = engine.get_data(series_span(window, count, stride, offset))
+
+        # Engines return a copy of their data points, so the series is computed without holding the lock
+        return self._stats_series(values, window, count, stride, offset)
+
+    def get_memory_usage(self) -> dict[str, int]:
+        """Returns an estimate of the bytes held by the data engine of every symbol (see `engine_memory_bytes`)."""
+        return {symbol: engine_memory_bytes(engine) for symbol, engine in list(self.data_storage.items())}
+
+    def get_version(self, symbol: str) -> int:
+        """
+        Returns the version of a symbol's data, which changes every time a batch is added to it.
+
+        Raises:
+            TradingStatisticsServiceSymbolNotFoundException: If the symbol does not exist.
+        """
         try:
-            result = self.data_storage[symbol].query(window_size_exponent)
+            return self.versions[symbol]
         except KeyError:
             raise TradingStatisticsServiceSymbolNotFoundException(f"Symbol {symbol} not found.")
-        return {
-            "min": result[0],
-            "max": result[1],
-            "last": result[2],
-            "avg": result[3],
-            "var": result[4]
-        }
+
+    def get_stats_many(self, symbol: str, window_size_exponents: list[int]) -> dict[int, dict[str, float]]:
+        """
+        Retrieves statistical data for a given symbol and several window size exponents,
+        sharing a single traversal of the data engine.
+
+        Returns:
+            A dictionary mapping every window size exponent to its statistical data.
+        """
+        with self._reading(symbol) as engine:
+            version = self.versions[symbol]
+
+            stats = {}
+            for k in dict.fromkeys(window_size_exponents):
+                cached = self.stats_cache.get((symbol, k, version))
+                if cached is not None:
+                    stats[k] = cached
+
+            missing = [k for k in dict.fromkeys(window_size_exponents) if k not in stats]
+            if missing:
+                for k, result in zip(missing, engine.query_many(missing)):
+                    stats[k] = self._add_quantiles(engine, k, self._format_stats(result))
+                    self.stats_cache.put((symbol, k, version), stats[k])
+
+        return {k: dict(stats[k]) for k in stats}
+
+    def get_stats_batch(self, queries: list[tuple[str, int]]) -> list[dict[str, float] | TradingStatisticsServiceException]:
+        """
+        Retrieves statistical data for many (symbol, window size exponent) pairs in one call.
+        Queries of the same symbol are answered together with `get_stats_many`.
+
+        Returns:
+            For every query, its statistical data or the exception explaining why it failed.
+        """
+        exponents_by_symbol: dict[str, list[int]] = {}
+        for symbol, window_size_exponent in queries:
+            exponents_by_symbol.setdefault(symbol, []).append(window_size_exponent)
+
+        stats_by_symbol: dict[str, dict[int, dict[str, float]] | TradingStatisticsServiceException] = {}
+        for symbol, window_size_exponents in exponents_by_symbol.items():
+            try:
+                stats_by_symbol[symbol] = self.get_stats_many(symbol, window_size_exponents)
+            except TradingStatisticsServiceException as e:
+                stats_by_symbol[symbol] = e
+
+        results = []
+        for symbol, window_size_exponent in queries:
+            stats = stats_by_symbol[symbol]
+            results.append(stats if isinstance(stats, TradingStatisticsServiceException) else stats[window_size_exponent])
+        return results
+
+    def save_snapshot(self, path: str) -> int:
+        """
+        Writes the data and version of every symbol to a snapshot file.
+        The write-ahead log segments covered by the snapshot are removed once it is written.
+
+        Returns:
+            The number of symbols written.
+        """
+        with self._snapshot_lock:
+            if self.write_ahead_log is not None:
+                covered_generation = self.write_ahead_log.start_generation()
+
+            symbols = []
+            for symbol, lock in list(self.symbol_locks.items()):
+                with lock.read():
+                    values = self.pending_restores.get(symbol)
+                    if values is None:
+                        values = np.array(self.data_storage[symbol].get_data(), dtype=np.float64)
+                    flags = FLAG_COMPACT if symbol in self.compact_symbols else 0
+                    symbols.append((symbol, self.versions[symbol], values, flags))
+
+            count = write_snapshot(path, symbols)
+            logger.info(f"Snapshot of {count} symbols written to {path}.")
+
+            # Batches logged before the new generation are all part of the snapshot. Later ones may be
+            # too, and are skipped on replay thanks to their version.
+            if self.write_ahead_log is not None:
+                self.write_ahead_log.remove_generations(covered_generation)
+            return count
+
+    def load_snapshot(self, path: str) -> int:
+        """
+        Restores the symbols of a snapshot file, replacing the current ones. Meant to be called on
+        startup, before the service is used by other threads.
+
+        The file is memory-mapped and the engine of each symbol is only built when the symbol is
+        first accessed, so loading does not depend on the amount of data in the snapshot.
+
+        Returns:
+            The number of symbols restored.
+        """
+        self._snapshot_mapping, symbols = read_snapshot(path)
+
+        self.data_storage = {}
+        self.pending_restores = {symbol: values for symbol, (_, values, _) in symbols.items()}
+        self.versions = {symbol: version for symbol, (version, _, _) in symbols.items()}
+        self.symbol_locks = {symbol: ReadWriteLock() for symbol in symbols}
+        self.timestamp_indexes = {}
+        self.candles = {}
+        self.compact_symbols = {symbol for symbol, (_, _, flags) in symbols.items() if flags & FLAG_COMPACT}
+        if self.spill_store is not None:
+            self.spill_store.clear()
+
+        logger.info(f"Snapshot of {len(symbols)} symbols loaded from {path}.")
+        return len(symbols)
+
+    def replay_write_ahead_log(self) -> int:
+        """
+        Applies the batches of the write-ahead log, typically right after loading the latest snapshot.
+
+        All the batches logged for a symbol are concatenated to its current data, and its engine is
+        rebuilt from them with a single `build` on first access. Batches whose version the symbol
+        already reached are part of the snapshot and are skipped. Symbols whose creation was logged with
+        compact storage keep it. Like `load_snapshot`, it is meant to be called on startup.
+
+        Returns:
+            The number of batches replayed.
+        """
+        replayed = 0
+        for symbol, batches in self.write_ahead_log.replay().items():
+            if any(compact for _, _, compact in batches):
+                self.compact_symbols.add(symbol)
+
+            version = self.versions.get(symbol, 0)
+            batches = [values for batch_version, values, _ in batches if batch_version > version]
+            if not batches:
+                continue
+
+            if symbol in self.data_storage:
+                current = np.asarray(self.data_storage.pop(symbol).get_data(), dtype=np.float64)
+                if self.spill_store is not None:
+                    self.spill_store.forget(symbol)
+            else:
+                current = self.pending_restores.get(symbol, np.zeros(0))
+
+            self.timestamp_indexes.pop(symbol, None)
+            self.candles.pop(symbol, None)
+            self.pending_restores[symbol] = np.concatenate([current, *batches])
+            self.versions[symbol] = version + len(batches)
+            self.symbol_locks.setdefault(symbol, ReadWriteLock())
+            replayed += len(batches)
+
+        logger.info(f"Replayed {replayed} batches from the write-ahead log.")
+        return replayed
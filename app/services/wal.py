@@ -0,0 +1,223 @@
+import logging
+import os
+import struct
+import threading
+import zlib
+from collections import defaultdict
+from typing import BinaryIO
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Every record is its number of values (uint32), the CRC32 of its flags and payload (uint32), the
+# version of the symbol once the batch is applied (uint64), its flags (uint8) and the length of the
+# symbol (uint16), followed by its payload: the symbol (utf-8) and the values as little-endian float64
+RECORD_HEADER = struct.Struct("<IIQBH")
+# The records of the per-symbol segments of earlier versions, which hold no symbol
+LEGACY_RECORD_HEADER = struct.Struct("<IIQ")
+SEGMENT_SUFFIX = ".wal"
+
+# The record creates a symbol stored in the compact data engine (see `TradingStatisticsService.add_batch`)
+FLAG_COMPACT = 1
+
+
+class WriteAheadLog:
+    def __init__(self, directory: str, flush_interval_seconds: float = 0.005) -> None:
+        """
+        An append-only log of the batches added to each symbol.
+
+        All the symbols share one segment file per generation, named `<generation>.wal`, whose records
+        carry their symbol, so the log holds a single file open whatever the number of symbols.
+        Starting a new generation (see `start_generation`) lets a snapshot cover everything logged
+        before it, after which the older segments are removed with `remove_generations`. Per-symbol
+        segments (`<symbol as hex>.<generation>.wal`) written by earlier versions are still replayed.
+
+        Writes use group commit: `append` writes its record and waits until a background thread has
+        fsynced it, so all batches appended during one flush interval share a single fsync.
+        With a flush interval of 0, every append is fsynced on its own.
+
+        Args:
+            directory: The directory holding the segment files.
+            flush_interval_seconds: The time between two group commits.
+        """
+        self.directory = directory
+        self.flush_interval_seconds = flush_interval_seconds
+        os.makedirs(directory, exist_ok=True)
+
+        self.generation = max((generation for _, generation, _ in self._segments()), default=0) + 1
+        self._file: BinaryIO | None = None
+        self._dirty = False
+        self._lock = threading.Lock()
+        # Held while the segment is synced, so that it is not closed meanwhile
+        self._flush_lock = threading.Lock()
+        self._durable = threading.Condition(self._lock)
+        self._written_sequence = 0
+        self._durable_sequence = 0
+        self._stopped = threading.Event()
+
+        self._flusher = None
+        if self.flush_interval_seconds > 0:
+            self._flusher = threading.Thread(target=self._flush_periodically, name="wal-flusher", daemon=True)
+            self._flusher.start()
+
+    def _segments(self) -> list[tuple[str | None, int, str]]:
+        """
+        Returns the (symbol, generation, path) of every segment file, ordered by generation; the
+        symbol is None for shared segments, and that of the segment for legacy per-symbol ones.
+        """
+        segments = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(SEGMENT_SUFFIX):
+                continue
+            symbol_hex, _, generation = name[:-len(SEGMENT_SUFFIX)].rpartition(".")
+            symbol = bytes.fromhex(symbol_hex).decode() if symbol_hex else None
+            segments.append((symbol, int(generation), os.path.join(self.directory, name)))
+        return sorted(segments, key=lambda segment: segment[1])
+
+    def _segment_file(self) -> BinaryIO:
+        if self._file is None:
+            self._file = open(os.path.join(self.directory, f"{self.generation}{SEGMENT_SUFFIX}"), "ab")
+        return self._file
+
+    def write(self, symbol: str, version: int, values: list[float], compact: bool = False) -> int:
+        """
+        Writes the record of a batch of a symbol without waiting for it to be durable.
+
+        Args:
+            symbol: The symbol the batch was added to.
+            version: The version of the symbol once the batch is applied.
+            values: The values of the batch.
+            compact: Whether the batch creates the symbol in the compact data engine.
+
+        Returns:
+            The sequence number of the record, to pass to `wait_until_durable`.
+        """
+        name = symbol.encode()
+        values = np.asarray(values, dtype="<f8").tobytes()
+        payload = name + values
+        flags = FLAG_COMPACT if compact else 0
+        checksum = zlib.crc32(payload, zlib.crc32(bytes((flags,))))
+
+        with self._lock:
+            segment = self._segment_file()
+            segment.write(RECORD_HEADER.pack(len(values) // 8, checksum, version, flags, len(name)))
+            segment.write(payload)
+            self._written_sequence += 1
+
+            if self._flusher is None:
+                segment.flush()
+                os.fsync(segment.fileno())
+                self._durable_sequence = self._written_sequence
+            else:
+                self._dirty = True
+
+            return self._written_sequence
+
+    def wait_until_durable(self, sequence: int) -> None:
+        """Blocks until the record with the given sequence number has been fsynced."""
+        with self._lock:
+            while self._durable_sequence < sequence:
+                self._durable.wait()
+
+    def append(self, symbol: str, version: int, values: list[float], compact: bool = False) -> None:
+        """Logs a batch of a symbol, returning once it is durable."""
+        self.wait_until_durable(self.write(symbol, version, values, compact))
+
+    def flush(self) -> None:
+        """Fsyncs the segment if it was written since the last flush."""
+        with self._flush_lock:
+            with self._lock:
+                segment = self._file if self._dirty else None
+                self._dirty = False
+                sequence = self._written_sequence
+                if segment is not None:
+                    segment.flush()
+
+            # Writers keep appending while the segment is being synced
+            if segment is not None:
+                os.fsync(segment.fileno())
+
+            with self._lock:
+                self._durable_sequence = max(self._durable_sequence, sequence)
+                self._durable.notify_all()
+
+    def _flush_periodically(self) -> None:
+        while not self._stopped.wait(self.flush_interval_seconds):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Write-ahead log flush failed.")
+
+    def _close_segment(self) -> None:
+        """Syncs and closes the open segment; both locks must be held."""
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+        self._file = None
+        self._dirty = False
+        self._durable_sequence = self._written_sequence
+        self._durable.notify_all()
+
+    def start_generation(self) -> int:
+        """
+        Directs further appends to a new segment file.
+
+        Returns:
+            The previous generation, which together with the older ones holds everything logged so far.
+        """
+        with self._flush_lock, self._lock:
+            self._close_segment()
+            self.generation += 1
+            return self.generation - 1
+
+    def remove_generations(self, up_to_generation: int) -> None:
+        """Deletes the segments of every generation up to `up_to_generation`, once a snapshot covers them."""
+        for _, generation, path in self._segments():
+            if generation <= up_to_generation:
+                os.remove(path)
+
+    def replay(self) -> dict[str, list[tuple[int, np.ndarray, bool]]]:
+        """
+        Reads back every logged batch.
+
+        A record cut short or corrupted by a crash ends the replay of its segment.
+
+        Returns:
+            For every symbol, the (version, values, compact) of its logged batches in order, compact
+            telling whether the batch created the symbol in the compact data engine.
+        """
+        batches: dict[str, list[tuple[int, np.ndarray, bool]]] = defaultdict(list)
+
+        for symbol, _, path in self._segments():
+            with open(path, "rb") as segment:
+                data = segment.read()
+
+            header = RECORD_HEADER if symbol is None else LEGACY_RECORD_HEADER
+            position = 0
+            while position + header.size <= len(data):
+                count, checksum, version, *fields = header.unpack_from(data, position)
+                flags, name_length = fields if fields else (0, 0)
+                start = position + header.size
+                payload = data[start:start + name_length + count * 8]
+                expected = zlib.crc32(payload, zlib.crc32(bytes((flags,)))) if fields else zlib.crc32(payload)
+                if len(payload) != name_length + count * 8 or expected != checksum:
+                    logger.warning(f"Ignoring a truncated record at the end of {path}.")
+                    break
+                record_symbol = payload[:name_length].decode() if symbol is None else symbol
+                values = np.frombuffer(payload, dtype="<f8", offset=name_length)
+                batches[record_symbol].append((version, values, bool(flags & FLAG_COMPACT)))
+                position = start + len(payload)
+
+        return dict(batches)
+
+    def close(self) -> None:
+        self._stopped.set()
+        if self._flusher is not None:
+            self._flusher.join()
+
+        with self._flush_lock, self._lock:
+            self._close_segment()
+            # Any later append is synced on its own
+            self._flusher = None
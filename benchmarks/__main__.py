@@ -0,0 +1,77 @@
+"""
+Benchmarks of the data engines and the service.
+
+    python -m benchmarks --profile default --output results.json
+    python -m benchmarks --profile default --baseline results.json
+
+Every case runs in its own process and reports its throughput, p50/p99 latencies, the memory held
+by its state (traced with tracemalloc) and its peak RSS. With --baseline, the results are compared
+with a previous run and the command fails if any metric regressed by more than --threshold.
+"""
+import argparse
+import json
+import logging
+import sys
+
+from app.data_structures import DATA_ENGINES
+from benchmarks.compare import compare
+from benchmarks.runner import PROFILES, cases, metadata, run_isolated
+from benchmarks.workloads import WORKLOADS
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmarks of the data engines and the service.")
+    parser.add_argument("--profile", choices=PROFILES, default="default", help="The data sizes, batch sizes and read/write mixes to run.")
+    parser.add_argument("--engine", action="append", choices=DATA_ENGINES, help="An engine to benchmark (all by default, repeatable).")
+    parser.add_argument("--workload", action="append", choices=WORKLOADS, help="A workload to run (all by default, repeatable).")
+    parser.add_argument("--filter", default="", help="Only run the cases whose name contains this string.")
+    parser.add_argument("--min-time", type=float, default=1.0, help="The minimum time spent timing every case, in seconds.")
+    parser.add_argument("--min-iterations", type=int, default=5)
+    parser.add_argument("--max-iterations", type=int, default=10 ** 5)
+    parser.add_argument("--output", help="The file the results are written to, as JSON.")
+    parser.add_argument("--baseline", help="A results file to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.1, help="The relative change reported as a regression.")
+    args = parser.parse_args()
+
+    # The service logs every symbol it creates
+    logging.disable(logging.INFO)
+
+    selected = [
+        case for case in cases(PROFILES[args.profile], args.engine or list(DATA_ENGINES), args.workload or list(WORKLOADS))
+        if args.filter in case["name"]
+    ]
+
+    results = []
+    print(f"{'case':<72} {'ops/s':>12} {'values/s':>14} {'p50 ms':>10} {'p99 ms':>10} {'traced MB':>10} {'RSS MB':>8}")
+    for case in selected:
+        result = run_isolated(case, args.min_time, args.min_iterations, args.max_iterations)
+        if result is None:
+            continue
+
+        results.append(result)
+        print(
+            f"{result['name']:<72} {result['ops_per_second']:>12.1f} {result['values_per_second']:>14.0f} "
+            f"{result['p50_ms']:>10.3f} {result['p99_ms']:>10.3f} {result['traced_bytes'] / 2 ** 20:>10.1f} "
+            f"{result['peak_rss_bytes'] / 2 ** 20:>8.0f}",
+            flush=True,
+        )
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"metadata": metadata(args.profile), "results": results}, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file)["results"], args.threshold)
+
+        for regression in regressions:
+            print(f"REGRESSION {regression['name']} {regression['metric']}: {regression['baseline']:.4g} -> {regression['value']:.4g} ({regression['change']:+.1%})")
+        if regressions:
+            return 1
+        print(f"No regression beyond {args.threshold:.0%}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+from typing import Any
+
+# The metrics compared against a baseline, and whether higher values are better
+METRICS = {
+    "ops_per_second": True,
+    "p50_ms": False,
+    "p99_ms": False,
+    "traced_bytes": False,
+}
+
+
+def compare(results: list[dict[str, Any]], baseline: list[dict[str, Any]], threshold: float = 0.1) -> list[dict[str, Any]]:
+    """
+    Compares benchmark results with those of a baseline run.
+
+    Args:
+        results: The results of the current run.
+        baseline: The results of the baseline run; cases missing from either run are ignored.
+        threshold: The relative change of a metric, in the wrong direction, reported as a regression.
+
+    Returns:
+        The regressions, with the case, the metric, both values and the relative change.
+    """
+    baseline_by_name = {result["name"]: result for result in baseline}
+    regressions = []
+
+    for result in results:
+        reference = baseline_by_name.get(result["name"])
+        if reference is None:
+            continue
+
+        for metric, higher_is_better in METRICS.items():
+            before, after = reference.get(metric), result.get(metric)
+            if not before or after is None:
+                continue
+
+            change = (after - before) / before
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append({"name": result["name"], "metric": metric, "baseline": before, "value": after, "change": change})
+
+    return regressions
@@ -0,0 +1,352 @@
+"""
+End-to-end load tests of the HTTP API.
+
+    python -m benchmarks.load generate --output requests.jsonl --requests 20000
+    python -m benchmarks.load run --log requests.jsonl --concurrency 16
+    python -m benchmarks.load run --log requests.jsonl --rate 2000 --server subprocess --env SERVICE_MODE=sharded
+
+A request log is a JSON lines file with one request per line, {"method": "GET", "path": "/api/...",
+"json": {...}}, as written by the application with REQUEST_LOG_PATH set or by the generate command.
+It is replayed against the application, started in this process, in a subprocess or already
+running, and the report gives the sustained requests/s and, per endpoint, the latency histogram
+and the error rate. Only localhost is involved unless --url points elsewhere.
+"""
+import argparse
+import base64
+import http.client
+import itertools
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from typing import Any, Iterable, Iterator
+from urllib.parse import urlsplit
+
+import numpy as np
+
+API_PREFIX = "/api/trading-statistics"
+
+# The upper bounds of the latency histogram buckets, in milliseconds
+HISTOGRAM_BUCKETS_MS = [0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float("inf")]
+
+
+def synthetic_requests(count: int, symbols: int = 10, batch_size: int = 100, read_ratio: float = 0.9, seed: int = 0) -> Iterator[dict[str, Any]]:
+    """
+    Generates a request log of add_batch and stats calls spread uniformly over the symbols.
+    Every symbol is created by a batch before it is queried.
+    """
+    rng = np.random.default_rng(seed)
+    for i in range(count):
+        symbol = f"SYM{i if i < symbols else rng.integers(symbols)}"
+        if i < symbols or rng.random() >= read_ratio:
+            values = np.round(rng.normal(100.0, 10.0, batch_size), 2).tolist()
+            yield {"method": "POST", "path": f"{API_PREFIX}/add_batch/", "json": {"symbol": symbol, "values": values}}
+        else:
+            yield {"method": "GET", "path": f"{API_PREFIX}/stats/?symbol={symbol}&k={rng.integers(1, 5)}"}
+
+
+def read_requests(path: str) -> list[dict[str, Any]]:
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def endpoint(entry: dict[str, Any]) -> str:
+    return f"{entry['method']} {entry['path'].split('?')[0]}"
+
+
+class Results:
+    def __init__(self) -> None:
+        """The latencies and outcomes of the requests sent, per endpoint."""
+        self.latencies: dict[str, list[float]] = {}
+        self.statuses: dict[str, dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, key: str, latency_ms: float, status: str) -> None:
+        with self._lock:
+            self.latencies.setdefault(key, []).append(latency_ms)
+            statuses = self.statuses.setdefault(key, {})
+            statuses[status] = statuses.get(status, 0) + 1
+
+    def report(self, elapsed_seconds: float) -> dict[str, Any]:
+        """
+        Returns:
+            The requests/s sustained over elapsed_seconds and, for every endpoint, its request count,
+            error rate (any failure or status of 400 and above), latency percentiles, histogram
+            (request counts per bucket, with the upper bound of each bucket in milliseconds) and statuses.
+        """
+        endpoints = {}
+        for key in sorted(self.latencies):
+            latencies = np.array(self.latencies[key])
+            errors = sum(count for status, count in self.statuses[key].items() if not status.isdigit() or int(status) >= 400)
+            counts = np.bincount(np.searchsorted(HISTOGRAM_BUCKETS_MS, latencies), minlength=len(HISTOGRAM_BUCKETS_MS))
+            endpoints[key] = {
+                "requests": len(latencies),
+                "error_rate": errors / len(latencies),
+                "p50_ms": float(np.percentile(latencies, 50)),
+                "p90_ms": float(np.percentile(latencies, 90)),
+                "p99_ms": float(np.percentile(latencies, 99)),
+                "max_ms": float(latencies.max()),
+                "histogram": {str(bound): int(count) for bound, count in zip(HISTOGRAM_BUCKETS_MS, counts)},
+                "statuses": dict(self.statuses[key]),
+            }
+
+        total = sum(endpoint["requests"] for endpoint in endpoints.values())
+        return {"requests": total, "elapsed_seconds": elapsed_seconds, "requests_per_second": total / elapsed_seconds, "endpoints": endpoints}
+
+
+class Replayer:
+    def __init__(self, url: str, timeout_seconds: float = 30) -> None:
+        """
+        Sends logged requests to a server, every thread over its own persistent connection.
+
+        Args:
+            url: The base URL of the server, e.g. http://127.0.0.1:8000.
+            timeout_seconds: The timeout of a single request.
+        """
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout_seconds = timeout_seconds
+        self.results = Results()
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        if not hasattr(self._local, "connection"):
+            self._local.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout_seconds)
+        return self._local.connection
+
+    def send(self, entry: dict[str, Any], scheduled: float | None = None) -> None:
+        """
+        Sends a request and records its outcome.
+
+        Args:
+            entry: The request, as a line of a request log.
+            scheduled: The time (time.perf_counter) the request was due. The latency is measured from
+                it, so that time spent queued behind slow requests counts (no coordinated omission).
+        """
+        headers = {}
+        body = None
+        if "json" in entry:
+            body, headers["Content-Type"] = json.dumps(entry["json"]).encode(), "application/json"
+        elif "body_base64" in entry:
+            body, headers["Content-Type"] = base64.b64decode(entry["body_base64"]), entry.get("content_type", "application/octet-stream")
+
+        started = time.perf_counter() if scheduled is None else scheduled
+        connection = self._connection()
+        try:
+            connection.request(entry["method"], entry["path"], body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            status = str(response.status)
+        except (OSError, http.client.HTTPException) as e:
+            connection.close()
+            status = type(e).__name__
+        self.results.add(endpoint(entry), (time.perf_counter() - started) * 1000, status)
+
+    def run_closed_loop(self, entries: Iterable[dict[str, Any]], concurrency: int, duration_seconds: float | None = None) -> float:
+        """
+        Sends the requests from `concurrency` threads, each sending its next request as soon as the
+        previous one is answered.
+
+        Returns:
+            The elapsed time, in seconds.
+        """
+        entries = iter(entries)
+        lock = threading.Lock()
+        started = time.perf_counter()
+        deadline = started + duration_seconds if duration_seconds else float("inf")
+
+        def worker() -> None:
+            while time.perf_counter() < deadline:
+                with lock:
+                    entry = next(entries, None)
+                if entry is None:
+                    return
+                self.send(entry)
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started
+
+    def run_open_loop(self, entries: Iterable[dict[str, Any]], schedule: Iterable[float], max_concurrency: int, duration_seconds: float | None = None) -> float:
+        """
+        Sends every request at its scheduled time, whether or not the previous ones were answered.
+
+        Args:
+            schedule: The time of every request, in seconds from the start.
+            max_concurrency: The maximum number of requests in flight; beyond it requests are queued,
+                and their latency includes the time they were queued.
+
+        Returns:
+            The elapsed time, in seconds.
+        """
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_concurrency) as executor:
+            for entry, offset in zip(entries, schedule):
+                if duration_seconds and offset > duration_seconds:
+                    break
+                scheduled = started + offset
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(self.send, entry, scheduled)
+        return time.perf_counter() - started
+
+
+def _free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def _wait_until_listening(port: int, process: subprocess.Popen | None = None, timeout_seconds: float = 30) -> None:
+    deadline = time.monotonic() + timeout_seconds
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            if process is not None and process.poll() is not None:
+                raise RuntimeError(f"The server exited with code {process.returncode}")
+            if time.monotonic() > deadline:
+                raise RuntimeError("The server did not start listening in time")
+            time.sleep(0.05)
+
+
+def serve(port: int) -> None:
+    """Serves the application with the threaded development server, without the reloader or the debugger."""
+    from werkzeug.serving import run_simple
+    from app import app
+
+    # Logging every request and symbol created would dominate the cost of the requests
+    logging.disable(logging.INFO)
+    run_simple("127.0.0.1", port, app, threaded=True, use_reloader=False, use_debugger=False)
+
+
+@contextmanager
+def server(mode: str, environment: dict[str, str]) -> Iterator[str]:
+    """
+    Starts the application for the duration of the context.
+
+    Args:
+        mode: "in-process" serves it from a thread of this process (sharing its GIL with the load
+            generator), "subprocess" from a separate Python process.
+        environment: Settings overriding those of the environment, e.g. {"SERVICE_MODE": "sharded"}.
+
+    Yields:
+        The base URL of the server.
+    """
+    port = _free_port()
+
+    if mode == "subprocess":
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        process = subprocess.Popen([sys.executable, "-m", "benchmarks.load", "serve", "--port", str(port)], cwd=root, env={**os.environ, **environment})
+        try:
+            _wait_until_listening(port, process)
+            yield f"http://127.0.0.1:{port}"
+        finally:
+            process.terminate()
+            process.wait()
+        return
+
+    # The configuration is read when the application is imported
+    os.environ.update(environment)
+    logging.disable(logging.INFO)
+    from werkzeug.serving import make_server
+    from app import app
+
+    http_server = make_server("127.0.0.1", port, app, threaded=True)
+    thread = threading.Thread(target=http_server.serve_forever, name="load-test-server", daemon=True)
+    thread.start()
+    try:
+        _wait_until_listening(port)
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        http_server.shutdown()
+        thread.join()
+
+
+def print_report(report: dict[str, Any]) -> None:
+    print(f"{report['requests']} requests in {report['elapsed_seconds']:.2f}s: {report['requests_per_second']:.1f} requests/s")
+    for key, stats in report["endpoints"].items():
+        print(
+            f"\n{key}: {stats['requests']} requests, {stats['error_rate']:.2%} errors, "
+            f"p50 {stats['p50_ms']:.2f}ms, p90 {stats['p90_ms']:.2f}ms, p99 {stats['p99_ms']:.2f}ms, max {stats['max_ms']:.2f}ms"
+        )
+        peak = max(stats["histogram"].values())
+        for bound, count in stats["histogram"].items():
+            if count:
+                print(f"  <= {bound:>6} ms {count:>8} {'#' * max(1, round(40 * count / peak))}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load", description="End-to-end load tests of the HTTP API.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="Write a synthetic request log.")
+    generate.add_argument("--output", required=True)
+    generate.add_argument("--requests", type=int, default=10000)
+    generate.add_argument("--symbols", type=int, default=10)
+    generate.add_argument("--batch-size", type=int, default=100)
+    generate.add_argument("--read-ratio", type=float, default=0.9)
+    generate.add_argument("--seed", type=int, default=0)
+
+    run = commands.add_parser("run", help="Replay a request log against the application.")
+    run.add_argument("--log", help="The request log to replay (a synthetic one by default).")
+    run.add_argument("--server", choices=("in-process", "subprocess"), default="subprocess", help="How to start the application.")
+    run.add_argument("--url", help="The URL of an application already running, instead of starting one.")
+    run.add_argument("--env", action="append", default=[], metavar="NAME=VALUE", help="A setting of the started application (repeatable).")
+    run.add_argument("--concurrency", type=int, default=8, help="The number of requests in flight (closed loop), or the maximum with --rate.")
+    run.add_argument("--rate", type=float, help="Send requests at this rate (requests/s) regardless of the responses (open loop).")
+    run.add_argument("--recorded-timing", action="store_true", help="Send requests at the times they were recorded (open loop).")
+    run.add_argument("--speed", type=float, default=1.0, help="The speed-up of the recorded timing.")
+    run.add_argument("--duration", type=float, help="Stop after this many seconds.")
+    run.add_argument("--output", help="The file the report is written to, as JSON.")
+
+    serve_command = commands.add_parser("serve", help="Serve the application (used by --server subprocess).")
+    serve_command.add_argument("--port", type=int, required=True)
+
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.port)
+        return 0
+
+    if args.command == "generate":
+        with open(args.output, "w") as file:
+            for entry in synthetic_requests(args.requests, args.symbols, args.batch_size, args.read_ratio, args.seed):
+                file.write(json.dumps(entry) + "\n")
+        return 0
+
+    entries = read_requests(args.log) if args.log else list(synthetic_requests(10000))
+    environment = dict(setting.split("=", 1) for setting in args.env)
+
+    with (server(args.server, environment) if args.url is None else nullcontext(args.url)) as url:
+        replayer = Replayer(url)
+        if args.rate:
+            elapsed = replayer.run_open_loop(entries, itertools.count(0, 1 / args.rate), args.concurrency, args.duration)
+        elif args.recorded_timing:
+            schedule = [entry.get("at", 0) / args.speed for entry in entries]
+            elapsed = replayer.run_open_loop(entries, schedule, args.concurrency, args.duration)
+        else:
+            elapsed = replayer.run_closed_loop(entries, args.concurrency, args.duration)
+
+    report = replayer.results.report(elapsed)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"settings": vars(args), "report": report}, file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
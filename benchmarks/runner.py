@@ -0,0 +1,145 @@
+import itertools
+import multiprocessing
+import platform
+import resource
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from multiprocessing.connection import Connection
+from typing import Any
+
+import numpy as np
+
+from app.data_structures import DATA_ENGINES
+from benchmarks.workloads import WORKLOADS, window_size_exponents
+
+# Data sizes, batch sizes and read/write mixes of every profile
+PROFILES = {
+    "quick": {"points": [10 ** 4, 10 ** 5], "batch_sizes": [100], "read_ratios": [0.9]},
+    "default": {"points": [10 ** 5, 10 ** 6], "batch_sizes": [100, 10 ** 4], "read_ratios": [0.5, 0.9]},
+    "production": {"points": [10 ** 5, 10 ** 6, 10 ** 7, 10 ** 8], "batch_sizes": [10, 1000, 10 ** 5], "read_ratios": [0.5, 0.9, 0.99]},
+}
+
+# The largest windows an engine is benchmarked with, beyond which a single build takes minutes
+ENGINE_MAX_POINTS = {
+    "segment_tree": 10 ** 6,
+}
+
+
+def case_name(workload: str, engine: str, params: dict[str, Any]) -> str:
+    return f"{workload}[{','.join([f'engine={engine}'] + [f'{name}={value}' for name, value in params.items()])}]"
+
+
+def cases(profile: dict[str, list], engines: list[str], workloads: list[str]) -> list[dict[str, Any]]:
+    """Expands a profile into the cases to run, as dicts with a workload, an engine and its parameters."""
+    expanded = []
+    for workload, engine, points in itertools.product(workloads, engines, profile["points"]):
+        if points > ENGINE_MAX_POINTS.get(engine, points):
+            continue
+
+        parameters = WORKLOADS[workload].parameters
+        values = {
+            "points": [points],
+            "batch_size": [batch_size for batch_size in profile["batch_sizes"] if batch_size <= points],
+            "k": window_size_exponents(points),
+            "read_ratio": profile["read_ratios"],
+        }
+        for combination in itertools.product(*(values[name] for name in parameters)):
+            params = dict(zip(parameters, combination))
+            expanded.append({"name": case_name(workload, engine, params), "workload": workload, "engine": engine, "params": params})
+    return expanded
+
+
+def measure(workload: Any, min_time_seconds: float, min_iterations: int, max_iterations: int) -> dict[str, Any]:
+    """Times the operations of a workload whose state is set up."""
+    latencies = []
+    values = 0
+    deadline = time.perf_counter() + min_time_seconds
+
+    while len(latencies) < max_iterations and (len(latencies) < min_iterations or time.perf_counter() < deadline):
+        workload.prepare()
+        started = time.perf_counter_ns()
+        values += workload.operation()
+        latencies.append(time.perf_counter_ns() - started)
+
+    latencies = np.array(latencies) / 10 ** 6
+    elapsed_seconds = latencies.sum() / 10 ** 3
+    return {
+        "iterations": len(latencies),
+        "ops_per_second": len(latencies) / elapsed_seconds,
+        "values_per_second": values / elapsed_seconds,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "max_ms": float(latencies.max()),
+    }
+
+
+def run_case(case: dict[str, Any], min_time_seconds: float, min_iterations: int, max_iterations: int, seed: int = 0) -> dict[str, Any] | None:
+    """
+    Runs a case in the current process.
+
+    The allocations of the setup are traced, so traced_bytes is the memory the workload's state holds
+    (e.g. the memory of one symbol for engine workloads). The operations are timed afterwards without
+    tracing, which would slow them down.
+
+    Returns:
+        The measurements of the case, or None if its engine does not support the workload.
+    """
+    workload = WORKLOADS[case["workload"]](DATA_ENGINES[case["engine"]], np.random.default_rng(seed), **case["params"])
+    if not workload.supported():
+        return None
+
+    tracemalloc.start()
+    workload.setup()
+    traced_bytes, traced_peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = measure(workload, min_time_seconds, min_iterations, max_iterations)
+    return {
+        **case,
+        **result,
+        "traced_bytes": traced_bytes,
+        "traced_peak_bytes": traced_peak_bytes,
+        # ru_maxrss is in kilobytes on Linux, and in bytes on macOS
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if platform.system() == "Darwin" else 1024),
+    }
+
+
+def _run_case_in_child(connection: Connection, *args: Any) -> None:
+    try:
+        connection.send((True, run_case(*args)))
+    except Exception as e:
+        connection.send((False, repr(e)))
+    finally:
+        connection.close()
+
+
+def run_isolated(case: dict[str, Any], min_time_seconds: float, min_iterations: int, max_iterations: int) -> dict[str, Any] | None:
+    """Runs a case in a forked process, so that its peak RSS is not that of the cases run before it."""
+    context = multiprocessing.get_context("fork")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_run_case_in_child, args=(sender, case, min_time_seconds, min_iterations, max_iterations))
+    process.start()
+    sender.close()
+
+    try:
+        succeeded, result = receiver.recv()
+    except EOFError:
+        # The process died without reporting, e.g. killed when running out of memory
+        succeeded, result = False, "the benchmark process exited unexpectedly"
+    process.join()
+
+    if not succeeded:
+        raise RuntimeError(f"{case['name']} failed: {result}")
+    return result
+
+
+def metadata(profile: str) -> dict[str, Any]:
+    return {
+        "profile": profile,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+    }
@@ -0,0 +1,185 @@
+import inspect
+import math
+from typing import Any
+
+import numpy as np
+
+from app.services.trading_statistics import StatisticalDataStructure, TradingStatisticsService
+
+
+def create_engine(engine_class: StatisticalDataStructure, max_window_size: int, capacity: int | None = None) -> Any:
+    """Creates an engine for a window of max_window_size points, passing capacity only to engines taking one."""
+    parameters = inspect.signature(engine_class).parameters
+    kwargs = {"max_window_size": max_window_size}
+    if "capacity" in parameters:
+        kwargs["capacity"] = capacity or max_window_size
+    return engine_class(**kwargs)
+
+
+def window_size_exponents(points: int) -> list[int]:
+    """The exponents k of the windows 10^k fitting in points data points."""
+    return list(range(1, int(math.log10(points)) + 1))
+
+
+class Workload:
+    """
+    A benchmarked scenario. `setup` builds the state the scenario starts from, then `operation` is
+    timed repeatedly, with `prepare` called untimed before every operation.
+
+    Parameters shared by all workloads:
+    - points: The window size of the engines, which are built full.
+    - batch_size: The number of values of the batches appended.
+    - k: The window size exponent queried.
+    - read_ratio: The share of reads in a mix of reads and writes.
+    """
+    name = ""
+    parameters = ()
+
+    def __init__(self, engine_class: StatisticalDataStructure, rng: np.random.Generator, **params: int | float) -> None:
+        self.engine_class = engine_class
+        self.rng = rng
+        self.params = params
+
+    def values(self, count: int) -> np.ndarray:
+        return self.rng.normal(100.0, 10.0, count)
+
+    def supported(self) -> bool:
+        return True
+
+    def setup(self) -> None:
+        pass
+
+    def prepare(self) -> None:
+        pass
+
+    def operation(self) -> int:
+        """Runs one operation, returning the number of values it wrote."""
+        raise NotImplementedError
+
+
+class Build(Workload):
+    """Builds an engine holding a full window."""
+    name = "build"
+    parameters = ("points",)
+
+    def setup(self) -> None:
+        self.data = self.values(self.params["points"])
+
+    def operation(self) -> int:
+        create_engine(self.engine_class, len(self.data)).build(self.data)
+        return len(self.data)
+
+
+class Append(Workload):
+    """Appends batches to a full window, evicting as many old values."""
+    name = "append"
+    parameters = ("points", "batch_size")
+
+    def setup(self) -> None:
+        self.engine = create_engine(self.engine_class, self.params["points"])
+        self.engine.build(self.values(self.params["points"]))
+        self.batch = self.values(self.params["batch_size"])
+
+    def operation(self) -> int:
+        self.engine.append_data(self.batch)
+        return len(self.batch)
+
+
+class RemoveOldData(Workload):
+    """Evicts the oldest values of a window, refilling it (untimed) once it runs out."""
+    name = "remove_old_data"
+    parameters = ("points", "batch_size")
+
+    def supported(self) -> bool:
+        return hasattr(self.engine_class, "remove_old_data")
+
+    def setup(self) -> None:
+        self.data = self.values(self.params["points"])
+        self.engine = create_engine(self.engine_class, len(self.data))
+        self.engine.build(self.data)
+
+    def prepare(self) -> None:
+        if self.engine.size < self.params["batch_size"]:
+            self.engine.build(self.data)
+
+    def operation(self) -> int:
+        self.engine.remove_old_data(self.params["batch_size"])
+        return self.params["batch_size"]
+
+
+class Grow(Workload):
+    """Fills an engine created with a small capacity batch by batch, going through all its resizes."""
+    name = "grow"
+    parameters = ("points", "batch_size")
+
+    def setup(self) -> None:
+        batch_size = self.params["batch_size"]
+        self.batches = [self.values(batch_size)] * (self.params["points"] // batch_size)
+
+    def operation(self) -> int:
+        engine = create_engine(self.engine_class, self.params["points"], capacity=100)
+        engine.build(self.batches[0])
+        for batch in self.batches[1:]:
+            engine.append_data(batch)
+        return len(self.batches) * self.params["batch_size"]
+
+
+class Query(Workload):
+    """Queries the stats of the last 10^k values of a full window."""
+    name = "query"
+    parameters = ("points", "k")
+
+    def setup(self) -> None:
+        self.engine = create_engine(self.engine_class, self.params["points"])
+        self.engine.build(self.values(self.params["points"]))
+
+    def operation(self) -> int:
+        self.engine.query(self.params["k"])
+        return 0
+
+
+class Mixed(Workload):
+    """Queries a random window or appends a batch to a full window, reads making up read_ratio of the operations."""
+    name = "mixed"
+    parameters = ("points", "batch_size", "read_ratio")
+
+    def setup(self) -> None:
+        self.engine = create_engine(self.engine_class, self.params["points"])
+        self.engine.build(self.values(self.params["points"]))
+        self.batch = self.values(self.params["batch_size"])
+        self.ks = window_size_exponents(self.params["points"])
+
+    def operation(self) -> int:
+        if self.rng.random() < self.params["read_ratio"]:
+            self.engine.query(self.ks[self.rng.integers(len(self.ks))])
+            return 0
+        self.engine.append_data(self.batch)
+        return len(self.batch)
+
+
+class Service(Workload):
+    """
+    A mix of get_stats and add_batch calls spread over the symbols of a TradingStatisticsService,
+    holding points values in total, with its stats cache.
+    """
+    name = "service"
+    parameters = ("points", "batch_size", "read_ratio")
+    symbols = TradingStatisticsService.MAX_SYMBOLS_NUMBER
+
+    def setup(self) -> None:
+        self.service = TradingStatisticsService(self.engine_class)
+        for symbol in range(self.symbols):
+            self.service.add_batch(str(symbol), self.values(self.params["points"] // self.symbols))
+        self.batch = self.values(self.params["batch_size"])
+        self.ks = window_size_exponents(self.params["points"] // self.symbols)
+
+    def operation(self) -> int:
+        symbol = str(self.rng.integers(self.symbols))
+        if self.rng.random() < self.params["read_ratio"]:
+            self.service.get_stats(symbol, self.ks[self.rng.integers(len(self.ks))])
+            return 0
+        self.service.add_batch(symbol, self.batch)
+        return len(self.batch)
+
+
+WORKLOADS = {workload.name: workload for workload in (Build, Append, RemoveOldData, Grow, Query, Mixed, Service)}
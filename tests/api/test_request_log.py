@@ -0,0 +1,25 @@
+import base64
+import json
+
+from app.api.request_log import RequestRecorder
+
+
+def test_record(test_app, tmp_path):
+    recorder = RequestRecorder(str(tmp_path / "requests.jsonl"))
+
+    with test_app.test_request_context("/api/trading-statistics/add_batch/", method="POST", json={"symbol": "AAPL", "values": [1.0]}) as context:
+        recorder.record(context.request)
+        # The body can still be read by the view
+        assert context.request.get_json() == {"symbol": "AAPL", "values": [1.0]}
+    with test_app.test_request_context("/api/trading-statistics/add_batch/?symbol=AAPL", method="POST", data=b"\x00" * 8, content_type="application/octet-stream") as context:
+        recorder.record(context.request)
+    with test_app.test_request_context("/api/trading-statistics/stats/?symbol=AAPL&k=1") as context:
+        recorder.record(context.request)
+
+    entries = [json.loads(line) for line in (tmp_path / "requests.jsonl").read_text().splitlines()]
+
+    assert entries[0]["json"] == {"symbol": "AAPL", "values": [1.0]}
+    assert entries[0]["at"] == 0
+    assert entries[1]["path"] == "/api/trading-statistics/add_batch/?symbol=AAPL"
+    assert base64.b64decode(entries[1]["body_base64"]) == b"\x00" * 8
+    assert entries[2] == {"method": "GET", "path": "/api/trading-statistics/stats/?symbol=AAPL&k=1", "at": entries[2]["at"]}
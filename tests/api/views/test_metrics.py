@@ -0,0 +1,29 @@
+ADD_BATCH_ENDPOINT = "/api/trading-statistics/add_batch/"
+METRICS_ENDPOINT = "/metrics"
+
+
+def test_get_metrics(client):
+    client.post(ADD_BATCH_ENDPOINT, json={"symbol": "AAPL", "values": [1.0, 2.0]})
+    client.get("/api/trading-statistics/stats/?symbol=AAPL&k=1")
+
+    response = client.get(METRICS_ENDPOINT)
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    text = response.get_data(as_text=True)
+    assert 'trading_http_requests_total{endpoint="/api/trading-statistics/add_batch/",method="POST",status="200"}' in text
+    assert 'trading_http_request_duration_seconds_bucket{endpoint="/api/trading-statistics/stats/",method="GET",le="+Inf"}' in text
+    assert 'trading_engine_points_ingested_total{symbol="AAPL"}' in text
+    assert 'trading_engine_memory_bytes{symbol="AAPL"}' in text
+
+
+def test_profiler(client):
+    assert client.post("/admin/profiler/start/").status_code == 200
+    client.get(METRICS_ENDPOINT)
+    assert client.post("/admin/profiler/stop/").status_code == 200
+
+    response = client.get("/admin/profiler/stacks/?reset=true")
+
+    assert response.status_code == 200
+    assert response.headers["Content-Disposition"] == "attachment; filename=stacks.folded"
+    assert client.get("/admin/profiler/stacks/").get_data() == b""
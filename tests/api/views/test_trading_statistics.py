@@ -1,6 +1,10 @@
+import json
+import time
+import numpy as np
 import pytest
 from flask import Flask
 from app.services.exceptions import TradingStatisticsServiceSymbolNotFoundException
+from app.data_structures.compact_segment_tree import CompactArraySegmentTree
 from app.data_structures.segment_tree import SegmentTree
 
 
@@ -102,3 +106,411 @@ def test_get_stats_invalid_k(client):
 
     assert response.status_code == 400
     assert response.json == {'error': 'Invalid input, ensure symbol is provided and k is an integer between 1 and 8'}
+
+
+def test_add_batch_binary(client):
+    values = np.array([150.5, 151.0, 151.2, 149.5, 148.8], dtype='<f8')
+
+    response = client.post(
+        f'{ADD_BATCH_ENDPOINT}?symbol=MSFT', data=values.tobytes(), content_type='application/octet-stream'
+    )
+
+    assert response.status_code == 200
+    assert response.json == {"message": "Batch data added successfully"}
+
+    response = client.get(f'{STATS_ENDPOINT}?symbol=MSFT&k=1')
+
+    assert response.json["last"] == 148.8
+    assert response.json["max"] == 151.2
+
+
+def test_add_batch_binary_symbol_header(client):
+    values = np.array([1.0, 2.0], dtype='<f8')
+
+    response = client.post(
+        ADD_BATCH_ENDPOINT, data=values.tobytes(), content_type='application/octet-stream', headers={'X-Symbol': 'MSFT'}
+    )
+
+    assert response.status_code == 200
+
+
+def test_add_batch_binary_invalid_data(client):
+    # Missing symbol
+    response = client.post(ADD_BATCH_ENDPOINT, data=b'\x00' * 16, content_type='application/octet-stream')
+
+    assert response.status_code == 400
+
+    # Length is not a multiple of 8 bytes
+    response = client.post(f'{ADD_BATCH_ENDPOINT}?symbol=MSFT', data=b'\x00' * 12, content_type='application/octet-stream')
+
+    assert response.status_code == 400
+
+    # More than 10,000 values
+    response = client.post(
+        f'{ADD_BATCH_ENDPOINT}?symbol=MSFT', data=b'\x00' * 8 * 10001, content_type='application/octet-stream'
+    )
+
+    assert response.status_code == 400
+
+
+def test_add_batch_msgpack(client):
+    msgpack = pytest.importorskip("msgpack")
+
+    payload = msgpack.packb({"symbol": "MSFT", "values": [1.5, 2.5]})
+    response = client.post(ADD_BATCH_ENDPOINT, data=payload, content_type='application/msgpack')
+
+    assert response.status_code == 200
+
+    payload = msgpack.packb({"symbol": "MSFT", "values": np.array([3.5], dtype='<f8').tobytes()})
+    response = client.post(ADD_BATCH_ENDPOINT, data=payload, content_type='application/msgpack')
+
+    assert response.status_code == 200
+    assert client.get(f'{STATS_ENDPOINT}?symbol=MSFT&k=1').json["last"] == 3.5
+
+
+ADD_BATCHES_ENDPOINT = "/api/trading-statistics/add_batches/"
+STATS_BATCH_ENDPOINT = "/api/trading-statistics/stats/batch/"
+
+
+def test_add_batches(client):
+    data = {
+        "batches": [
+            {"symbol": "AAPL", "values": [150.5, 151.0]},
+            {"symbol": "MSFT", "values": "invalid_data"},
+            {"symbol": "MSFT", "values": [410.0, 411.5]},
+            {"symbol": "MSFT", "values": [412.0, None]},
+        ]
+    }
+
+    response = client.post(ADD_BATCHES_ENDPOINT, json=data)
+
+    assert response.status_code == 200
+    assert [result["status"] for result in response.json["results"]] == [200, 400, 200, 400]
+    assert response.json["results"][0] == {"symbol": "AAPL", "status": 200, "message": "Batch data added successfully"}
+
+
+def test_add_batches_invalid_data(client):
+    response = client.post(ADD_BATCHES_ENDPOINT, json={"batches": "invalid_data"})
+
+    assert response.status_code == 400
+
+
+def test_get_stats_batch(client):
+    client.post(ADD_BATCH_ENDPOINT, json={"symbol": "AAPL", "values": [150.5, 151.0, 151.2, 149.5, 148.8]})
+
+    response = client.post(STATS_BATCH_ENDPOINT, json={
+        "queries": [
+            {"symbol": "AAPL", "k": 1},
+            {"symbol": "AAPL", "k": 2},
+            {"symbol": "NON_EXISTENT_SYMBOL", "k": 1},
+            {"symbol": "AAPL", "k": 9},
+        ]
+    })
+
+    assert response.status_code == 200
+
+    results = response.json["results"]
+    assert [result["status"] for result in results] == [200, 200, 404, 400]
+    assert results[0]["stats"] == client.get(f'{STATS_ENDPOINT}?symbol=AAPL&k=1').json
+    assert results[2]["error"] == "Symbol NON_EXISTENT_SYMBOL not found."
+
+
+def test_get_stats_etag(client):
+    client.post(ADD_BATCH_ENDPOINT, json={"symbol": "AAPL", "values": [150.5, 151.0]})
+
+    response = client.get(f'{STATS_ENDPOINT}?symbol=AAPL&k=1')
+    etag = response.headers["ETag"]
+
+    assert response.status_code == 200
+
+    response = client.get(f'{STATS_ENDPOINT}?symbol=AAPL&k=1', headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.data == b""
+
+    # Another window size has its own ETag
+    response = client.get(f'{STATS_ENDPOINT}?symbol=AAPL&k=2', headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+
+    # A new batch changes the version of the symbol
+    client.post(ADD_BATCH_ENDPOINT, json={"symbol": "AAPL", "values": [152.0]})
+    response = client.get(f'{STATS_ENDPOINT}?symbol=AAPL&k=1', headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.json["last"] == 152.0
+    assert response.headers["ETag"] != etag
+
+
+SNAPSHOT_ENDPOINT = "/api/trading-statistics/admin/snapshot/"
+
+
+def test_take_snapshot(client, test_app, tmp_path, monkeypatch):
+    monkeypatch.setitem(test_app.config, "SNAPSHOT_PATH", str(tmp_path / "snapshot.bin"))
+    client.post(ADD_BATCH_ENDPOINT, json={"symbol": "AAPL", "values": [150.5, 151.0]})
+
+    response = client.post(SNAPSHOT_ENDPOINT)
+
+    assert response.status_code == 200
+    assert response.json["symbols"] >= 1
+    assert (tmp_path / "snapshot.bin").exists()
+
+
+def test_take_snapshot_not_configured(client):
+    response = client.post(SNAPSHOT_ENDPOINT)
+
+    assert response.status_code == 400
+    assert response.json == {'error': 'Snapshots are not enabled, ensure SNAPSHOT_PATH is configured'}
+
+
+FLUSH_ENDPOINT = "/api/trading-statistics/flush/"
+INGEST_METRICS_ENDPOINT = "/api/trading-statistics/ingest/metrics/"
+
+
+@pytest.fixture
+def ingest_queue(monkeypatch):
+    from app.api.views import trading_statistics
+    from app.services.ingest import IngestQueue
+
+    queue = IngestQueue(trading_statistics.service, max_pending_batches=100)
+    monkeypatch.setattr(trading_statistics, "ingest_queue", queue)
+    yield queue
+    queue.close()
+
+
+def test_add_batch_async(client, ingest_queue):
+    response = client.post(ADD_BATCH_ENDPOINT, json={"symbol": "MSFT", "values": [10.0, 20.0]})
+
+    assert response.status_code == 202
+    assert response.json == {"message": "Batch data accepted"}
+
+    client.post(ADD_BATCH_ENDPOINT, json={"symbol": "MSFT", "values": [30.0]})
+    response = client.post(FLUSH_ENDPOINT)
+
+    assert response.status_code == 200
+    assert client.get(f'{STATS_ENDPOINT}?symbol=MSFT&k=1').json["last"] == 30.0
+
+    response = client.get(INGEST_METRICS_ENDPOINT)
+
+    assert response.status_code == 200
+    assert response.json["pending_batches"] == 0
+    assert response.json["applied_batches"] == 2
+
+
+def test_add_batch_async_rejects_nested_values(client, ingest_queue):
+    response = client.post(ADD_BATCH_ENDPOINT, json={"symbol": "INTC", "values": [[1.0, 2.0], [3.0, 4.0]]})
+
+    assert response.status_code == 400
+    assert ingest_queue.metrics()["pending_batches"] == 0
+
+
+def test_add_batch_async_queue_full(client, ingest_queue, monkeypatch):
+    monkeypatch.setattr(ingest_queue, "max_pending_batches", 0)
+
+    response = client.post(ADD_BATCH_ENDPOINT, json={"symbol": "MSFT", "values": [10.0]})
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+
+    response = client.post(ADD_BATCHES_ENDPOINT, json={"batches": [{"symbol": "MSFT", "values": [10.0]}]})
+
+    assert response.json["results"][0]["status"] == 429
+
+
+def test_add_batches_async_rejects_non_numeric_values(client, ingest_queue):
+    response = client.post(ADD_BATCHES_ENDPOINT, json={
+        "batches": [
+            {"symbol": "INTC", "values": [10.0]},
+            {"symbol": "INTC", "values": [20.0, "invalid_data"]},
+            {"symbol": "INTC", "values": [30.0]},
+        ]
+    })
+
+    assert response.status_code == 200
+    assert [result["status"] for result in response.json["results"]] == [202, 400, 202]
+
+    client.post(FLUSH_ENDPOINT)
+
+    assert client.get(f'{STATS_ENDPOINT}?symbol=INTC&k=1').json["avg"] == 20.0
+
+
+def test_ingest_metrics_not_enabled(client):
+    response = client.get(INGEST_METRICS_ENDPOINT)
+
+    assert response.status_code == 400
+    assert client.post(FLUSH_ENDPOINT).status_code == 200
+
+
+STREAM_ENDPOINT = "/api/trading-statistics/stream/"
+
+
+def test_stream_batches(client):
+    body = b"".join(
+        json.dumps({"symbol": "MSFT", "values": [float(i), float(i + 1)]}).encode() + b"\n" for i in range(5)
+    ) + b"invalid\n"
+
+    response = client.post(STREAM_ENDPOINT, data=body, content_type="application/x-ndjson")
+
+    assert response.status_code == 200
+    acks = [json.loads(line) for line in response.get_data().splitlines()]
+    assert acks[-1]["done"]
+    assert acks[-1]["frames"] == 5
+    assert [error["frames"] for ack in acks for error in ack["errors"]] == [[6]]
+    assert client.get(f'{STATS_ENDPOINT}?symbol=MSFT&k=1').json["last"] == 5.0
+
+
+SUBSCRIBE_ENDPOINT = "/api/trading-statistics/subscribe/"
+
+
+def _read_event(events):
+    lines = next(events).decode().splitlines()
+    fields = dict(line.split(": ", 1) for line in lines if line)
+    return fields["event"], json.loads(fields["data"])
+
+
+def test_subscribe(client):
+    client.post(ADD_BATCH_ENDPOINT, json={"symbol": "MSFT", "values": [10.0, 20.0]})
+
+    response = client.get(f'{SUBSCRIBE_ENDPOINT}?symbol=MSFT&k=1&k=2', buffered=False)
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+
+    events = iter(response.response)
+    event, data = _read_event(events)
+    assert event == "stats"
+    assert data["stats"]["1"]["last"] == 20.0
+    assert sorted(data["stats"]) == ["1", "2"]
+
+    client.post(ADD_BATCH_ENDPOINT, json={"symbol": "MSFT", "values": [30.0]})
+
+    _, update = _read_event(events)
+    assert update["version"] == data["version"] + 1
+    assert update["stats"]["1"]["last"] == 30.0
+    response.close()
+
+
+def test_closed_subscription_ends_its_stream(client):
+    from app.api.views.trading_statistics import subscription_hub
+
+    client.post(ADD_BATCH_ENDPOINT, json={"symbol": "MSFT", "values": [10.0]})
+    response = client.get(f'{SUBSCRIBE_ENDPOINT}?symbol=MSFT&k=1', buffered=False)
+    events = iter(response.response)
+    _read_event(events)
+
+    for subscription in list(subscription_hub._subscriptions["MSFT"]):
+        subscription_hub.unsubscribe(subscription)
+
+    assert next(events, None) is None
+    response.close()
+
+
+def test_subscribe_invalid_k(client):
+    for query in ("symbol=MSFT", "symbol=MSFT&k=9", "symbol=MSFT&k=1&k=a", "k=1"):
+        response = client.get(f'{SUBSCRIBE_ENDPOINT}?{query}')
+
+        assert response.status_code == 400
+
+
+MEMORY_ENDPOINT = "/api/trading-statistics/memory/"
+
+
+def test_memory_stats_not_enabled(client):
+    response = client.get(MEMORY_ENDPOINT)
+
+    assert response.status_code == 400
+
+
+STATS_TIME_ENDPOINT = "/api/trading-statistics/stats/time/"
+
+
+def test_stats_in_time_range(client):
+    now = time.time()
+    data = {"symbol": "TSLA", "values": [10.0, 20.0, 30.0], "timestamps": [now - 600, now - 120, now - 60]}
+
+    assert client.post(ADD_BATCH_ENDPOINT, json=data).status_code == 200
+
+    response = client.get(f"{STATS_TIME_ENDPOINT}?symbol=TSLA&seconds=300")
+    assert response.status_code == 200
+    assert response.json == {"min": 20.0, "max": 30.0, "last": 30.0, "avg": 25.0, "var": 25.0, "count": 2}
+
+    response = client.get(f"{STATS_TIME_ENDPOINT}?symbol=TSLA&start={now - 700}&end={now - 100}")
+    assert response.json["count"] == 2
+
+    # Batches of a timestamped symbol must carry timestamps, that do not go back in time
+    assert client.post(ADD_BATCH_ENDPOINT, json={"symbol": "TSLA", "values": [1.0]}).status_code == 400
+    assert client.post(ADD_BATCH_ENDPOINT, json={"symbol": "TSLA", "values": [1.0], "timestamps": [now - 900]}).status_code == 400
+
+
+def test_stats_in_time_range_invalid(client):
+    client.post(ADD_BATCH_ENDPOINT, json={"symbol": "MSFT", "values": [1.0]})
+
+    assert client.get(f"{STATS_TIME_ENDPOINT}?seconds=10").status_code == 400
+    assert client.get(f"{STATS_TIME_ENDPOINT}?symbol=MSFT&seconds=10&start=1").status_code == 400
+    assert client.get(f"{STATS_TIME_ENDPOINT}?symbol=MSFT&seconds=10").status_code == 400
+    assert client.get(f"{STATS_TIME_ENDPOINT}?symbol=NONE&seconds=10").status_code == 404
+    assert client.post(ADD_BATCH_ENDPOINT, json={"symbol": "MSFT", "values": [1.0], "timestamps": ["now"]}).status_code == 400
+
+
+CANDLES_ENDPOINT = "/api/trading-statistics/candles/"
+
+
+@pytest.fixture
+def candles(test_app, monkeypatch):
+    from app.api.views import trading_statistics
+
+    monkeypatch.setitem(test_app.config, "CANDLE_RESOLUTIONS", [10, 100])
+    monkeypatch.setattr(trading_statistics.service, "candle_resolutions", [10, 100])
+
+
+def test_candles(client, candles):
+    client.post(ADD_BATCH_ENDPOINT, json={"symbol": "NVDA", "values": [float(v) for v in range(25)]})
+
+    response = client.get(f"{CANDLES_ENDPOINT}?symbol=NVDA&resolution=10&count=2")
+
+    assert response.status_code == 200
+    assert response.json["first"] == 1
+    assert response.json["open"] == [10.0, 20.0]
+    assert response.json["close"] == [19.0, 24.0]
+
+
+def test_candles_invalid(client, candles):
+    assert client.get(f"{CANDLES_ENDPOINT}?symbol=NVDA&resolution=7").status_code == 400
+    assert client.get(f"{CANDLES_ENDPOINT}?symbol=NVDA&resolution=10&count=0").status_code == 400
+    assert client.get(f"{CANDLES_ENDPOINT}?symbol=NONE&resolution=10").status_code == 404
+
+
+def test_candles_disabled_by_default(client):
+    assert client.get(f"{CANDLES_ENDPOINT}?symbol=NVDA&resolution=10").status_code == 400
+
+
+STATS_SERIES_ENDPOINT = "/api/trading-statistics/stats/series/"
+
+
+def test_stats_series(client):
+    client.post(ADD_BATCH_ENDPOINT, json={"symbol": "AMZN", "values": [float(v) for v in range(30)]})
+
+    response = client.get(f"{STATS_SERIES_ENDPOINT}?symbol=AMZN&window=10&count=3&stride=10")
+
+    assert response.status_code == 200
+    assert response.json["offsets"] == [20, 10, 0]
+    assert response.json["avg"] == [4.5, 14.5, 24.5]
+    assert response.json["max"] == [9.0, 19.0, 29.0]
+
+
+def test_stats_series_invalid(client):
+    assert client.get(f"{STATS_SERIES_ENDPOINT}?symbol=AMZN&window=0&count=3").status_code == 400
+    assert client.get(f"{STATS_SERIES_ENDPOINT}?symbol=AMZN&window=10&count=10001").status_code == 400
+    assert client.get(f"{STATS_SERIES_ENDPOINT}?symbol=AMZN&window=10&count=3&stride=0").status_code == 400
+    assert client.get(f"{STATS_SERIES_ENDPOINT}?symbol=NONE&window=10&count=3").status_code == 404
+
+
+def test_add_batch_compact(client):
+    from app.api.views.trading_statistics import service
+
+    response = client.post(ADD_BATCH_ENDPOINT, json={"symbol": "META", "values": [100.1, 99.7, 100.3], "compact": True})
+
+    assert response.status_code == 200
+    assert isinstance(service.data_storage["META"], CompactArraySegmentTree)
+    assert client.get(f"{STATS_ENDPOINT}?symbol=META&k=1").json["min"] == 99.7
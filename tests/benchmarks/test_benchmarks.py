@@ -0,0 +1,64 @@
+import unittest
+
+from benchmarks.compare import compare
+from benchmarks.runner import PROFILES, cases, run_case, run_isolated
+
+
+class TestCases(unittest.TestCase):
+
+    def test_profile_expansion(self):
+        expanded = cases(PROFILES["quick"], ["segment_tree", "rolling_windows"], ["query", "mixed"])
+        names = [case["name"] for case in expanded]
+
+        self.assertIn("query[engine=segment_tree,points=10000,k=4]", names)
+        self.assertIn("mixed[engine=rolling_windows,points=100000,batch_size=100,read_ratio=0.9]", names)
+        self.assertEqual(len(names), len(set(names)))
+
+    def test_engines_are_limited_in_size(self):
+        expanded = cases({"points": [10 ** 6, 10 ** 7], "batch_sizes": [100], "read_ratios": [0.5]}, ["segment_tree"], ["build"])
+
+        self.assertEqual([case["params"]["points"] for case in expanded], [10 ** 6])
+
+
+class TestRunCase(unittest.TestCase):
+
+    def test_every_workload_runs(self):
+        for case in cases({"points": [1000], "batch_sizes": [10], "read_ratios": [0.5]}, ["array_segment_tree"], ["build", "append", "remove_old_data", "grow", "query", "mixed", "service"]):
+            result = run_case(case, min_time_seconds=0, min_iterations=3, max_iterations=3)
+
+            self.assertEqual(result["iterations"], 3, case["name"])
+            self.assertGreater(result["ops_per_second"], 0)
+            self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+            self.assertGreater(result["traced_bytes"], 0)
+
+    def test_unsupported_workloads_are_skipped(self):
+        case, = cases({"points": [1000], "batch_sizes": [10], "read_ratios": [0.5]}, ["rolling_windows"], ["remove_old_data"])
+
+        self.assertIsNone(run_case(case, min_time_seconds=0, min_iterations=1, max_iterations=1))
+
+    def test_run_isolated(self):
+        case, = cases({"points": [1000], "batch_sizes": [10], "read_ratios": [0.5]}, ["segment_tree"], ["append"])
+
+        result = run_isolated(case, min_time_seconds=0, min_iterations=2, max_iterations=2)
+
+        self.assertEqual(result["name"], case["name"])
+        self.assertGreater(result["peak_rss_bytes"], 0)
+
+
+class TestCompare(unittest.TestCase):
+
+    def test_regressions_beyond_the_threshold(self):
+        baseline = [
+            {"name": "a", "ops_per_second": 100.0, "p50_ms": 1.0, "p99_ms": 2.0, "traced_bytes": 1000},
+            {"name": "b", "ops_per_second": 100.0, "p50_ms": 1.0, "p99_ms": 2.0, "traced_bytes": 1000},
+        ]
+        results = [
+            {"name": "a", "ops_per_second": 95.0, "p50_ms": 0.5, "p99_ms": 2.1, "traced_bytes": 1000},
+            {"name": "b", "ops_per_second": 80.0, "p50_ms": 1.0, "p99_ms": 3.0, "traced_bytes": 1000},
+            {"name": "c", "ops_per_second": 1.0, "p50_ms": 1.0, "p99_ms": 1.0, "traced_bytes": 1},
+        ]
+
+        regressions = compare(results, baseline, threshold=0.1)
+
+        self.assertEqual([(regression["name"], regression["metric"]) for regression in regressions], [("b", "ops_per_second"), ("b", "p99_ms")])
+        self.assertAlmostEqual(regressions[1]["change"], 0.5)
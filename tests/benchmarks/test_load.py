@@ -0,0 +1,55 @@
+import unittest
+
+from benchmarks.load import Replayer, Results, server, synthetic_requests
+
+
+class TestSyntheticRequests(unittest.TestCase):
+
+    def test_symbols_are_created_before_they_are_queried(self):
+        entries = list(synthetic_requests(200, symbols=5, batch_size=3, read_ratio=0.8))
+
+        self.assertEqual(len(entries), 200)
+        self.assertTrue(all(entry["method"] == "POST" for entry in entries[:5]))
+        self.assertEqual({entry["json"]["symbol"] for entry in entries[:5]}, {f"SYM{i}" for i in range(5)})
+        self.assertTrue(all(len(entry["json"]["values"]) == 3 for entry in entries if entry["method"] == "POST"))
+
+
+class TestResults(unittest.TestCase):
+
+    def test_report(self):
+        results = Results()
+        for latency in (1.0, 2.0, 3.0):
+            results.add("GET /stats/", latency, "200")
+        results.add("GET /stats/", 30.0, "404")
+        results.add("GET /stats/", 4000.0, "TimeoutError")
+
+        report = results.report(elapsed_seconds=2.5)
+        stats = report["endpoints"]["GET /stats/"]
+
+        self.assertEqual(report["requests_per_second"], 2.0)
+        self.assertEqual(stats["error_rate"], 0.4)
+        self.assertEqual(stats["p50_ms"], 3.0)
+        self.assertEqual(stats["histogram"]["1"], 1)
+        self.assertEqual(stats["histogram"]["2.5"], 1)
+        self.assertEqual(stats["histogram"]["5000"], 1)
+        self.assertEqual(sum(stats["histogram"].values()), 5)
+
+
+class TestReplayer(unittest.TestCase):
+
+    def test_replay_against_the_application(self):
+        entries = list(synthetic_requests(100, symbols=3, batch_size=10, read_ratio=0.5))
+        entries.append({"method": "GET", "path": "/api/trading-statistics/stats/?symbol=MISSING&k=1"})
+
+        with server("in-process", {}) as url:
+            replayer = Replayer(url)
+            elapsed = replayer.run_closed_loop(entries, concurrency=4)
+            replayer.run_open_loop(entries[:10], [i * 0.001 for i in range(10)], max_concurrency=2)
+
+        report = replayer.results.report(elapsed)
+        self.assertEqual(report["requests"], 111)
+        stats = report["endpoints"]["GET /api/trading-statistics/stats/"]
+        # Queries running concurrently with the first batch of their symbol may also miss it
+        self.assertGreaterEqual(stats["statuses"].get("404"), 1)
+        self.assertLessEqual(set(stats["statuses"]), {"200", "404"})
+        self.assertEqual(report["endpoints"]["POST /api/trading-statistics/add_batch/"]["error_rate"], 0)
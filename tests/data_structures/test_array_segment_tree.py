@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+from app.data_structures.array_segment_tree import ArraySegmentTree
+from app.data_structures.segment_tree import SegmentTree
+from app.data_structures.exceptions import SegmentTreeCapacityLimitReachedException
+
+@pytest.fixture
+def segment_tree():
+    return ArraySegmentTree(capacity=8, max_window_size=8)
+
+def test_build_tree(segment_tree):
+    segment_tree.build([1, 2, 3, 4, 5])
+
+    assert segment_tree.size == 5
+    assert list(segment_tree.mins[segment_tree.capacity:segment_tree.capacity + 5]) == [1, 2, 3, 4, 5]
+    assert list(segment_tree.sums_of_squares[segment_tree.capacity:segment_tree.capacity + 5]) == [1, 4, 9, 16, 25]
+    assert segment_tree.mins[1] == 1
+    assert segment_tree.maxs[1] == 5
+    assert segment_tree.sums[1] == 15
+    assert segment_tree.sums_of_squares[1] == 55
+
+def test_capacity_is_rounded_to_power_of_two():
+    segment_tree = ArraySegmentTree(capacity=10, max_window_size=100)
+
+    assert segment_tree.capacity == 16
+
+def test_query(segment_tree):
+    segment_tree.build([1, 2, 3, 4, 5])
+
+    assert segment_tree.query(1) == (1, 5, 5, 3.0, 2.0)
+
+def test_build_accepts_numpy_arrays(segment_tree):
+    segment_tree.build(np.array([1.0, 2.0, 3.0, 4.0, 5.0]))
+
+    assert segment_tree.query(1) == (1, 5, 5, 3.0, 2.0)
+
+def test_remove_old_data(segment_tree):
+    segment_tree.build([1, 2, 3, 4, 5, 6, 7, 8])
+
+    segment_tree.remove_old_data(3)
+
+    assert segment_tree.size == 5
+    assert list(segment_tree.get_data()) == [4, 5, 6, 7, 8]
+    assert list(segment_tree.mins[segment_tree.capacity:segment_tree.capacity + 3]) == [np.inf] * 3
+    assert segment_tree.sums[1] == 30
+
+def test_append_data_wraps_around(segment_tree):
+    segment_tree.build([1, 2, 3, 4, 5, 6, 7, 8])
+
+    segment_tree.append_data([9, 10, 11])
+
+    assert segment_tree.size == 8
+    assert segment_tree.capacity == 8
+    assert list(segment_tree.get_data()) == [4, 5, 6, 7, 8, 9, 10, 11]
+    assert list(segment_tree.get_data(last=5)) == [7, 8, 9, 10, 11]
+    assert list(segment_tree.get_data(last=2)) == [10, 11]
+    assert list(segment_tree.get_data(last=20)) == [4, 5, 6, 7, 8, 9, 10, 11]
+    assert segment_tree.query(1) == (4, 11, 11, 7.5, 5.25)
+
+def test_capacity_limit(segment_tree):
+    data = [1] * (segment_tree.capacity * 3)
+
+    with pytest.raises(SegmentTreeCapacityLimitReachedException):
+        segment_tree.build(data)
+
+    with pytest.raises(SegmentTreeCapacityLimitReachedException):
+        segment_tree.append_data(data)
+
+def test_query_empty_tree(segment_tree):
+    segment_tree.build([])
+
+    assert segment_tree.query(1) == (float('inf'), float('-inf'), None, 0, 0)
+
+def test_resize():
+    segment_tree = ArraySegmentTree(capacity=8, max_window_size=30)
+    segment_tree.build([1, 2, 3, 4, 5, 6, 7, 8, 9, 10])
+
+    segment_tree.append_data([11, 12, 13])
+
+    assert segment_tree.capacity == 16
+    assert segment_tree.query(1) == (4, 13, 13, 8.5, 8.25)
+
+def test_matches_segment_tree():
+    array_tree = ArraySegmentTree(capacity=4, max_window_size=300)
+    segment_tree = SegmentTree(capacity=4, max_window_size=300)
+    rng = np.random.default_rng(0)
+
+    for _ in range(40):
+        batch = [float(v) for v in rng.integers(0, 1000, rng.integers(0, 50))]
+        array_tree.append_data(batch)
+        segment_tree.append_data(batch)
+
+        for k in (1, 2, 3):
+            assert array_tree.query(k) == segment_tree.query(k)
+
+def test_query_many():
+    segment_tree = ArraySegmentTree(capacity=8, max_window_size=1000)
+    segment_tree.build([float(i % 17) for i in range(250)])
+    segment_tree.append_data([float(i % 13) for i in range(900)])
+
+    assert segment_tree.query_many([3, 1, 2, 1]) == [segment_tree.query(k) for k in (3, 1, 2, 1)]
+
+def test_query_range_matches_segment_tree():
+    array_tree = ArraySegmentTree(capacity=4, max_window_size=300)
+    segment_tree = SegmentTree(capacity=4, max_window_size=300)
+    for i in range(0, 420, 140):
+        batch = [float(j % 41) for j in range(i, i + 140)]
+        array_tree.append_data(batch)
+        segment_tree.append_data(batch)
+
+    for start, count in ((0, 300), (10, 1), (123, 150), (290, 50), (300, 1)):
+        assert array_tree.query_range(start, count) == segment_tree.query_range(start, count)
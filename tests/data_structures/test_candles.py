@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from app.data_structures.candles import CandleRollup, CandleRollups
+
+def expected_candles(values, resolution):
+    buckets = [values[i:i + resolution] for i in range(0, len(values), resolution)]
+    return {
+        "open": [bucket[0] for bucket in buckets],
+        "high": [max(bucket) for bucket in buckets],
+        "low": [min(bucket) for bucket in buckets],
+        "close": [bucket[-1] for bucket in buckets],
+        "mean": [sum(bucket) / len(bucket) for bucket in buckets],
+    }
+
+@pytest.mark.parametrize("resolution", [1, 7, 100])
+def test_append_matches_brute_force(resolution):
+    rollup = CandleRollup(resolution, capacity=1)
+    rng = np.random.default_rng(resolution)
+    values = []
+
+    for _ in range(20):
+        batch = [float(v) for v in rng.integers(0, 1000, rng.integers(0, 250))]
+        rollup.append(batch)
+        values.extend(batch)
+
+        first, candles = rollup.read()
+        assert first == 0
+        expected = expected_candles(values, resolution)
+        for name in expected:
+            assert candles[name].tolist() == pytest.approx(expected[name])
+
+def test_trim():
+    rollup = CandleRollup(10)
+    rollup.append(np.arange(95.0))
+
+    rollup.trim(50)
+    first, candles = rollup.read()
+
+    # The candle of data points 40 to 49 still holds data point 45
+    assert first == 4
+    assert candles["open"].tolist() == [40.0, 50.0, 60.0, 70.0, 80.0, 90.0]
+    assert candles["mean"][-1] == 92.0
+
+def test_read_range():
+    rollup = CandleRollup(10)
+    rollup.append(np.arange(100.0))
+
+    first, candles = rollup.read(end=7, count=3)
+    assert first == 4
+    assert candles["close"].tolist() == [49.0, 59.0, 69.0]
+
+    first, candles = rollup.read(count=2)
+    assert first == 8
+    assert candles["open"].tolist() == [80.0, 90.0]
+
+    assert rollup.read(end=-5)[1]["open"].tolist() == []
+
+def test_rollups():
+    rollups = CandleRollups([10, 100])
+    rollups.append(np.arange(250.0))
+    rollups.trim(120)
+
+    assert rollups.rollups[10].read()[0] == 13
+    assert rollups.rollups[100].read()[1]["low"].tolist() == [100.0, 200.0]
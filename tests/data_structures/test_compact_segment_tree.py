@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from app.data_structures.array_segment_tree import ArraySegmentTree
+from app.data_structures.compact_segment_tree import CompactArraySegmentTree
+from app.services.metrics import engine_memory_bytes
+
+def float32_values(rng, count):
+    # Values which are exact in float32, so that both trees see the same data
+    return rng.integers(0, 2 ** 16, count).astype(np.float64) / 8
+
+@pytest.mark.parametrize("block_size", [1, 4, 32])
+def test_matches_array_segment_tree(block_size):
+    compact = CompactArraySegmentTree(capacity=10, max_window_size=500, block_size=block_size)
+    reference = ArraySegmentTree(capacity=10, max_window_size=500)
+    rng = np.random.default_rng(block_size)
+
+    for _ in range(30):
+        batch = float32_values(rng, rng.integers(1, 120))
+        compact.append_data(batch)
+        reference.append_data(batch)
+
+        assert compact.get_data().tolist() == reference.get_data().tolist()
+        assert compact.get_data(last=13).tolist() == reference.get_data(last=13).tolist()
+        assert compact.query_many([1, 2, 3]) == reference.query_many([1, 2, 3])
+        for start, count in ((0, 500), (3, 41), (reference.size - 7, 7), (100, 1)):
+            assert compact.query_range(start, count) == reference.query_range(start, count)
+
+def test_build_and_remove_old_data():
+    compact = CompactArraySegmentTree(capacity=10, max_window_size=1000, block_size=8)
+    reference = ArraySegmentTree(capacity=10, max_window_size=1000)
+    values = float32_values(np.random.default_rng(0), 900)
+
+    compact.build(values)
+    reference.build(values)
+    compact.remove_old_data(333)
+    reference.remove_old_data(333)
+
+    assert compact.query_many([1, 2, 3]) == reference.query_many([1, 2, 3])
+
+def test_values_are_reported_as_ingested():
+    compact = CompactArraySegmentTree()
+    compact.build([100.1, 99.7, 100.3])
+    reference = ArraySegmentTree()
+    reference.build([100.1, 99.7, 100.3])
+
+    assert compact.query(1) == reference.query(1) == (99.7, 100.3, 100.3, 100.03, 0.73)
+
+def test_sums_keep_their_precision():
+    compact = CompactArraySegmentTree(capacity=2 ** 20, max_window_size=2 ** 20)
+    values = np.full(2 ** 20, 0.1, dtype=np.float32).astype(np.float64)
+    compact.build(values)
+
+    assert compact._aggregate_window(0, len(values))[2] == pytest.approx(len(values) * float(np.float32(0.1)), rel=1e-15)
+
+def test_memory_per_data_point():
+    compact = CompactArraySegmentTree(capacity=2 ** 20, max_window_size=2 ** 20)
+    reference = ArraySegmentTree(capacity=2 ** 20, max_window_size=2 ** 20)
+
+    assert engine_memory_bytes(compact) / 2 ** 20 < 6
+    assert engine_memory_bytes(reference) / engine_memory_bytes(compact) > 10
+
+def test_query_empty_tree():
+    compact = CompactArraySegmentTree()
+    compact.build([])
+
+    assert compact.query(1) == (float('inf'), float('-inf'), None, 0, 0)
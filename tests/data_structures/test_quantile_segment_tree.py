@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from app.data_structures.array_segment_tree import ArraySegmentTree
+from app.data_structures.quantile_segment_tree import QuantileArraySegmentTree
+from app.data_structures.quantile_sketch import QuantileSketchMapping
+
+QUANTILES = [0.0, 0.5, 0.95, 0.99, 1.0]
+
+@pytest.fixture
+def quantile_tree():
+    return QuantileArraySegmentTree(capacity=4, max_window_size=2000, sketch_min_leaves=16)
+
+def assert_within_relative_accuracy(estimates, values, relative_accuracy=0.01):
+    exact = np.quantile(values, QUANTILES, method="lower")
+    for estimate, expected in zip(estimates, exact):
+        assert estimate == pytest.approx(expected, rel=relative_accuracy, abs=1e-2)
+
+def test_mapping_relative_accuracy():
+    mapping = QuantileSketchMapping(relative_accuracy=0.01)
+    values = np.array([-5000.0, -3.2, -0.5, 0.0, 0.001, 0.02, 1.0, 7.77, 123.4, 99999.0])
+
+    estimates = mapping.bin_values[mapping.bins_of(values)]
+
+    assert np.all(np.diff(mapping.bins_of(values)) >= 0)
+    np.testing.assert_allclose(estimates, np.where(np.abs(values) < 1e-2, 0, values), rtol=0.01)
+
+def test_mapping_quantiles():
+    mapping = QuantileSketchMapping()
+    values = np.arange(1.0, 101.0)
+
+    assert mapping.quantiles(mapping.counts_of(values), QUANTILES) == pytest.approx([1, 50, 95, 99, 100], rel=0.01)
+    assert mapping.quantiles(mapping.counts_of(values[:0]), [0.5]) == [None]
+
+def test_query_quantiles(quantile_tree):
+    rng = np.random.default_rng(0)
+    data = []
+    for _ in range(50):
+        batch = rng.lognormal(4, 1, rng.integers(1, 200))
+        quantile_tree.append_data(batch)
+        data.extend(batch)
+
+        window = np.array(data[-2000:])
+        for k in (1, 2, 3, 4):
+            assert_within_relative_accuracy(quantile_tree.query_quantiles(k, QUANTILES), window[-10 ** k:])
+
+def test_sketches_follow_evictions_and_resizes(quantile_tree):
+    rng = np.random.default_rng(1)
+    quantile_tree.build(rng.normal(0, 100, 300))
+    for _ in range(20):
+        quantile_tree.append_data(rng.normal(50, 100, 250))
+
+    sketches = quantile_tree.sketches.copy()
+    quantile_tree._build_internal_nodes()
+
+    np.testing.assert_array_equal(quantile_tree.sketches, sketches)
+    assert quantile_tree.sketches[1].sum() == quantile_tree.size
+
+def test_matches_array_segment_tree(quantile_tree):
+    array_tree = ArraySegmentTree(capacity=4, max_window_size=2000)
+    batch = [float(i % 37) for i in range(1500)]
+    quantile_tree.append_data(batch)
+    array_tree.append_data(batch)
+
+    assert quantile_tree.query_many([1, 2, 3]) == array_tree.query_many([1, 2, 3])
+
+def test_query_quantiles_empty(quantile_tree):
+    assert quantile_tree.query_quantiles(2, [0.5]) == [None]
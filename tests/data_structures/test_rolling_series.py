@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from app.data_structures.array_segment_tree import ArraySegmentTree
+from app.data_structures.rolling_series import rolling_stats, sliding_extremum
+
+@pytest.mark.parametrize("window", [1, 3, 10, 64, 100])
+def test_sliding_extremum_matches_brute_force(window):
+    values = np.random.default_rng(window).normal(size=250)
+    starts = np.arange(len(values) - window + 1)
+
+    assert sliding_extremum(values, window, starts, np.minimum).tolist() == [values[s:s + window].min() for s in starts]
+    assert sliding_extremum(values, window, starts, np.maximum).tolist() == [values[s:s + window].max() for s in starts]
+
+@pytest.mark.parametrize("window, count, stride, offset", [(1, 5, 1, 0), (7, 20, 3, 2), (50, 1000, 1, 0), (200, 10, 37, 13), (300, 5, 1, 0)])
+def test_rolling_stats_match_engine_queries(window, count, stride, offset):
+    values = np.round(np.random.default_rng(window).uniform(90, 110, 500), 2)
+    tree = ArraySegmentTree(capacity=1000, max_window_size=1000)
+    tree.build(values)
+
+    series = rolling_stats(values, window, count, stride, offset)
+
+    expected_offsets = [o for o in range(offset, len(values) - window + 1, stride)][:count][::-1]
+    assert series["offsets"] == expected_offsets
+    for i, o in enumerate(expected_offsets):
+        start = len(values) - o - window
+        expected = tree.query_range(start, window)
+        actual = tuple(series[name][i] for name in ("min", "max", "last", "avg"))
+        assert actual == pytest.approx(expected[:4], abs=0.011)
+        # A mean halfway between two cents may be rounded either way depending on the order of the
+        # additions, which moves the variance by about 2 * mean * 0.01
+        if series["avg"][i] == expected[3]:
+            assert series["var"][i] == pytest.approx(expected[4], abs=0.011)
+
+def test_rolling_stats_are_accurate_for_large_values():
+    values = 1e9 + np.arange(10 ** 5, dtype=np.float64) % 10
+
+    series = rolling_stats(values, 10, 3)
+
+    assert series["avg"] == [1e9 + 4.5] * 3
+    assert series["var"] == [8.25] * 3
+
+def test_rolling_stats_subtract_the_rounded_mean():
+    values = [100.0, 100.0, 100.0, 100.01]
+    tree = ArraySegmentTree()
+    tree.build(values)
+
+    series = rolling_stats(values, 4, 1)
+
+    # The exact variance is about 0.00002, but the engines subtract the square of the mean rounded to 100.0
+    assert (series["avg"], series["var"]) == ([100.0], [0.5])
+    assert tree.query_range(0, 4)[3:] == (100.0, 0.5)
+
+def test_rolling_stats_without_enough_data():
+    assert rolling_stats([1.0, 2.0], 3, 10)["offsets"] == []
+    assert rolling_stats([1.0, 2.0, 3.0], 2, 10, offset=2)["min"] == []
+    assert rolling_stats([1.0, 2.0, 3.0], 2, 10)["avg"] == [1.5, 2.5]
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from app.data_structures.rolling_windows import RollingWindows
+from app.data_structures.segment_tree import SegmentTree
+from app.data_structures.exceptions import SegmentTreeCapacityLimitReachedException
+
+@pytest.fixture
+def rolling_windows():
+    return RollingWindows(max_window_size=100)
+
+def test_windows():
+    assert RollingWindows(max_window_size=10 ** 8).windows == [10 ** k for k in range(9)]
+    assert RollingWindows(max_window_size=250).windows == [1, 10, 100, 250]
+
+def test_query(rolling_windows):
+    rolling_windows.build([1, 2, 3, 4, 5])
+
+    assert rolling_windows.query(1) == (1, 5, 5, 3.0, 2.0)
+
+def test_query_spans_previous_block(rolling_windows):
+    rolling_windows.build([1, 2, 3, 4, 5, 6, 7, 8, 9, 10])
+
+    rolling_windows.append_data([11, 12, 13])
+
+    assert rolling_windows.query(1) == (4, 13, 13, 8.5, 8.25)
+    assert rolling_windows.query(2) == (1, 13, 13, 7.0, 14.0)
+
+def test_evicts_beyond_max_window_size():
+    rolling_windows = RollingWindows(max_window_size=10)
+    rolling_windows.build([100, 1, 2, 3, 4, 5, 6, 7, 8, 9])
+
+    rolling_windows.append_data([10])
+
+    assert rolling_windows.size == 10
+    assert rolling_windows.query(8) == (1, 10, 10, 5.5, 8.25)
+    assert list(rolling_windows.get_data(last=3)) == [8, 9, 10]
+
+def test_capacity_limit(rolling_windows):
+    data = [1] * 121
+
+    with pytest.raises(SegmentTreeCapacityLimitReachedException):
+        rolling_windows.build(data)
+
+    with pytest.raises(SegmentTreeCapacityLimitReachedException):
+        rolling_windows.append_data(data)
+
+def test_query_empty(rolling_windows):
+    rolling_windows.build([])
+
+    assert rolling_windows.query(1) == (float('inf'), float('-inf'), None, 0, 0)
+
+def test_matches_segment_tree():
+    rolling_windows = RollingWindows(max_window_size=1000)
+    segment_tree = SegmentTree(capacity=10, max_window_size=1000)
+    rng = np.random.default_rng(0)
+
+    for _ in range(100):
+        batch = [float(v) for v in rng.integers(0, 1000, rng.integers(0, 300))]
+        rolling_windows.append_data(batch)
+        segment_tree.append_data(batch)
+
+        for k in (1, 2, 3):
+            assert rolling_windows.query(k) == segment_tree.query(k)
+
+def test_query_range_matches_segment_tree():
+    rolling_windows = RollingWindows(max_window_size=1000)
+    segment_tree = SegmentTree(capacity=10, max_window_size=1000)
+    for i in range(0, 2500, 500):
+        batch = [float(j % 97) for j in range(i, i + 500)]
+        rolling_windows.append_data(batch)
+        segment_tree.append_data(batch)
+
+    for start, count in ((0, 1000), (10, 1), (123, 450), (990, 50), (1000, 1)):
+        assert rolling_windows.query_range(start, count) == segment_tree.query_range(start, count)
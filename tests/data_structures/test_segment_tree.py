@@ -52,18 +52,56 @@ def test_remove_old_data(segment_tree):
     segment_tree.build(data)
 
     segment_tree.remove_old_data(3)
+    segment_tree._repair()
 
-    assert segment_tree.tree[segment_tree.capacity + 0].min == 4
-    assert segment_tree.tree[segment_tree.capacity + 1].min == 5
-    assert segment_tree.tree[segment_tree.capacity + 2].min == 6
-    assert segment_tree.tree[segment_tree.capacity + 3].min == 7
-    assert segment_tree.tree[segment_tree.capacity + 4].min == 8
-    assert segment_tree.tree[segment_tree.capacity + 5].min == 9
-    assert segment_tree.tree[segment_tree.capacity + 6].min == 10
-    assert segment_tree.tree[segment_tree.capacity + 7].min == float('inf')
-    assert segment_tree.tree[segment_tree.capacity + 8].min == float('inf')
-    assert segment_tree.tree[segment_tree.capacity + 9].min == float('inf')
-    
+    assert segment_tree.size == 7
+    assert segment_tree.tree[segment_tree._leaf_index(0)].min == 4
+    assert segment_tree.tree[segment_tree._leaf_index(1)].min == 5
+    assert segment_tree.tree[segment_tree._leaf_index(2)].min == 6
+    assert segment_tree.tree[segment_tree._leaf_index(3)].min == 7
+    assert segment_tree.tree[segment_tree._leaf_index(4)].min == 8
+    assert segment_tree.tree[segment_tree._leaf_index(5)].min == 9
+    assert segment_tree.tree[segment_tree._leaf_index(6)].min == 10
+    assert segment_tree.tree[segment_tree.capacity + 0].min == float('inf')
+    assert segment_tree.tree[segment_tree.capacity + 1].min == float('inf')
+    assert segment_tree.tree[segment_tree.capacity + 2].min == float('inf')
+    assert segment_tree.tree[1] == StatsNode(4, 10, 49, 371)
+
+
+def test_append_data_wraps_around(segment_tree):
+    segment_tree.build([1, 2, 3, 4, 5, 6, 7, 8, 9, 10])
+
+    segment_tree.append_data([11, 12, 13])
+
+    assert segment_tree.size == 10
+    assert segment_tree.capacity == 10
+    assert segment_tree.tree[segment_tree.capacity + 0].min == 11
+    assert segment_tree.tree[segment_tree.capacity + 2].min == 13
+
+    result_min, result_max, result_last_number, result_avg, result_var = segment_tree.query(1)
+
+    assert result_min == 4
+    assert result_max == 13
+    assert result_last_number == 13
+    assert result_avg == 8.5
+    assert result_var == 8.25
+
+
+def test_query_matches_brute_force_after_many_appends():
+    segment_tree = SegmentTree(capacity=10, max_window_size=100)
+    values = []
+
+    for batch_start in range(0, 1000, 37):
+        batch = [float((i * 7919) % 101) for i in range(batch_start, batch_start + 37)]
+        segment_tree.append_data(batch)
+        values = (values + batch)[-100:]
+
+        for k in (1, 2):
+            window = values[-10 ** k:]
+            mean = round(sum(window) / len(window), 2)
+            expected_var = round(sum(v ** 2 for v in window) / len(window) - mean ** 2, 2)
+
+            assert segment_tree.query(k) == (min(window), max(window), window[-1], mean, expected_var)
 
 def test_capacity_limit(segment_tree):
     data = [1] * (segment_tree.capacity * 3)
@@ -98,3 +136,98 @@ def test_resize():
     assert result_last_number == 13
     assert result_avg == 8.5
     assert result_var == 8.25
+
+def test_append_data_updates_internal_nodes_incrementally():
+    segment_tree = SegmentTree(capacity=13, max_window_size=13)
+    segment_tree.build([1, 2, 3, 4, 5])
+
+    for batch in ([6, 7], [8, 9, 10, 11, 12], [13, 14, 15, 16], [17]):
+        segment_tree.append_data(batch)
+        segment_tree._repair()
+
+        incremental_tree = list(segment_tree.tree)
+        segment_tree._build_internal_nodes()
+
+        assert incremental_tree == segment_tree.tree
+
+def test_internal_nodes_are_repaired_lazily():
+    segment_tree = SegmentTree(capacity=13, max_window_size=13)
+    segment_tree.build([1, 2, 3, 4, 5])
+
+    for batch in ([6, 7], [8, 9, 10, 11, 12], [13, 14, 15, 16], [17]):
+        segment_tree.append_data(batch)
+
+    # Writes only record the leaves they changed, the root still holds the built data
+    assert segment_tree.tree[1] == StatsNode(1, 5, 15, 55)
+    assert segment_tree.dirty_ranges
+
+    assert segment_tree.query(2) == (5, 17, 17, 11.0, 14.0)
+    assert segment_tree.dirty_ranges == []
+
+    incremental_tree = list(segment_tree.tree)
+    segment_tree._build_internal_nodes()
+    assert incremental_tree == segment_tree.tree
+
+def test_dirty_ranges_are_bounded_without_queries():
+    segment_tree = SegmentTree(capacity=10, max_window_size=10)
+
+    for i in range(1000):
+        segment_tree.append_data([float(i), float(i + 1), float(i + 2)])
+
+    assert len(segment_tree.dirty_ranges) <= 65
+    assert segment_tree.query(1)[:3] == (997.0, 1001.0, 1001.0)
+
+def test_resize_grows_geometrically():
+    segment_tree = SegmentTree(capacity=10, max_window_size=1000, growth_factor=2)
+    segment_tree.append_data([1.0] * 8)
+    leaves = list(segment_tree.tree[segment_tree.capacity:segment_tree.capacity + 8])
+
+    segment_tree.append_data([2.0] * 5)
+    assert segment_tree.capacity == 20
+    # The leaves are moved to the larger tree rather than re-created
+    assert all(a is b for a, b in zip(leaves, segment_tree.tree[segment_tree.capacity:]))
+
+    segment_tree.append_data([3.0] * 100)
+    assert segment_tree.capacity == 160
+
+    segment_tree.append_data([4.0] * 1100)
+    assert segment_tree.capacity == 1000
+    assert segment_tree.query(3) == (4.0, 4.0, 4.0, 4.0, 0.0)
+
+def test_resize_keeps_a_wrapped_window():
+    segment_tree = SegmentTree(capacity=10, max_window_size=30)
+    values = [float((i * 7) % 11) for i in range(30)]
+    segment_tree.append_data(values[:10])
+    segment_tree.remove_old_data(4)
+    segment_tree.append_data(values[10:14])
+
+    # The window wraps around the end of the leaves when the tree grows
+    segment_tree.append_data(values[14:30])
+    window = values[4:30]
+
+    assert segment_tree.get_data() == window
+    assert segment_tree.get_data(last=5) == window[-5:]
+    assert segment_tree.query_range(0, len(window))[:3] == (min(window), max(window), window[-1])
+
+def test_query_many():
+    segment_tree = SegmentTree(capacity=10, max_window_size=1000)
+    segment_tree.build([float(i % 17) for i in range(250)])
+    segment_tree.append_data([float(i % 13) for i in range(300)])
+
+    assert segment_tree.query_many([3, 1, 2, 1]) == [segment_tree.query(k) for k in (3, 1, 2, 1)]
+
+def test_query_range():
+    segment_tree = SegmentTree(capacity=10, max_window_size=100)
+    data = [float((i * 7) % 23) for i in range(250)]
+    for i in range(0, len(data), 60):
+        segment_tree.append_data(data[i:i + 60])
+
+    window = data[-100:]
+    for start, count in ((0, 100), (5, 10), (37, 50), (99, 1), (90, 20)):
+        values = window[start:start + count]
+        mean = round(sum(values) / len(values), 2)
+        variance = round(sum(v * v for v in values) / len(values) - mean ** 2, 2)
+
+        assert segment_tree.query_range(start, count) == (min(values), max(values), values[-1], mean, variance)
+
+    assert segment_tree.query_range(100, 5) == (float('inf'), float('-inf'), None, 0, 0)
@@ -0,0 +1,83 @@
+import multiprocessing
+import secrets
+
+import numpy as np
+import pytest
+from app.data_structures.array_segment_tree import ArraySegmentTree
+from app.data_structures.shared_array_segment_tree import SharedArraySegmentTree, SharedArraySegmentTreeReader
+
+@pytest.fixture
+def segment_tree():
+    tree = SharedArraySegmentTree(capacity=4, max_window_size=100)
+    yield tree
+    tree.close()
+
+@pytest.fixture
+def reader(segment_tree):
+    reader = SharedArraySegmentTreeReader(segment_tree.name)
+    yield reader
+    reader.close()
+
+def test_reader_sees_the_writer_data(segment_tree, reader):
+    segment_tree.build([1, 2, 3, 4, 5])
+
+    assert reader.query(1) == (1, 5, 5, 3.0, 2.0)
+    assert reader.version == 1
+    assert list(reader.get_data()) == [1, 2, 3, 4, 5]
+    assert list(reader.get_data(last=2)) == [4, 5]
+
+def test_reader_follows_reallocations(segment_tree, reader):
+    expected = ArraySegmentTree(capacity=4, max_window_size=100)
+    rng = np.random.default_rng(7)
+
+    segment_tree.build([1.0])
+    expected.build([1.0])
+    for _ in range(40):
+        batch = rng.normal(size=int(rng.integers(1, 12)))
+        segment_tree.append_data(batch)
+        expected.append_data(batch)
+
+        assert reader.query_many([0, 1, 2]) == expected.query_many([0, 1, 2])
+
+    assert reader.version == 41
+    assert segment_tree.generation > 1
+
+def test_attaching_to_a_missing_tree_raises():
+    with pytest.raises(FileNotFoundError):
+        SharedArraySegmentTreeReader(f"tp-{secrets.token_hex(8)}")
+
+def _write_constant_batches(name, ready, done):
+    tree = SharedArraySegmentTree(capacity=2, max_window_size=10 ** 5, name=name)
+    tree.build(np.zeros(10 ** 4))
+    ready.set()
+
+    for i in range(1, 300):
+        # Every batch fills the last 10^4 data points with a single value
+        tree.append_data(np.full(10 ** 4, float(i)))
+
+    done.wait()
+    tree.close()
+
+def test_reader_never_sees_a_torn_update():
+    context = multiprocessing.get_context("fork")
+    name = f"tp-{secrets.token_hex(8)}"
+    ready, done = context.Event(), context.Event()
+    writer = context.Process(target=_write_constant_batches, args=(name, ready, done))
+    writer.start()
+
+    try:
+        assert ready.wait(10)
+        reader = SharedArraySegmentTreeReader(name)
+
+        inconsistent = []
+        while reader.version < 300:
+            result_min, result_max, last, _, _ = reader.query(4)
+            if not result_min == result_max == last:
+                inconsistent.append((result_min, result_max, last))
+
+        assert inconsistent == []
+        assert reader.query(4)[2] == 299
+        reader.close()
+    finally:
+        done.set()
+        writer.join()
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from app.data_structures.exceptions import TimestampsNotMonotonicException
+from app.data_structures.timestamp_index import TimestampIndex
+
+@pytest.fixture
+def timestamp_index():
+    return TimestampIndex(capacity=4)
+
+def test_append(timestamp_index):
+    timestamp_index.append([1.0, 2.0, 2.0])
+    timestamp_index.append([3.0, 5.0, 8.0])
+
+    assert timestamp_index.timestamps.tolist() == [1.0, 2.0, 2.0, 3.0, 5.0, 8.0]
+    assert timestamp_index.last == 8.0
+
+def test_append_rejects_decreasing_timestamps(timestamp_index):
+    timestamp_index.append([1.0, 2.0])
+
+    with pytest.raises(TimestampsNotMonotonicException):
+        timestamp_index.append([3.0, 2.5])
+    with pytest.raises(TimestampsNotMonotonicException):
+        timestamp_index.append([1.5])
+    with pytest.raises(TimestampsNotMonotonicException):
+        timestamp_index.append([float('nan')])
+
+    assert timestamp_index.timestamps.tolist() == [1.0, 2.0]
+
+def test_trim_and_compaction(timestamp_index):
+    for i in range(50):
+        timestamp_index.append([float(2 * i), float(2 * i + 1)])
+        timestamp_index.trim(5)
+
+    assert timestamp_index.timestamps.tolist() == [95.0, 96.0, 97.0, 98.0, 99.0]
+    # The live timestamps are moved back to the start of the array rather than growing it
+    assert len(timestamp_index.values) <= 16
+
+def test_positions(timestamp_index):
+    timestamp_index.append(np.array([10.0, 20.0, 20.0, 30.0, 40.0]))
+
+    assert timestamp_index.positions(20.0, 30.0) == (1, 3)
+    assert timestamp_index.positions(15.0, 25.0) == (1, 2)
+    assert timestamp_index.positions(None, 10.0) == (0, 1)
+    assert timestamp_index.positions(35.0, None) == (4, 1)
+    assert timestamp_index.positions() == (0, 5)
+    assert timestamp_index.positions(41.0, None)[1] == 0
+    assert timestamp_index.positions(30.0, 20.0)[1] == 0
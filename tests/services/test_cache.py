@@ -0,0 +1,49 @@
+import unittest
+from app.services.cache import StatsCache
+
+
+class TestStatsCache(unittest.TestCase):
+
+    def test_get_and_put(self):
+        cache = StatsCache(max_size=2)
+
+        self.assertIsNone(cache.get("a"))
+
+        cache.put("a", 1)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 1)
+
+    def test_lru_eviction(self):
+        cache = StatsCache(max_size=2, eviction_policy="lru")
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+
+        cache.put("c", 3)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(len(cache), 2)
+
+    def test_fifo_eviction(self):
+        cache = StatsCache(max_size=2, eviction_policy="fifo")
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+
+        cache.put("c", 3)
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("b"), 2)
+
+    def test_disabled(self):
+        cache = StatsCache(max_size=0)
+        cache.put("a", 1)
+
+        self.assertIsNone(cache.get("a"))
+
+    def test_unknown_eviction_policy(self):
+        with self.assertRaises(ValueError):
+            StatsCache(eviction_policy="random")
@@ -0,0 +1,125 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from app.data_structures.segment_tree import SegmentTree
+from app.services.exceptions import TradingStatisticsServiceIngestQueueFullException, TradingStatisticsServiceSymbolNotFoundException
+from app.services.ingest import IngestQueue
+from app.services.trading_statistics import TradingStatisticsService
+
+
+class TestIngestQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.service = TradingStatisticsService(SegmentTree)
+        self.queue = None
+
+    def tearDown(self):
+        if self.queue is not None:
+            self.queue.close()
+
+    def blocked_queue(self, **kwargs):
+        """Returns a queue whose writer is blocked on its first add_batch until `release` is set."""
+        release = threading.Event()
+        add_batch = self.service.add_batch
+
+        def slow_add_batch(symbol, values):
+            release.wait()
+            add_batch(symbol, values)
+
+        service = MagicMock(wraps=self.service)
+        service.add_batch.side_effect = slow_add_batch
+        self.queue = IngestQueue(service, **kwargs)
+        return service, release
+
+    def wait_until_blocked(self):
+        """Waits until the writer picked up the batches submitted so far and is blocked on them."""
+        while self.queue.metrics()["pending_batches"]:
+            time.sleep(0.001)
+
+    def test_batches_are_applied_after_flush(self):
+        self.queue = IngestQueue(self.service)
+
+        self.queue.submit("AAPL", [1.0, 2.0])
+        self.queue.submit("AAPL", [3.0])
+
+        self.assertTrue(self.queue.flush(timeout=5))
+        self.assertEqual(self.service.get_stats("AAPL", 1)["last"], 3.0)
+        self.assertEqual(self.service.get_stats("AAPL", 1)["avg"], 2.0)
+
+    def test_submit_rejects_nested_values(self):
+        self.queue = IngestQueue(self.service)
+
+        with self.assertRaises(ValueError):
+            self.queue.submit("AAPL", [[1.0, 2.0], [3.0, 4.0]])
+
+        self.assertEqual(self.queue.metrics()["pending_batches"], 0)
+
+    def test_pending_batches_of_a_symbol_are_coalesced(self):
+        service, release = self.blocked_queue()
+        self.queue.submit("GOOG", [0.0])
+        self.wait_until_blocked()
+
+        for i in range(50):
+            self.queue.submit("AAPL", [float(i)])
+        self.queue.submit("MSFT", [10.0])
+        release.set()
+
+        self.assertTrue(self.queue.flush(timeout=5))
+        self.assertEqual(service.add_batch.call_count, 3)
+        self.assertEqual(list(self.service.data_storage["AAPL"].get_data()), [float(i) for i in range(50)])
+
+        metrics = self.queue.metrics()
+        self.assertEqual(metrics["applied_batches"], 52)
+        self.assertEqual(metrics["append_calls"], 3)
+        self.assertEqual(metrics["coalescing_ratio"], 17.33)
+
+    def test_coalesced_batches_are_bounded(self):
+        service, release = self.blocked_queue(max_coalesced_values=10)
+        self.queue.submit("GOOG", [0.0])
+        self.wait_until_blocked()
+
+        for _ in range(5):
+            self.queue.submit("AAPL", [1.0] * 4)
+        release.set()
+
+        self.assertTrue(self.queue.flush(timeout=5))
+        self.assertEqual([len(call.args[1]) for call in service.add_batch.call_args_list[1:]], [8, 8, 4])
+
+    def test_submit_rejects_batches_when_full(self):
+        _, release = self.blocked_queue(max_pending_batches=2)
+        self.queue.submit("GOOG", [0.0])
+        self.wait_until_blocked()
+
+        self.queue.submit("AAPL", [1.0])
+        self.queue.submit("AAPL", [2.0])
+        with self.assertRaises(TradingStatisticsServiceIngestQueueFullException):
+            self.queue.submit("AAPL", [3.0])
+
+        self.assertEqual(self.queue.metrics()["pending_batches"], 2)
+        release.set()
+        self.assertTrue(self.queue.flush(timeout=5))
+        self.queue.submit("AAPL", [3.0])
+
+    def test_failed_batches_are_counted(self):
+        self.service.MAX_SYMBOLS_NUMBER = 1
+        self.queue = IngestQueue(self.service)
+
+        self.queue.submit("AAPL", [1.0])
+        self.queue.flush(timeout=5)
+        self.queue.submit("GOOG", [1.0])
+        self.queue.submit("GOOG", [2.0])
+
+        self.assertTrue(self.queue.flush(timeout=5))
+        self.assertEqual(self.queue.metrics()["failed_batches"], 2)
+        with self.assertRaises(TradingStatisticsServiceSymbolNotFoundException):
+            self.service.get_stats("GOOG", 1)
+
+    def test_flush_times_out(self):
+        _, release = self.blocked_queue()
+        self.queue.submit("AAPL", [1.0])
+
+        self.assertFalse(self.queue.flush(timeout=0.05))
+        release.set()
+        self.assertTrue(self.queue.flush(timeout=5))
@@ -0,0 +1,68 @@
+import threading
+import time
+import unittest
+
+from app.services.locks import ReadWriteLock
+
+
+class TestReadWriteLock(unittest.TestCase):
+
+    def test_readers_share_the_lock(self):
+        lock = ReadWriteLock()
+        both_reading = threading.Barrier(2, timeout=5)
+
+        def read():
+            with lock.read():
+                both_reading.wait()
+
+        threads = [threading.Thread(target=read) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertFalse(both_reading.broken)
+
+    def test_writer_excludes_readers(self):
+        lock = ReadWriteLock()
+        events = []
+
+        def read():
+            with lock.read():
+                events.append("read")
+
+        with lock.write():
+            reader = threading.Thread(target=read)
+            reader.start()
+            time.sleep(0.05)
+            events.append("write")
+
+        reader.join()
+
+        self.assertEqual(events, ["write", "read"])
+
+    def test_waiting_writer_blocks_new_readers(self):
+        lock = ReadWriteLock()
+        events = []
+
+        def write():
+            with lock.write():
+                events.append("write")
+
+        def read():
+            with lock.read():
+                events.append("read")
+
+        with lock.read():
+            writer = threading.Thread(target=write)
+            writer.start()
+            time.sleep(0.05)
+            reader = threading.Thread(target=read)
+            reader.start()
+            time.sleep(0.05)
+            events.append("first read")
+
+        writer.join()
+        reader.join()
+
+        self.assertEqual(events, ["first read", "write", "read"])
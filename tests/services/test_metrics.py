@@ -0,0 +1,92 @@
+import unittest
+
+from app.data_structures.array_segment_tree import ArraySegmentTree
+from app.data_structures.rolling_windows import RollingWindows
+from app.data_structures.segment_tree import SegmentTree
+from app.services.metrics import Counter, EngineMetrics, Gauge, Histogram, MetricsRegistry, engine_memory_bytes
+from app.services.trading_statistics import TradingStatisticsService
+
+
+class TestMetricsRegistry(unittest.TestCase):
+
+    def test_render(self):
+        registry = MetricsRegistry()
+        counter = registry.register(Counter("requests_total", "Requests.", ("path",)))
+        histogram = registry.register(Histogram("latency_seconds", "Latency.", ("path",), buckets=(0.1, 1.0)))
+        registry.register(Gauge("memory_bytes", "Memory.", (), lambda: {(): 42}))
+
+        counter.inc(1, 'a"b')
+        counter.inc(2, 'a"b')
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value, "/x")
+
+        self.assertEqual(registry.render().splitlines(), [
+            "# HELP requests_total Requests.",
+            "# TYPE requests_total counter",
+            'requests_total{path="a\\"b"} 3',
+            "# HELP latency_seconds Latency.",
+            "# TYPE latency_seconds histogram",
+            'latency_seconds_bucket{path="/x",le="0.1"} 2',
+            'latency_seconds_bucket{path="/x",le="1.0"} 3',
+            'latency_seconds_bucket{path="/x",le="+Inf"} 4',
+            'latency_seconds_sum{path="/x"} 3.65',
+            'latency_seconds_count{path="/x"} 4',
+            "# HELP memory_bytes Memory.",
+            "# TYPE memory_bytes gauge",
+            "memory_bytes 42",
+        ])
+
+
+class TestEngineMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = EngineMetrics(MetricsRegistry())
+
+    def operation_counts(self):
+        return {labels: sum(counts) for labels, counts in self.metrics.operation_seconds.counts.items()}
+
+    def test_instrumented_engine(self):
+        engine = self.metrics.instrument(SegmentTree(capacity=10, max_window_size=100), "AAPL")
+
+        engine.build([1.0] * 50)
+        engine.append_data([2.0] * 80)
+        engine.query(1)
+
+        counts = self.operation_counts()
+        self.assertEqual(counts[("SegmentTree", "build")], 1)
+        self.assertEqual(counts[("SegmentTree", "append_data")], 1)
+        # Called by the engine itself
+        self.assertEqual(counts[("SegmentTree", "remove_old_data")], 1)
+        self.assertGreaterEqual(counts[("SegmentTree", "_resize")], 1)
+        self.assertEqual(self.metrics.points_ingested.values[("AAPL",)], 130)
+        self.assertEqual(self.metrics.points_evicted.values[("AAPL",)], 30)
+        self.assertEqual(self.metrics.resizes.values[("AAPL",)], counts[("SegmentTree", "_resize")])
+
+    def test_evictions_of_engines_without_remove_old_data(self):
+        engine = self.metrics.instrument(RollingWindows(max_window_size=100), "AAPL")
+
+        engine.build([1.0] * 90)
+        engine.append_data([2.0] * 20)
+
+        self.assertEqual(self.metrics.points_evicted.values[("AAPL",)], 10)
+
+    def test_service_instruments_its_engines(self):
+        service = TradingStatisticsService(ArraySegmentTree, engine_metrics=self.metrics)
+
+        service.add_batch("AAPL", [1.0, 2.0])
+        service.get_stats_many("AAPL", [1])
+
+        self.assertEqual(self.metrics.points_ingested.values[("AAPL",)], 2)
+        self.assertIn(("ArraySegmentTree", "query_many"), self.operation_counts())
+        self.assertGreater(service.get_memory_usage()["AAPL"], 0)
+
+
+class TestEngineMemoryBytes(unittest.TestCase):
+
+    def test_memory_grows_with_the_data(self):
+        for engine_class in (SegmentTree, ArraySegmentTree, RollingWindows):
+            small, large = engine_class(max_window_size=10 ** 5), engine_class(max_window_size=10 ** 5)
+            small.build([1.0] * 100)
+            large.build([1.0] * 10 ** 4)
+
+            self.assertGreater(engine_memory_bytes(large), engine_memory_bytes(small), engine_class)
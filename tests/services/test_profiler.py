@@ -0,0 +1,36 @@
+import threading
+import time
+import unittest
+
+from app.services.profiler import SamplingProfiler
+
+
+def busy_function(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+class TestSamplingProfiler(unittest.TestCase):
+
+    def test_samples_the_stacks_of_other_threads(self):
+        stop = threading.Event()
+        worker = threading.Thread(target=busy_function, args=(stop,))
+        worker.start()
+
+        profiler = SamplingProfiler(interval_seconds=0.001)
+        profiler.start()
+        self.assertTrue(profiler.running)
+        time.sleep(0.2)
+        profiler.stop()
+        stop.set()
+        worker.join()
+
+        lines = profiler.dump(reset=True).splitlines()
+        self.assertFalse(profiler.running)
+        self.assertTrue(any("busy_function" in line.split(";")[-1] for line in lines))
+        self.assertFalse(any(";_sample (" in line for line in lines))
+
+        stack, count = lines[0].rsplit(" ", 1)
+        self.assertGreater(int(count), 0)
+        self.assertIn(";", stack)
+        self.assertEqual(profiler.dump(), "")
@@ -0,0 +1,108 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+
+from app.data_structures.segment_tree import SegmentTree
+from app.services.exceptions import (
+    TradingStatisticsServiceSymbolNotFoundException,
+    TradingStatisticsServiceSymbolsLimitReachedException,
+    TradingStatisticsServiceTimestampsException,
+)
+from app.services.sharding import ShardedTradingStatisticsService, shard_snapshot_path
+from app.services.trading_statistics import TradingStatisticsService
+
+
+class TestShardedTradingStatisticsService(unittest.TestCase):
+
+    def setUp(self):
+        self.service = ShardedTradingStatisticsService(data_engine=SegmentTree, shard_count=3)
+
+    def tearDown(self):
+        self.service.close()
+
+    def test_symbols_are_spread_across_shards(self):
+        shards = {self.service._shard_of(f"SYM{i}").index for i in range(30)}
+
+        self.assertEqual(shards, {0, 1, 2})
+
+    def test_matches_single_process_service(self):
+        reference = TradingStatisticsService(data_engine=SegmentTree)
+
+        for i in range(10):
+            for symbol in ("AAPL", "GOOG", "MSFT", "TSLA"):
+                values = [float((i * 7 + j) % 13) for j in range(1, 6 + len(symbol) + i)]
+                self.service.add_batch(symbol, values)
+                reference.add_batch(symbol, values)
+
+        for symbol in ("AAPL", "GOOG", "MSFT", "TSLA"):
+            self.assertEqual(self.service.get_version(symbol), reference.get_version(symbol))
+            for k in range(1, 4):
+                self.assertEqual(self.service.get_stats(symbol, k), reference.get_stats(symbol, k))
+            self.assertEqual(self.service.get_stats_many(symbol, [1, 2]), reference.get_stats_many(symbol, [1, 2]))
+            self.assertEqual(self.service.get_stats_series(symbol, 5, 10, 2), reference.get_stats_series(symbol, 5, 10, 2))
+
+    def test_get_stats_in_time_range(self):
+        self.service.add_batch("AAPL", [1.0, 2.0, 3.0], [10.0, 20.0, 30.0])
+
+        stats = self.service.get_stats_in_time_range("AAPL", 15.0, 30.0)
+
+        self.assertEqual((stats["min"], stats["max"], stats["count"]), (2.0, 3.0, 2))
+
+    def test_get_stats_symbol_not_found(self):
+        with self.assertRaises(TradingStatisticsServiceSymbolNotFoundException):
+            self.service.get_stats("AAPL", 1)
+
+    def test_symbols_limit_is_enforced_across_shards(self):
+        self.service.MAX_SYMBOLS_NUMBER = 4
+
+        for i in range(4):
+            self.service.add_batch(f"SYM{i}", [1.0])
+
+        with self.assertRaises(TradingStatisticsServiceSymbolsLimitReachedException):
+            self.service.add_batch("SYM4", [1.0])
+        self.service.add_batch("SYM0", [2.0])
+
+    def test_rejected_first_batch_releases_symbol(self):
+        self.service.MAX_SYMBOLS_NUMBER = 2
+        self.service.add_batch("SYM0", [1.0])
+
+        with self.assertRaises(TradingStatisticsServiceTimestampsException):
+            self.service.add_batch("SYM1", [1.0, 2.0], [10.0])
+        with self.assertRaises(TradingStatisticsServiceSymbolNotFoundException):
+            self.service.get_stats("SYM1", 1)
+        with self.assertRaises(Exception):
+            self.service.add_batches([("SYM2", ["invalid_data"])])
+
+        self.service.add_batch("SYM3", [1.0])
+        self.assertEqual(self.service.get_stats("SYM3", 1)["last"], 1.0)
+
+    def test_add_batches_and_get_stats_batch(self):
+        self.service.MAX_SYMBOLS_NUMBER = 5
+        batches = [(f"SYM{i % 6}", [float(i), float(i + 1)]) for i in range(12)]
+
+        errors = self.service.add_batches(batches)
+
+        self.assertEqual([error is None for error in errors], [True] * 5 + [False] + [True] * 5 + [False])
+        self.assertIsInstance(errors[5], TradingStatisticsServiceSymbolsLimitReachedException)
+
+        results = self.service.get_stats_batch([("SYM0", 1), ("SYM5", 1), ("SYM4", 1)])
+
+        self.assertEqual(results[0], {"min": 0.0, "max": 7.0, "last": 7.0, "avg": 3.5, "var": 9.25})
+        self.assertIsInstance(results[1], TradingStatisticsServiceSymbolNotFoundException)
+        self.assertEqual(results[2]["last"], 11.0)
+
+    def test_snapshot_restored_by_every_shard(self):
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, "snapshot.bin")
+            for i in range(6):
+                self.service.add_batch(f"SYM{i}", [float(i), float(i * 2)])
+
+            self.assertEqual(self.service.save_snapshot(path), 6)
+            self.assertTrue(all(os.path.exists(shard_snapshot_path(path, shard)) for shard in range(3)))
+
+            restored = ShardedTradingStatisticsService(data_engine=SegmentTree, shard_count=3, snapshot_path=path)
+            try:
+                self.assertEqual(restored.symbols, {f"SYM{i}" for i in range(6)})
+                self.assertEqual(restored.get_stats("SYM5", 1), self.service.get_stats("SYM5", 1))
+            finally:
+                restored.close()
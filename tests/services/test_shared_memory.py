@@ -0,0 +1,118 @@
+import os
+import secrets
+import subprocess
+import sys
+import time
+import unittest
+from multiprocessing import shared_memory
+from multiprocessing.connection import Client
+from tempfile import TemporaryDirectory
+
+from app.data_structures.segment_tree import SegmentTree
+from app.services.exceptions import TradingStatisticsServiceException, TradingStatisticsServiceSymbolNotFoundException, TradingStatisticsServiceSymbolsLimitReachedException
+from app.services.shared_memory import SharedMemoryTradingStatisticsService
+from app.services.trading_statistics import TradingStatisticsService
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class TestSharedMemoryTradingStatisticsService(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.address = os.path.join(self.directory.name, "writer.sock")
+        self.namespace = f"tp-test-{secrets.token_hex(4)}"
+        self.writer = self.start_writer()
+
+    def tearDown(self):
+        self.stop_writer()
+        shared_memory.SharedMemory(name=self.namespace).unlink()
+        self.directory.cleanup()
+
+    def start_writer(self, **environment):
+        environment = {**os.environ, "WRITER_ADDRESS": self.address, "SHARED_MEMORY_NAMESPACE": self.namespace, **environment}
+        writer = subprocess.Popen([sys.executable, "writer.py"], cwd=ROOT, env=environment)
+
+        deadline = time.monotonic() + 20
+        while True:
+            try:
+                Client(self.address, family="AF_UNIX").close()
+                return writer
+            except OSError:
+                self.assertIsNone(writer.poll())
+                self.assertLess(time.monotonic(), deadline)
+                time.sleep(0.05)
+
+    def stop_writer(self):
+        self.writer.terminate()
+        self.writer.wait()
+
+    def service(self):
+        return SharedMemoryTradingStatisticsService(self.address, self.namespace)
+
+    def test_every_process_reads_the_writer_data(self):
+        reference = TradingStatisticsService(SegmentTree)
+        service = self.service()
+
+        for i in range(20):
+            values = [float((i * 7 + j) % 11) for j in range(i + 1)]
+            service.add_batch("AAPL", values)
+            reference.add_batch("AAPL", values)
+
+        # Another API process attaches to the same data
+        other = self.service()
+        for k in range(1, 4):
+            self.assertEqual(other.get_stats("AAPL", k), reference.get_stats("AAPL", k))
+        self.assertEqual(other.get_version("AAPL"), 20)
+        self.assertEqual(other.get_stats_many("AAPL", [1, 2]), reference.get_stats_many("AAPL", [1, 2]))
+        self.assertEqual(other.get_stats_series("AAPL", 7, 20, 3), reference.get_stats_series("AAPL", 7, 20, 3))
+
+    def test_get_stats_symbol_not_found(self):
+        with self.assertRaises(TradingStatisticsServiceSymbolNotFoundException):
+            self.service().get_stats("AAPL", 1)
+
+    def test_writer_errors_are_raised(self):
+        service = self.service()
+        for i in range(TradingStatisticsService.MAX_SYMBOLS_NUMBER):
+            service.add_batch(f"SYM{i}", [1.0])
+
+        with self.assertRaises(TradingStatisticsServiceSymbolsLimitReachedException):
+            service.add_batch("AAPL", [1.0])
+
+        errors = service.add_batches([("SYM0", [2.0]), ("AAPL", [1.0])])
+        self.assertIsNone(errors[0])
+        self.assertIsInstance(errors[1], TradingStatisticsServiceSymbolsLimitReachedException)
+
+        results = service.get_stats_batch([("SYM0", 1), ("AAPL", 1)])
+        self.assertEqual(results[0]["last"], 2.0)
+        self.assertIsInstance(results[1], TradingStatisticsServiceSymbolNotFoundException)
+
+    def test_compact_storage_is_not_available(self):
+        with self.assertRaises(TradingStatisticsServiceException):
+            self.service().add_batch("AAPL", [1.0], compact=True)
+
+    def test_restarted_writer_restores_its_snapshot(self):
+        path = os.path.join(self.directory.name, "snapshot.bin")
+        service = self.service()
+        service.add_batch("AAPL", [1.0, 2.0, 3.0])
+        service.add_batch("GOOG", [4.0])
+        old_instance_id = service.instance_id
+
+        self.assertEqual(service.save_snapshot(path), 2)
+        self.stop_writer()
+
+        with self.assertRaises(TradingStatisticsServiceException):
+            service.add_batch("AAPL", [4.0])
+
+        self.writer = self.start_writer(SNAPSHOT_PATH=path)
+
+        self.assertNotEqual(service.instance_id, old_instance_id)
+        self.assertEqual(service.get_stats("AAPL", 1)["last"], 3.0)
+        service.add_batch("AAPL", [4.0])
+        self.assertEqual(service.get_stats("AAPL", 1)["avg"], 2.5)
+
+    def test_writer_does_not_load_the_api(self):
+        # The views would restore a second service and open the write-ahead log in the writer
+        check = "import sys, writer; sys.exit('app.application' in sys.modules or 'app.api.views.trading_statistics' in sys.modules)"
+
+        self.assertEqual(subprocess.run([sys.executable, "-c", check], cwd=ROOT).returncode, 0)
@@ -0,0 +1,134 @@
+import threading
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import numpy as np
+
+from app.data_structures.array_segment_tree import ArraySegmentTree
+from app.data_structures.compact_segment_tree import CompactArraySegmentTree
+from app.data_structures.segment_tree import SegmentTree
+from app.services.exceptions import TradingStatisticsServiceSymbolNotFoundException
+from app.services.snapshots import (
+    FLAG_COMPACT,
+    LEGACY_ENTRY,
+    LEGACY_SNAPSHOT_MAGIC,
+    HEADER,
+    NAME_LENGTH,
+    SnapshotScheduler,
+    read_snapshot,
+    write_snapshot,
+)
+from app.services.trading_statistics import TradingStatisticsService
+
+
+class TestSnapshots(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.path = str(Path(self.directory.name) / "snapshot.bin")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_write_and_read_snapshot(self):
+        count = write_snapshot(self.path, [("AAPL", 3, [1.5, 2.5, 3.5], 0), ("€URO", 1, [], 0), ("GOOG", 7, np.arange(5.0), FLAG_COMPACT)])
+
+        mapping, symbols = read_snapshot(self.path)
+
+        self.assertEqual(count, 3)
+        self.assertEqual(symbols["AAPL"][0], 3)
+        self.assertEqual(list(symbols["AAPL"][1]), [1.5, 2.5, 3.5])
+        self.assertEqual(len(symbols["€URO"][1]), 0)
+        self.assertEqual(list(symbols["GOOG"][1]), [0, 1, 2, 3, 4])
+        self.assertFalse(symbols["GOOG"][1].flags.writeable)
+        self.assertEqual(symbols["GOOG"][2], FLAG_COMPACT)
+
+        del symbols
+        mapping.close()
+
+    def test_read_legacy_snapshot(self):
+        index_size = HEADER.size + NAME_LENGTH.size + 4 + LEGACY_ENTRY.size
+        offset = index_size + (-index_size) % 8
+        Path(self.path).write_bytes(
+            HEADER.pack(LEGACY_SNAPSHOT_MAGIC, 1) + NAME_LENGTH.pack(4) + b"AAPL" + LEGACY_ENTRY.pack(2, offset, 2)
+            + b"\0" * ((-index_size) % 8) + np.array([1.0, 2.0], dtype="<f8").tobytes()
+        )
+
+        mapping, symbols = read_snapshot(self.path)
+
+        self.assertEqual(symbols["AAPL"][0], 2)
+        self.assertEqual(list(symbols["AAPL"][1]), [1.0, 2.0])
+        self.assertEqual(symbols["AAPL"][2], 0)
+
+        del symbols
+        mapping.close()
+
+    def test_read_invalid_snapshot(self):
+        Path(self.path).write_bytes(b"not a snapshot")
+
+        with self.assertRaises(ValueError):
+            read_snapshot(self.path)
+
+    def test_service_restores_snapshot_lazily(self):
+        service = TradingStatisticsService(SegmentTree)
+        service.add_batch("AAPL", [1, 2, 3, 4, 5])
+        service.add_batch("AAPL", [6])
+        service.add_batch("GOOG", [10, 20])
+        expected = service.get_stats("AAPL", 1)
+
+        service.save_snapshot(self.path)
+
+        restored = TradingStatisticsService(ArraySegmentTree)
+        restored.load_snapshot(self.path)
+
+        self.assertEqual(restored.data_storage, {})
+        self.assertEqual(restored.get_version("AAPL"), 2)
+        self.assertEqual(restored.get_stats("AAPL", 1), expected)
+        self.assertIn("AAPL", restored.data_storage)
+        self.assertNotIn("GOOG", restored.data_storage)
+
+        restored.add_batch("GOOG", [30])
+
+        self.assertEqual(restored.get_stats("GOOG", 1)["avg"], 20)
+        self.assertEqual(restored.get_version("GOOG"), 2)
+
+        with self.assertRaises(TradingStatisticsServiceSymbolNotFoundException):
+            restored.get_stats("AMZN", 1)
+
+    def test_snapshot_keeps_pending_symbols(self):
+        service = TradingStatisticsService(SegmentTree)
+        service.add_batch("AAPL", [1, 2, 3])
+        service.save_snapshot(self.path)
+
+        restored = TradingStatisticsService(SegmentTree)
+        restored.load_snapshot(self.path)
+        restored.save_snapshot(self.path)
+
+        _, symbols = read_snapshot(self.path)
+
+        self.assertEqual(list(symbols["AAPL"][1]), [1, 2, 3])
+
+    def test_snapshot_keeps_compact_storage(self):
+        service = TradingStatisticsService(SegmentTree)
+        service.add_batch("AAPL", [1, 2, 3], compact=True)
+        service.add_batch("GOOG", [10, 20])
+        service.save_snapshot(self.path)
+
+        restored = TradingStatisticsService(SegmentTree)
+        restored.load_snapshot(self.path)
+
+        self.assertEqual(restored.compact_symbols, {"AAPL"})
+        self.assertIsInstance(restored._new_engine("AAPL"), CompactArraySegmentTree)
+        self.assertIsInstance(restored._new_engine("GOOG"), SegmentTree)
+        self.assertEqual(restored.get_stats("AAPL", 1)["avg"], 2)
+        self.assertIsInstance(restored.data_storage["AAPL"], CompactArraySegmentTree)
+
+    def test_scheduler(self):
+        taken = threading.Event()
+
+        scheduler = SnapshotScheduler(taken.set, interval_seconds=0.01)
+        scheduler.start()
+
+        self.assertTrue(taken.wait(timeout=5))
+        scheduler.stop()
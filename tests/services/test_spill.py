@@ -0,0 +1,166 @@
+import threading
+import unittest
+from tempfile import TemporaryDirectory
+
+import numpy as np
+
+from app.data_structures.array_segment_tree import ArraySegmentTree
+from app.data_structures.compact_segment_tree import CompactArraySegmentTree
+from app.services.exceptions import TradingStatisticsServiceException
+from app.services.metrics import engine_memory_bytes
+from app.services.spill import SpillStore
+from app.services.trading_statistics import TradingStatisticsService
+
+
+class TestSpillStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.store = SpillStore(100, self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_victims_least_recently_used_first(self):
+        self.store.touch("AAPL", 40)
+        self.store.touch("GOOG", 40)
+        self.store.touch("MSFT", 40)
+        self.store.touch("AAPL")
+
+        victims = []
+        for victim in self.store.victims(exclude="MSFT"):
+            victims.append(victim)
+            self.store.forget(victim)
+
+        self.assertEqual(victims, ["GOOG"])
+        self.assertEqual(self.store.stats()["memory_bytes"], 80)
+
+    def test_victims_within_budget(self):
+        self.store.touch("AAPL", 60)
+
+        self.assertEqual(list(self.store.victims(exclude="GOOG")), [])
+
+    def test_spill_and_reload(self):
+        self.store.touch("AAPL", 800, hit=False)
+
+        values = self.store.spill("AAPL", 3, np.arange(100.0))
+
+        np.testing.assert_array_equal(values, np.arange(100.0))
+        stats = self.store.stats()
+        self.assertEqual(stats["memory_bytes"], 0)
+        self.assertEqual(stats["symbols_in_memory"], 0)
+        self.assertEqual(stats["symbols_spilled"], 1)
+        self.assertEqual(stats["spills"], 1)
+
+        del values
+        self.store.reloaded("AAPL", 0.001)
+
+        stats = self.store.stats()
+        self.assertEqual(stats["symbols_spilled"], 0)
+        self.assertEqual(stats["reloads"], 1)
+        self.assertEqual(stats["average_reload_ms"], 1.0)
+
+    def test_hit_ratio(self):
+        self.store.touch("AAPL", 10, hit=None)
+        self.store.touch("AAPL")
+        self.store.touch("AAPL")
+        self.store.touch("AAPL", hit=False)
+
+        stats = self.store.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 1))
+        self.assertEqual(stats["hit_ratio"], 0.6667)
+
+
+class TestTradingStatisticsServiceMemoryBudget(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        engine = ArraySegmentTree()
+        engine.build(np.arange(1000.0))
+        # Room for about two symbols of 1000 values
+        self.service = TradingStatisticsService(
+            ArraySegmentTree, memory_budget_bytes=int(2.5 * engine_memory_bytes(engine)), spill_directory=self.directory.name)
+        self.reference = TradingStatisticsService(ArraySegmentTree)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def add_batch(self, symbol, values):
+        self.service.add_batch(symbol, values)
+        self.reference.add_batch(symbol, values)
+
+    def test_spills_least_recently_used_symbols(self):
+        for i, symbol in enumerate(["AAPL", "GOOG", "MSFT"]):
+            self.add_batch(symbol, np.arange(1000.0) + i)
+
+        self.assertNotIn("AAPL", self.service.data_storage)
+        self.assertIn("AAPL", self.service.pending_restores)
+        self.assertEqual(self.service.get_memory_stats()["symbols_spilled"], 1)
+
+        # Reading AAPL brings it back, spilling GOOG which is now the least recently used
+        self.assertEqual(self.service.get_stats("AAPL", 3), self.reference.get_stats("AAPL", 3))
+        self.assertIn("AAPL", self.service.data_storage)
+        self.assertNotIn("GOOG", self.service.data_storage)
+
+        stats = self.service.get_memory_stats()
+        self.assertEqual(stats["spills"], 2)
+        self.assertEqual(stats["reloads"], 1)
+        self.assertLessEqual(stats["memory_bytes"], stats["memory_budget_bytes"])
+
+    def test_spilled_symbols_keep_their_data(self):
+        for i in range(6):
+            self.add_batch(f"SYM{i}", np.random.default_rng(i).random(1500))
+        for i in range(6):
+            self.add_batch(f"SYM{i}", np.random.default_rng(10 + i).random(300))
+
+        for i in range(6):
+            for k in range(1, 5):
+                self.assertEqual(self.service.get_stats(f"SYM{i}", k), self.reference.get_stats(f"SYM{i}", k))
+            self.assertEqual(self.service.get_stats_many(f"SYM{i}", [1, 2]), self.reference.get_stats_many(f"SYM{i}", [1, 2]))
+
+    def test_spilled_symbols_keep_compact_storage(self):
+        self.service.add_batch("AAPL", np.arange(1000.0), compact=True)
+        for symbol in ("GOOG", "MSFT", "TSLA"):
+            self.add_batch(symbol, np.arange(1000.0))
+        self.assertIn("AAPL", self.service.pending_restores)
+
+        self.service.add_batch("AAPL", [1000.0])
+
+        self.assertIsInstance(self.service.data_storage["AAPL"], CompactArraySegmentTree)
+        self.assertEqual(self.service.get_stats("AAPL", 3)["min"], 1.0)
+
+    def test_no_symbols_limit(self):
+        for i in range(TradingStatisticsService.MAX_SYMBOLS_NUMBER + 5):
+            self.service.add_batch(f"SYM{i}", [1.0, 2.0, 3.0])
+
+        self.assertEqual(len(self.service.versions), TradingStatisticsService.MAX_SYMBOLS_NUMBER + 5)
+
+    def test_concurrent_access(self):
+        symbols = [f"SYM{i}" for i in range(5)]
+        for symbol in symbols:
+            self.add_batch(symbol, np.arange(1000.0))
+
+        errors = []
+
+        def read(symbol):
+            try:
+                for _ in range(20):
+                    self.assertEqual(self.service.get_stats(symbol, 2)["last"], 999.0)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=read, args=(symbol,)) for symbol in symbols * 2]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+
+    def test_memory_stats_without_budget(self):
+        with self.assertRaises(TradingStatisticsServiceException):
+            self.reference.get_memory_stats()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+import json
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+from app.data_structures.segment_tree import SegmentTree
+from app.services.streaming import StreamIngestor, read_ahead, read_frames
+from app.services.trading_statistics import TradingStatisticsService
+
+
+def frame(symbol, values):
+    return json.dumps({"symbol": symbol, "values": values}).encode() + b"\n"
+
+
+class TestReadFrames(unittest.TestCase):
+
+    def test_frames_split_across_chunks(self):
+        first = frame("AAPL", [1.0, 2.0])
+        stream = first + frame("GOOG", [3.0]) + frame("AAPL", [4.0])
+        chunks = [stream[:7], stream[7:len(first) + 3], stream[len(first) + 3:]]
+
+        parsed = list(read_frames(chunks))
+
+        self.assertEqual([len(frames) for frames in parsed], [0, 1, 2])
+        self.assertEqual([(symbol, list(values)) for frames in parsed for symbol, values, _ in frames], [("AAPL", [1.0, 2.0]), ("GOOG", [3.0]), ("AAPL", [4.0])])
+
+    def test_last_frame_without_newline(self):
+        parsed = list(read_frames([b'{"symbol": "AAPL", "values": [1]}']))
+
+        self.assertEqual(parsed[-1][0][0], "AAPL")
+
+    def test_invalid_frames(self):
+        chunks = [
+            b'not json\n{"symbol": "AAPL"}\n{"symbol": "AAPL", "values": ["a"]}\n',
+            frame("AAPL", [[1, 2], [3, 4]]),
+            frame("AAPL", [1.0, True]),
+            frame("AAPL", [1.0] * 3),
+        ]
+
+        parsed = [frames for frames in read_frames(chunks, max_frame_values=2) for frames in frames]
+
+        self.assertEqual(len(parsed), 6)
+        self.assertTrue(all(symbol is None and error for symbol, _, error in parsed))
+
+
+class TestReadAhead(unittest.TestCase):
+
+    def test_chunks_received_meanwhile_are_joined(self):
+        consumed = threading.Event()
+
+        def chunks():
+            yield b"a"
+            consumed.wait()
+            yield b"b"
+            yield b"c"
+
+        received = read_ahead(chunks())
+        self.assertEqual(next(received), b"a")
+
+        consumed.set()
+        rest = list(received)
+        self.assertEqual(b"".join(rest), b"bc")
+
+    def test_reader_errors_are_raised(self):
+        def chunks():
+            yield b"a"
+            raise OSError("Connection reset")
+
+        with self.assertRaises(OSError):
+            list(read_ahead(chunks()))
+
+
+class TestStreamIngestor(unittest.TestCase):
+
+    def setUp(self):
+        self.service = TradingStatisticsService(SegmentTree)
+        self.applied = threading.Event()
+
+    def paced(self, chunks):
+        """Sends every chunk once the previous one is applied, so that no two chunks are received together."""
+        for chunk in chunks:
+            yield chunk
+            self.applied.wait()
+            self.applied.clear()
+
+    def wrapped_service(self):
+        service = MagicMock(wraps=self.service)
+        service.add_batch.side_effect = lambda symbol, values: (self.service.add_batch(symbol, values), self.applied.set())
+        return service
+
+    def test_frames_received_together_are_applied_together(self):
+        service = self.wrapped_service()
+        ingestor = StreamIngestor(service, ack_interval_seconds=0)
+        chunks = [frame("AAPL", [1.0]) + frame("AAPL", [2.0]) + frame("GOOG", [5.0]), frame("AAPL", [3.0])]
+
+        acks = list(ingestor.ingest(self.paced(chunks)))
+
+        self.assertEqual(service.add_batch.call_count, 3)
+        self.assertEqual(list(self.service.data_storage["AAPL"].get_data()), [1.0, 2.0, 3.0])
+        self.assertEqual(acks[-1], {"frames": 4, "values": 4, "errors": [], "done": True})
+
+    def test_micro_batches_are_bounded(self):
+        service = MagicMock(wraps=self.service)
+        ingestor = StreamIngestor(service, max_micro_batch_values=4)
+
+        list(ingestor.ingest([b"".join(frame("AAPL", [1.0, 2.0]) for _ in range(5))]))
+
+        self.assertEqual([len(call.args[1]) for call in service.add_batch.call_args_list], [4, 4, 2])
+
+    def test_acks_are_periodic(self):
+        time = iter(range(100))
+        ingestor = StreamIngestor(self.wrapped_service(), ack_interval_seconds=3, clock=lambda: next(time))
+
+        acks = list(ingestor.ingest(self.paced([frame("AAPL", [float(i)]) for i in range(6)])))
+
+        self.assertEqual([ack["frames"] for ack in acks], [3, 6, 6])
+        self.assertTrue(acks[-1]["done"])
+
+    def test_unexpected_errors_only_drop_their_symbol(self):
+        def add_batch(symbol, values):
+            if symbol == "GOOG":
+                raise ValueError("boom")
+            self.service.add_batch(symbol, values)
+
+        service = MagicMock(wraps=self.service)
+        service.add_batch.side_effect = add_batch
+        ingestor = StreamIngestor(service)
+
+        acks = list(ingestor.ingest([frame("GOOG", [1.0]) + frame("AAPL", [2.0]) + frame("MSFT", [3.0])]))
+
+        self.assertEqual(acks[-1]["frames"], 2)
+        self.assertEqual(acks[-1]["errors"], [{"frames": [1], "symbol": "GOOG", "error": "An unexpected error occurred", "details": "boom"}])
+        self.assertEqual(self.service.get_stats("MSFT", 1)["last"], 3.0)
+
+    def test_errors_are_acknowledged(self):
+        self.service.MAX_SYMBOLS_NUMBER = 1
+        ingestor = StreamIngestor(self.service)
+
+        acks = list(ingestor.ingest([frame("AAPL", [1.0]) + b"oops\n" + frame("GOOG", [2.0])]))
+
+        self.assertEqual(acks[-1]["frames"], 1)
+        self.assertEqual(acks[-1]["errors"][0]["frames"], [2])
+        self.assertEqual(acks[-1]["errors"][1], {"frames": [3], "symbol": "GOOG", "error": "Symbol limit reached. Cannot add GOOG."})
@@ -0,0 +1,107 @@
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+from app.data_structures.segment_tree import SegmentTree
+from app.services.subscriptions import Subscription, SubscriptionHub
+from app.services.trading_statistics import TradingStatisticsService
+
+
+class TestSubscription(unittest.TestCase):
+
+    def test_updates_are_conflated(self):
+        subscription = Subscription("AAPL", [1])
+
+        for version in range(1, 4):
+            subscription.publish({"version": version})
+
+        self.assertEqual(subscription.next_update(timeout=1), {"version": 3})
+        self.assertEqual(subscription.conflated, 2)
+        self.assertIsNone(subscription.next_update(timeout=0.01))
+
+    def test_close_wakes_up_the_client(self):
+        subscription = Subscription("AAPL", [1])
+        threading.Timer(0.05, subscription.close).start()
+
+        self.assertIsNone(subscription.next_update(timeout=5))
+        self.assertTrue(subscription.closed)
+
+
+class TestSubscriptionHub(unittest.TestCase):
+
+    def setUp(self):
+        self.service = TradingStatisticsService(SegmentTree)
+        self.hub = SubscriptionHub(self.service)
+
+    def tearDown(self):
+        self.hub.close()
+
+    def test_subscribe_starts_with_the_current_stats(self):
+        self.service.add_batch("AAPL", [1.0, 2.0, 3.0])
+
+        update = self.hub.subscribe("AAPL", [1, 2]).next_update(timeout=5)
+
+        self.assertEqual(update["version"], 1)
+        self.assertEqual(update["stats"], self.service.get_stats_many("AAPL", [1, 2]))
+
+    def test_subscribe_to_a_new_symbol(self):
+        subscription = self.hub.subscribe("AAPL", [1])
+        self.assertIsNone(subscription.next_update(timeout=0.01))
+
+        self.service.add_batch("AAPL", [1.0, 2.0])
+
+        update = subscription.next_update(timeout=5)
+        self.assertEqual(update["symbol"], "AAPL")
+        self.assertEqual(update["stats"][1]["last"], 2.0)
+
+    def test_stats_are_computed_once_for_all_subscribers(self):
+        self.service.add_batch("AAPL", [1.0])
+        subscriptions = [self.hub.subscribe("AAPL", ks) for ks in ([1], [1, 2], [3])]
+        for subscription in subscriptions:
+            subscription.next_update(timeout=5)
+
+        service = MagicMock(wraps=self.service)
+        self.hub.service = service
+        self.service.add_batch("AAPL", [5.0])
+
+        updates = [subscription.next_update(timeout=5) for subscription in subscriptions]
+
+        service.get_stats_many.assert_called_once()
+        self.assertEqual(sorted(service.get_stats_many.call_args.args[1]), [1, 2, 3])
+        self.assertEqual([sorted(update["stats"]) for update in updates], [[1], [1, 2], [3]])
+        self.assertTrue(all(update["version"] == 2 for update in updates))
+
+    def test_slow_subscriber_gets_the_latest_update(self):
+        subscription = self.hub.subscribe("AAPL", [1])
+        for i in range(20):
+            self.service.add_batch("AAPL", [float(i)])
+
+        # The dispatcher may still be publishing intermediate versions, so wait for the last one
+        update = subscription.next_update(timeout=5)
+        while update["version"] < 20:
+            update = subscription.next_update(timeout=5)
+
+        self.assertEqual(update["stats"][1]["last"], 19.0)
+        self.assertLessEqual(self.hub.computations, 20)
+
+    def test_unsubscribed_symbols_are_not_computed(self):
+        subscription = self.hub.subscribe("AAPL", [1])
+        self.hub.unsubscribe(subscription)
+
+        self.service.add_batch("AAPL", [1.0])
+        self.service.add_batch("GOOG", [1.0])
+
+        self.hub.close()
+        self.assertEqual(self.hub.computations, 0)
+
+    def test_polling_notices_batches_added_elsewhere(self):
+        self.hub.close()
+        # The batches are added to a service the hub does not listen to, as in another process
+        self.service.batch_listeners.clear()
+        self.hub = SubscriptionHub(self.service, poll_interval_seconds=0.01)
+        self.service.batch_listeners.clear()
+        subscription = self.hub.subscribe("AAPL", [1])
+
+        self.service.add_batch("AAPL", [4.0])
+
+        self.assertEqual(subscription.next_update(timeout=5)["stats"][1]["last"], 4.0)
@@ -1,8 +1,14 @@
+import os
+import sys
+import threading
 import unittest
+from tempfile import TemporaryDirectory
 from unittest.mock import MagicMock
+from app.data_structures.compact_segment_tree import CompactArraySegmentTree
 from app.data_structures.exceptions import SegmentTreeCapacityLimitReachedException
+from app.data_structures.quantile_segment_tree import QuantileArraySegmentTree
 from app.data_structures.segment_tree import SegmentTree
-from app.services.exceptions import TradingStatisticsServiceException, TradingStatisticsServiceSymbolDataLimitReachedException, TradingStatisticsServiceSymbolNotFoundException, TradingStatisticsServiceSymbolsLimitReachedException
+from app.services.exceptions import TradingStatisticsServiceException, TradingStatisticsServiceSymbolDataLimitReachedException, TradingStatisticsServiceSymbolNotFoundException, TradingStatisticsServiceSymbolsLimitReachedException, TradingStatisticsServiceTimestampsException
 from app.services.trading_statistics import TradingStatisticsService
 
 class TestTradingStatisticsService(unittest.TestCase):
@@ -10,6 +16,7 @@ class TestTradingStatisticsService(unittest.TestCase):
     def setUp(self):
         self.mock_data_engine = MagicMock()
         self.mock_data_engine.return_value.query.return_value = (1, 10, 5, 2.5, 1)
+        self.mock_data_engine.return_value.query_many.side_effect = lambda ks: [(1, 10, 5, 2.5, k) for k in ks]
         
         self.service = TradingStatisticsService(self.mock_data_engine)
     
@@ -73,5 +80,315 @@ class TestTradingStatisticsService(unittest.TestCase):
         with self.assertRaises(TradingStatisticsServiceSymbolDataLimitReachedException) as context:
             self.service.add_batch(symbol, values)
 
+    def test_add_batches(self):
+        self.service.MAX_SYMBOLS_NUMBER = 1
 
+        errors = self.service.add_batches([("AAPL", [1, 2]), ("AAPL", [3]), ("GOOG", [4])])
 
+        self.assertIsNone(errors[0])
+        self.assertIsNone(errors[1])
+        self.assertIsInstance(errors[2], TradingStatisticsServiceSymbolsLimitReachedException)
+        self.mock_data_engine.return_value.build.assert_called_once_with([1, 2])
+        self.mock_data_engine.return_value.append_data.assert_called_once_with([3])
+
+    def test_get_stats_many(self):
+        self.service.add_batch("AAPL", [100, 200, 300, 400])
+
+        stats = self.service.get_stats_many("AAPL", [2, 1, 2])
+
+        self.mock_data_engine.return_value.query_many.assert_called_once_with([2, 1])
+        self.assertEqual(stats[1]["var"], 1)
+        self.assertEqual(stats[2]["var"], 2)
+
+    def test_get_stats_batch(self):
+        self.service.add_batch("AAPL", [100, 200, 300, 400])
+
+        results = self.service.get_stats_batch([("AAPL", 1), ("GOOG", 1), ("AAPL", 3)])
+
+        self.mock_data_engine.return_value.query_many.assert_called_once_with([1, 3])
+        self.assertEqual(results[0]["var"], 1)
+        self.assertIsInstance(results[1], TradingStatisticsServiceSymbolNotFoundException)
+        self.assertEqual(results[2]["var"], 3)
+
+    def test_get_stats_is_cached_until_next_batch(self):
+        self.service.add_batch("AAPL", [100, 200, 300, 400])
+
+        self.service.get_stats("AAPL", 2)
+        self.service.get_stats("AAPL", 2)
+        self.service.get_stats_many("AAPL", [2])
+
+        self.assertEqual(self.mock_data_engine.return_value.query.call_count, 1)
+        self.mock_data_engine.return_value.query_many.assert_not_called()
+
+        self.service.add_batch("AAPL", [500])
+        self.service.get_stats("AAPL", 2)
+
+        self.assertEqual(self.mock_data_engine.return_value.query.call_count, 2)
+
+    def test_get_version(self):
+        self.service.add_batch("AAPL", [100, 200, 300, 400])
+        self.service.add_batch("AAPL", [500])
+
+        self.assertEqual(self.service.get_version("AAPL"), 2)
+
+        with self.assertRaises(TradingStatisticsServiceSymbolNotFoundException):
+            self.service.get_version("GOOG")
+
+
+class TestTradingStatisticsServiceCompactStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.service = TradingStatisticsService(SegmentTree)
+
+    def test_compact_storage_is_chosen_per_symbol(self):
+        self.service.add_batch("AAPL", [100.1, 99.7, 100.3], compact=True)
+        self.service.add_batch("MSFT", [100.1, 99.7, 100.3])
+
+        self.assertIsInstance(self.service.data_storage["AAPL"], CompactArraySegmentTree)
+        self.assertIsInstance(self.service.data_storage["MSFT"], SegmentTree)
+        self.assertEqual(self.service.get_stats("AAPL", 1), self.service.get_stats("MSFT", 1))
+
+    def test_compact_storage_is_chosen_at_creation(self):
+        self.service.add_batch("AAPL", [1.0])
+        self.service.add_batch("AAPL", [2.0], compact=True)
+
+        self.assertIsInstance(self.service.data_storage["AAPL"], SegmentTree)
+        self.assertEqual(self.service.get_stats("AAPL", 1)["avg"], 1.5)
+
+
+class TestTradingStatisticsServiceQuantiles(unittest.TestCase):
+
+    def test_stats_include_quantiles(self):
+        service = TradingStatisticsService(lambda: QuantileArraySegmentTree(sketch_min_leaves=16))
+        service.add_batch("AAPL", [float(v) for v in range(1, 1001)])
+
+        stats = service.get_stats("AAPL", 2)
+        many = service.get_stats_many("AAPL", [2, 3])
+
+        self.assertEqual(many[2], stats)
+        self.assertAlmostEqual(stats["p50"], 950, delta=9.5)
+        self.assertAlmostEqual(many[3]["p95"], 950, delta=9.5)
+        self.assertAlmostEqual(many[3]["p99"], 990, delta=9.9)
+
+    def test_stats_without_quantiles(self):
+        service = TradingStatisticsService(SegmentTree)
+        service.add_batch("AAPL", [1.0, 2.0])
+
+        self.assertNotIn("p50", service.get_stats("AAPL", 1))
+
+
+class TestTradingStatisticsServiceTimestamps(unittest.TestCase):
+
+    def setUp(self):
+        self.service = TradingStatisticsService(lambda: SegmentTree(capacity=10, max_window_size=100))
+
+    def test_get_stats_in_time_range(self):
+        self.service.add_batch("AAPL", [1.0, 2.0, 3.0], timestamps=[100.0, 160.0, 220.0])
+        self.service.add_batch("AAPL", [4.0, 5.0], timestamps=[280.0, 340.0])
+
+        stats = self.service.get_stats_in_time_range("AAPL", 150.0, 300.0)
+
+        self.assertEqual(stats, {"min": 2.0, "max": 4.0, "last": 4.0, "avg": 3.0, "var": 0.67, "count": 3})
+        self.assertEqual(self.service.get_stats_in_time_range("AAPL", start=300.0)["count"], 1)
+        self.assertEqual(self.service.get_stats_in_time_range("AAPL", 400.0)["count"], 0)
+
+    def test_timestamps_follow_evictions(self):
+        for i in range(30):
+            self.service.add_batch("AAPL", [float(10 * i + j) for j in range(10)], timestamps=[float(10 * i + j) for j in range(10)])
+
+        stats = self.service.get_stats_in_time_range("AAPL")
+
+        self.assertEqual((stats["min"], stats["max"], stats["count"]), (200.0, 299.0, 100))
+        self.assertEqual(self.service.get_stats_in_time_range("AAPL", 150.0, 210.0)["count"], 11)
+
+    def test_timestamps_start_after_creation(self):
+        self.service.add_batch("AAPL", [1.0, 2.0])
+        self.service.add_batch("AAPL", [3.0, 4.0], timestamps=[10.0, 20.0])
+
+        self.assertEqual(self.service.get_stats_in_time_range("AAPL", 0.0, 15.0)["last"], 3.0)
+
+    def test_invalid_timestamps(self):
+        with self.assertRaises(TradingStatisticsServiceTimestampsException):
+            self.service.add_batch("AAPL", [1.0, 2.0], timestamps=[20.0, 10.0])
+        self.assertNotIn("AAPL", self.service.symbol_locks)
+
+        self.service.add_batch("AAPL", [1.0, 2.0], timestamps=[10.0, 20.0])
+
+        with self.assertRaises(TradingStatisticsServiceTimestampsException):
+            self.service.add_batch("AAPL", [3.0], timestamps=[15.0])
+        with self.assertRaises(TradingStatisticsServiceTimestampsException):
+            self.service.add_batch("AAPL", [3.0], timestamps=[30.0, 40.0])
+        with self.assertRaises(TradingStatisticsServiceTimestampsException):
+            self.service.add_batch("AAPL", [3.0])
+        self.assertEqual(self.service.get_version("AAPL"), 1)
+
+    def test_get_stats_in_time_range_without_timestamps(self):
+        self.service.add_batch("AAPL", [1.0])
+
+        with self.assertRaises(TradingStatisticsServiceTimestampsException):
+            self.service.get_stats_in_time_range("AAPL", 0.0, 1.0)
+        with self.assertRaises(TradingStatisticsServiceSymbolNotFoundException):
+            self.service.get_stats_in_time_range("GOOG", 0.0, 1.0)
+
+
+class TestTradingStatisticsServiceCandles(unittest.TestCase):
+
+    def setUp(self):
+        self.service = TradingStatisticsService(lambda: SegmentTree(capacity=10, max_window_size=100), candle_resolutions=[10, 50])
+
+    def test_get_candles(self):
+        self.service.add_batch("AAPL", [float(v) for v in range(25)])
+        self.service.add_batch("AAPL", [float(v) for v in range(25, 33)])
+
+        candles = self.service.get_candles("AAPL", 10)
+
+        self.assertEqual(candles["resolution"], 10)
+        self.assertEqual(candles["first"], 0)
+        self.assertEqual(candles["open"], [0.0, 10.0, 20.0, 30.0])
+        self.assertEqual(candles["high"], [9.0, 19.0, 29.0, 32.0])
+        self.assertEqual(candles["close"], [9.0, 19.0, 29.0, 32.0])
+        self.assertEqual(candles["mean"], [4.5, 14.5, 24.5, 31.0])
+        self.assertEqual(self.service.get_candles("AAPL", 10, count=2, end=3)["open"], [10.0, 20.0])
+
+    def test_candles_follow_evictions(self):
+        for i in range(30):
+            self.service.add_batch("AAPL", [float(10 * i + j) for j in range(10)])
+
+        candles = self.service.get_candles("AAPL", 50)
+
+        self.assertEqual(candles["first"], 4)
+        self.assertEqual(candles["low"], [200.0, 250.0])
+
+    def test_candles_are_rebuilt_from_snapshots(self):
+        self.service.add_batch("AAPL", [float(v) for v in range(30)])
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, "snapshot.bin")
+            self.service.save_snapshot(path)
+
+            restored = TradingStatisticsService(SegmentTree, candle_resolutions=[10])
+            restored.load_snapshot(path)
+
+            self.assertEqual(restored.get_candles("AAPL", 10)["open"], [0.0, 10.0, 20.0])
+
+    def test_unknown_resolution(self):
+        self.service.add_batch("AAPL", [1.0])
+
+        with self.assertRaises(TradingStatisticsServiceException):
+            self.service.get_candles("AAPL", 20)
+        with self.assertRaises(TradingStatisticsServiceSymbolNotFoundException):
+            self.service.get_candles("GOOG", 10)
+
+    def test_symbol_without_candles(self):
+        with self.assertRaises(TypeError):
+            self.service.add_batch("AAPL", ["invalid_data", 1.0])
+
+        with self.assertRaises(TradingStatisticsServiceSymbolNotFoundException):
+            self.service.get_candles("AAPL", 10)
+
+
+class TestTradingStatisticsServiceStatsSeries(unittest.TestCase):
+
+    def setUp(self):
+        self.service = TradingStatisticsService(lambda: SegmentTree(capacity=10, max_window_size=100))
+
+    def test_get_stats_series(self):
+        self.service.add_batch("AAPL", [float(v) for v in range(20)])
+
+        series = self.service.get_stats_series("AAPL", 4, 3, stride=5, offset=1)
+
+        self.assertEqual((series["window"], series["stride"]), (4, 5))
+        self.assertEqual(series["offsets"], [11, 6, 1])
+        self.assertEqual(series["min"], [5.0, 10.0, 15.0])
+        self.assertEqual(series["max"], [8.0, 13.0, 18.0])
+        self.assertEqual(series["last"], [8.0, 13.0, 18.0])
+        self.assertEqual(series["avg"], [6.5, 11.5, 16.5])
+        self.assertEqual(series["var"], [1.25, 1.25, 1.25])
+
+    def test_get_stats_series_matches_get_stats(self):
+        self.service.add_batch("AAPL", [float(v % 7) for v in range(60)])
+
+        series = self.service.get_stats_series("AAPL", 10, 1)
+        stats = self.service.get_stats("AAPL", 1)
+
+        self.assertEqual({name: series[name][0] for name in stats}, stats)
+
+    def test_get_stats_series_only_covers_the_data_held(self):
+        for i in range(30):
+            self.service.add_batch("AAPL", [float(10 * i + j) for j in range(10)])
+
+        series = self.service.get_stats_series("AAPL", 50, 10, stride=50)
+
+        self.assertEqual(series["offsets"], [50, 0])
+        self.assertEqual(series["min"], [200.0, 250.0])
+
+    def test_get_stats_series_invalid(self):
+        self.service.add_batch("AAPL", [1.0])
+
+        with self.assertRaises(TradingStatisticsServiceException):
+            self.service.get_stats_series("AAPL", 0, 1)
+        with self.assertRaises(TradingStatisticsServiceException):
+            self.service.get_stats_series("AAPL", 1, 1, stride=0)
+        with self.assertRaises(TradingStatisticsServiceSymbolNotFoundException):
+            self.service.get_stats_series("GOOG", 1, 1)
+
+
+class TestTradingStatisticsServiceConcurrency(unittest.TestCase):
+
+    def setUp(self):
+        self.switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+
+    def tearDown(self):
+        sys.setswitchinterval(self.switch_interval)
+
+    def run_threads(self, targets):
+        threads = [threading.Thread(target=target, args=args) for target, args in targets]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_mixed_reads_and_writes(self):
+        service = TradingStatisticsService(SegmentTree, stats_cache_size=0)
+        symbols = ["AAPL", "GOOG", "MSFT"]
+        inconsistent = []
+
+        def write(symbol):
+            for i in range(150):
+                # Every batch fills the last 10 data points with a single value
+                service.add_batch(symbol, [float(i)] * 10)
+
+        def read(symbol):
+            for _ in range(300):
+                try:
+                    stats = service.get_stats(symbol, 1)
+                    many = service.get_stats_many(symbol, [1, 2])
+                except TradingStatisticsServiceSymbolNotFoundException:
+                    continue
+                if not (stats["min"] == stats["max"] == stats["last"] and many[1]["min"] == many[1]["max"]):
+                    inconsistent.append((stats, many))
+
+        self.run_threads(
+            [(write, (symbol,)) for symbol in symbols] + [(read, (symbol,)) for symbol in symbols for _ in range(4)]
+        )
+
+        self.assertEqual(inconsistent, [])
+        for symbol in symbols:
+            self.assertEqual(service.get_version(symbol), 150)
+            self.assertEqual(service.data_storage[symbol].size, 1500)
+            self.assertEqual(service.get_stats(symbol, 1)["last"], 149)
+
+    def test_concurrent_symbol_creation_respects_limit(self):
+        service = TradingStatisticsService(SegmentTree)
+        rejected = []
+
+        def create(symbol):
+            try:
+                service.add_batch(symbol, [1.0, 2.0])
+            except TradingStatisticsServiceSymbolsLimitReachedException:
+                rejected.append(symbol)
+
+        self.run_threads([(create, (f"SYMBOL{i}",)) for i in range(50)])
+
+        self.assertEqual(len(service.data_storage), service.MAX_SYMBOLS_NUMBER)
+        self.assertEqual(len(rejected), 50 - service.MAX_SYMBOLS_NUMBER)
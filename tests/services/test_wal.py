@@ -0,0 +1,161 @@
+import os
+import threading
+import unittest
+import zlib
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+import numpy as np
+
+from app.data_structures.compact_segment_tree import CompactArraySegmentTree
+from app.data_structures.segment_tree import SegmentTree
+from app.services.trading_statistics import TradingStatisticsService
+from app.services.wal import LEGACY_RECORD_HEADER, WriteAheadLog
+
+
+class TestWriteAheadLog(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.path = self.directory.name
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_append_and_replay(self):
+        wal = WriteAheadLog(self.path, flush_interval_seconds=0)
+        wal.append("AAPL", 1, [1.0, 2.0])
+        wal.append("GOOG", 1, [10.0])
+        wal.append("AAPL", 2, [3.0])
+        wal.close()
+
+        replayed = WriteAheadLog(self.path, flush_interval_seconds=0).replay()
+
+        self.assertEqual([(version, list(values)) for version, values, _ in replayed["AAPL"]], [(1, [1.0, 2.0]), (2, [3.0])])
+        self.assertEqual([(version, list(values)) for version, values, _ in replayed["GOOG"]], [(1, [10.0])])
+
+    def test_replay_ignores_truncated_record(self):
+        wal = WriteAheadLog(self.path, flush_interval_seconds=0)
+        wal.append("AAPL", 1, [1.0, 2.0])
+        wal.append("AAPL", 2, [3.0, 4.0])
+        wal.close()
+
+        segment = next(Path(self.path).glob("*.wal"))
+        segment.write_bytes(segment.read_bytes()[:-4])
+
+        replayed = WriteAheadLog(self.path, flush_interval_seconds=0).replay()
+
+        self.assertEqual(len(replayed["AAPL"]), 1)
+        self.assertEqual(list(replayed["AAPL"][0][1]), [1.0, 2.0])
+
+    def test_symbols_share_one_segment(self):
+        wal = WriteAheadLog(self.path, flush_interval_seconds=0)
+        for i in range(100):
+            wal.append(f"SYM{i}", 1, [float(i)])
+
+        self.assertEqual(len(list(Path(self.path).glob("*.wal"))), 1)
+        wal.close()
+
+        replayed = WriteAheadLog(self.path, flush_interval_seconds=0).replay()
+        self.assertEqual([list(replayed[f"SYM{i}"][0][1]) for i in range(100)], [[float(i)] for i in range(100)])
+
+    def test_replay_legacy_segments(self):
+        payload = np.array([1.0, 2.0], dtype="<f8").tobytes()
+        Path(self.path, f"{'AAPL'.encode().hex()}.1.wal").write_bytes(LEGACY_RECORD_HEADER.pack(2, zlib.crc32(payload), 1) + payload)
+
+        wal = WriteAheadLog(self.path, flush_interval_seconds=0)
+        wal.append("AAPL", 2, [3.0])
+        wal.close()
+
+        replayed = WriteAheadLog(self.path, flush_interval_seconds=0).replay()
+
+        self.assertEqual([(version, list(values)) for version, values, _ in replayed["AAPL"]], [(1, [1.0, 2.0]), (2, [3.0])])
+
+    def test_group_commit(self):
+        wal = WriteAheadLog(self.path, flush_interval_seconds=0.05)
+
+        with patch("app.services.wal.os.fsync", wraps=os.fsync) as fsync:
+            threads = [threading.Thread(target=wal.append, args=("AAPL", i, [float(i)])) for i in range(20)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertLess(fsync.call_count, 20)
+
+        wal.close()
+
+        self.assertEqual(sorted(version for version, _, _ in WriteAheadLog(self.path, 0).replay()["AAPL"]), list(range(20)))
+
+    def test_remove_generations(self):
+        wal = WriteAheadLog(self.path, flush_interval_seconds=0)
+        wal.append("AAPL", 1, [1.0])
+
+        covered_generation = wal.start_generation()
+        wal.append("AAPL", 2, [2.0])
+        wal.remove_generations(covered_generation)
+        wal.close()
+
+        replayed = WriteAheadLog(self.path, 0).replay()
+
+        self.assertEqual([(version, list(values)) for version, values, _ in replayed["AAPL"]], [(2, [2.0])])
+
+    def test_service_recovers_from_snapshot_and_log(self):
+        snapshot_path = os.path.join(self.path, "snapshot.bin")
+        wal_directory = os.path.join(self.path, "wal")
+
+        service = TradingStatisticsService(SegmentTree, write_ahead_log=WriteAheadLog(wal_directory, 0))
+        service.add_batch("AAPL", [1, 2, 3])
+        service.save_snapshot(snapshot_path)
+        service.add_batch("AAPL", [4, 5])
+        service.add_batch("AAPL", [6])
+        service.add_batch("GOOG", [10, 20])
+        expected = service.get_stats("AAPL", 1)
+        service.write_ahead_log.close()
+
+        recovered = TradingStatisticsService(SegmentTree, write_ahead_log=WriteAheadLog(wal_directory, 0))
+        recovered.load_snapshot(snapshot_path)
+
+        self.assertEqual(recovered.replay_write_ahead_log(), 3)
+        self.assertEqual(recovered.get_stats("AAPL", 1), expected)
+        self.assertEqual(recovered.get_version("AAPL"), 3)
+        self.assertEqual(recovered.get_stats("GOOG", 1)["avg"], 15)
+
+    def test_replay_skips_batches_covered_by_snapshot(self):
+        snapshot_path = os.path.join(self.path, "snapshot.bin")
+        wal_directory = os.path.join(self.path, "wal")
+
+        service = TradingStatisticsService(SegmentTree, write_ahead_log=WriteAheadLog(wal_directory, 0))
+        service.add_batch("AAPL", [1, 2, 3])
+        service.write_ahead_log.start_generation()
+        service.add_batch("AAPL", [4])
+        # A snapshot racing with the batch above may include it while the log still holds it
+        service.save_snapshot(snapshot_path)
+        service.write_ahead_log.write("AAPL", 2, [4])
+        service.write_ahead_log.close()
+
+        recovered = TradingStatisticsService(SegmentTree, write_ahead_log=WriteAheadLog(wal_directory, 0))
+        recovered.load_snapshot(snapshot_path)
+
+        self.assertEqual(recovered.replay_write_ahead_log(), 0)
+        self.assertEqual(recovered.get_stats("AAPL", 1)["avg"], 2.5)
+
+    def test_replay_keeps_compact_storage(self):
+        wal_directory = os.path.join(self.path, "wal")
+
+        service = TradingStatisticsService(SegmentTree, write_ahead_log=WriteAheadLog(wal_directory, 0))
+        service.add_batch("AAPL", [1, 2, 3], compact=True)
+        service.add_batch("AAPL", [4])
+        service.add_batch("GOOG", [10, 20])
+        service.write_ahead_log.close()
+
+        replayed = WriteAheadLog(wal_directory, 0).replay()
+        self.assertEqual([compact for _, _, compact in replayed["AAPL"]], [True, False])
+
+        recovered = TradingStatisticsService(SegmentTree, write_ahead_log=WriteAheadLog(wal_directory, 0))
+        recovered.replay_write_ahead_log()
+
+        self.assertEqual(recovered.compact_symbols, {"AAPL"})
+        self.assertIsInstance(recovered._new_engine("AAPL"), CompactArraySegmentTree)
+        self.assertEqual(recovered.get_stats("AAPL", 1)["avg"], 2.5)
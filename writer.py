@@ -0,0 +1,17 @@
+from app.config import DevelopmentConfig as config
+from app.services.shared_memory import serve_writer
+
+
+# The settings are read from the config rather than the Flask app, whose views would build the
+# service of an API process (restoring the snapshot and opening the write-ahead log) in the writer
+if __name__ == '__main__':
+    serve_writer(
+        address=config.WRITER_ADDRESS,
+        namespace=config.SHARED_MEMORY_NAMESPACE,
+        stats_cache_size=config.STATS_CACHE_SIZE,
+        stats_cache_eviction_policy=config.STATS_CACHE_EVICTION_POLICY,
+        snapshot_path=config.SNAPSHOT_PATH,
+        wal_directory=config.WAL_DIRECTORY,
+        wal_flush_interval_seconds=config.WAL_FLUSH_INTERVAL_SECONDS,
+        candle_resolutions=config.CANDLE_RESOLUTIONS,
+    )